@@ -1,13 +1,21 @@
+import asyncio
 import json
 
 from channels.db import database_sync_to_async
+from django.db import transaction
 from djangochannelsrestframework.generics import GenericAsyncAPIConsumer
 from djangochannelsrestframework.observer.generics import (ObserverModelInstanceMixin, action)
 from djangochannelsrestframework.observer import model_observer
-
-from .models import Room, Message
+from djangochannelsrestframework.observer.model_observer import Action
+from rest_framework import status
+from rest_framework.exceptions import (APIException, NotAuthenticated,
+                                       NotFound, ValidationError)
+
+from . import history, unread
+from .writer import COMMITTED, get_message_writer
+from .models import Room, Message, RoomParticipant
 from profiles.models import Profile
-from .serializers import MessageSerializer, RoomSerializer
+from .serializers import MessageSerializer, RoomSerializer, RoomParticipantSerializer
 from profiles.serializers import ProfileSerializer
 
 
@@ -16,24 +24,122 @@ class RoomConsumer(ObserverModelInstanceMixin, GenericAsyncAPIConsumer):
     serializer_class = RoomSerializer
     lookup_field = "pk"
 
+    room = None
+    sender = None
+    room_users = None
+    user_group = None
+
+    async def connect(self):
+        """ Unread counts of all the user's rooms arrive on every socket """
+        await super().connect()
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            # kept out of self.groups: room presence is not sent there
+            self.user_group = unread.user_group(user.pk)
+            await self.channel_layer.group_add(self.user_group,
+                                               self.channel_name)
+
     async def disconnect(self, code):
-        if hasattr(self, "room_subscribe"):
+        if self.room is not None:
             await self.notify_users()
+        if self.user_group is not None:
+            await self.channel_layer.group_discard(self.user_group,
+                                                   self.channel_name)
         await super().disconnect(code)
 
     @action()
     async def join_room(self, pk, **kwargs):
-        self.room_subscribe = pk
+        """
+        Resolve the room and the sender once per socket, so every later
+        message is written without another lookup.
+        """
+        self.room, self.sender, self.room_users = await self.load_room(pk)
+        self.room_subscribe = self.room.pk
         await self.notify_users()
 
     @action()
     async def create_message(self, message, **kwargs):
-        
-        await database_sync_to_async(Message.objects.create)(
-            room=Room.objects.filter(pk=int(message['room'])).first(),
-            sender=Profile.objects.filter(username=message['sender']).first(),
-            text=message['text']
-        )
+        if self.room is None:
+            raise ValidationError({'detail': 'Join a room first.'})
+        if 'room' in message and int(message['room']) != self.room.pk:
+            raise ValidationError({'detail': 'Message is not for this room.'})
+
+        writer = get_message_writer()
+        if writer is None:
+            _, events = await self.save_message(message['text'],
+                                                message.get('sender'))
+            await unread.send_events(events)
+            return
+        if self.sender is None and message.get('sender'):
+            await self.load_sender(message['sender'])
+        return await self.queue_message(writer, message['text'])
+
+    async def queue_message(self, writer, text: str) -> tuple:
+        """
+        Queue a message for the batched writer and broadcast it right away.
+        Only reaches the database when the writer runs out of reserved ids.
+        """
+        while True:
+            queued = writer.add(self.room.pk,
+                                self.sender.pk if self.sender else None, text)
+            if queued is not None:
+                break
+            await database_sync_to_async(writer.reserve)()
+        message, written = queued
+
+        # bulk_create sends no post_save: broadcast as the observer would
+        observer = type(self).message_activity
+        event = observer.serialize(message, Action.CREATE)
+        for group in observer.group_names_for_signal(instance=message):
+            await self.channel_layer.group_send(group, dict(event, group=group))
+
+        if writer.durability != COMMITTED:
+            return MessageSerializer(message).data, status.HTTP_202_ACCEPTED
+        try:
+            # shielded: the write goes on even if the reply stops waiting
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(written)),
+                                   writer.commit_timeout)
+        except asyncio.TimeoutError:
+            # still queued, acknowledge it as the queued durability does
+            return MessageSerializer(message).data, status.HTTP_202_ACCEPTED
+        except Room.DoesNotExist:
+            raise NotFound('Room not found.')
+        except Exception:
+            raise APIException('Message could not be saved.')
+        return MessageSerializer(message).data, status.HTTP_201_CREATED
+
+    @action()
+    async def load_older(self, before, page_size=None, **kwargs):
+        """ The history page before a `before` token of the joined room """
+        if self.room is None:
+            raise ValidationError({'detail': 'Join a room first.'})
+        try:
+            key = history.decode_cursor(before)
+        except ValueError:
+            raise NotFound('Invalid cursor')
+        return await self.older_messages(key, page_size), status.HTTP_200_OK
+
+    @action()
+    async def mark_read(self, message_id, **kwargs):
+        """ Move the sender's read watermark in the joined room forward """
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            raise NotAuthenticated()
+        if self.room is None:
+            raise ValidationError({'detail': 'Join a room first.'})
+        participant, events = await self.save_watermark(int(message_id))
+        await unread.send_events(events)
+        return participant, status.HTTP_200_OK
+
+    async def unread_changed(self, event: dict):
+        await self.send_json({
+            'action': 'unread',
+            'data': {
+                'room': event['room'],
+                'unread_count': event['unread_count'],
+                'last_read_message': event['last_read_message'],
+            },
+        })
 
     @action()
     async def subscribe_to_messages_in_room(self, pk, **kwargs):
@@ -58,13 +164,12 @@ class RoomConsumer(ObserverModelInstanceMixin, GenericAsyncAPIConsumer):
         return dict(data=MessageSerializer(instance).data, action=action.value, pk=instance.pk)
 
     async def notify_users(self):
-        room: Room = await self.get_room(self.room_subscribe)
         for group in self.groups:
             await self.channel_layer.group_send(
                 group,
                 {
                     'type': 'update_users',
-                    'usuarios': await self.current_users(room)
+                    'usuarios': self.room_users
                 }
             )
 
@@ -72,12 +177,57 @@ class RoomConsumer(ObserverModelInstanceMixin, GenericAsyncAPIConsumer):
         await self.send(text_data=json.dumps({'usuarios': event["usuarios"]}))
 
     @database_sync_to_async
-    def get_room(self, pk: int) -> Room:
-        """ Get room object by pk """
-        return Room.objects.get(pk=pk)
+    def load_room(self, pk: int) -> tuple:
+        """ Room, sender and the serialized room users, off the event loop """
+        room = Room.objects.select_related('initiator',
+                                           'receiver').get(pk=int(pk))
+        user = self.scope.get('user')
+        sender = user if user is not None and user.is_authenticated else None
+        users = [
+            ProfileSerializer(user).data
+            for user in (room.initiator, room.receiver)
+        ]
+        return room, sender, users
+
+    @database_sync_to_async
+    def older_messages(self, before: tuple, page_size: int = None) -> dict:
+        limit = min(int(page_size or history.page_size()),
+                    history.max_page_size())
+        messages, cursor = history.messages_before(self.room.pk, before,
+                                                   max(1, limit))
+        return {
+            'before': cursor,
+            'results': MessageSerializer(messages, many=True).data,
+        }
+
+    @database_sync_to_async
+    def save_watermark(self, message_id: int) -> tuple:
+        """ Serialized watermark and the committed unread events to send """
+        try:
+            participant = unread.mark_read(self.room.pk, self.sender.pk,
+                                           message_id)
+        except (Message.DoesNotExist, RoomParticipant.DoesNotExist):
+            raise NotFound()
+        return (RoomParticipantSerializer(participant).data,
+                unread.changed_events(self.room.pk, [self.sender.pk]))
+
+    @database_sync_to_async
+    def load_sender(self, username: str) -> None:
+        self.sender = Profile.objects.filter(username=username).first()
 
     @database_sync_to_async
-    def current_users(self, room: Room):
-        """ Get users in current room """
-        users_in_room = list([room.initiator, room.receiver])
-        return [ProfileSerializer(user).data for user in users_in_room]
+    def save_message(self, text: str, username: str = None) -> tuple:
+        """
+        The only database call of a chat message, off the event loop.
+        Anonymous sockets of legacy clients name their sender in the
+        message; it is looked up on the first one and cached. Returns the
+        message and the committed unread events, sent from the event loop.
+        """
+        if self.sender is None and username:
+            self.sender = Profile.objects.filter(username=username).first()
+        with transaction.atomic():
+            message = Message.objects.create(room=self.room,
+                                             sender=self.sender,
+                                             text=text)
+        return message, unread.changed_events(message.room_id,
+                                              message.unread_changed)
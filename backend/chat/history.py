@@ -0,0 +1,54 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Message
+
+
+def page_size() -> int:
+    return getattr(settings, 'CHAT_HISTORY', {}).get('PAGE_SIZE', 30)
+
+
+def max_page_size() -> int:
+    return getattr(settings, 'CHAT_HISTORY', {}).get('MAX_PAGE_SIZE', 100)
+
+
+def encode_cursor(message: Message) -> str:
+    """ Opaque `before` token of a message: its (timestamp, id) """
+    key = f'{message.timestamp.isoformat()}|{message.pk}'
+    return urlsafe_b64encode(key.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """ (timestamp, id) of a `before` token, ValueError if it is malformed """
+    try:
+        timestamp, pk = urlsafe_b64decode(
+            cursor.encode('ascii')).decode('ascii').split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (TypeError, UnicodeError, ValueError) as error:
+        raise ValueError('Invalid cursor') from error
+
+
+def messages_before(room_id: int, before: tuple = None,
+                    limit: int = None) -> tuple:
+    """
+    The `limit` newest messages of a room older than the `before` key, in
+    chronological order, and the cursor of the page before them (None once
+    the history is exhausted). Reads at most limit + 1 rows backwards on
+    the (room, timestamp, id) index.
+    """
+    limit = limit or page_size()
+    messages = Message.objects.filter(room_id=room_id)
+    if before is not None:
+        timestamp, pk = before
+        messages = messages.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk))
+    messages = list(messages.order_by('-timestamp', '-id')[:limit + 1])
+    cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        cursor = encode_cursor(messages[-1])
+    messages.reverse()
+    return messages, cursor
@@ -0,0 +1,63 @@
+# Generated by Django 4.1.4 on 2026-10-18 12:40
+
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+import django.utils.timezone
+
+BATCH_SIZE = 5000
+
+
+def backfill_last_message(apps, schema_editor):
+    """ Point every room at its newest message, one committed primary-key
+    range at a time; rooms without messages keep their start time """
+    Room = apps.get_model('chat', 'Room')
+    Message = apps.get_model('chat', 'Message')
+    newest = Message.objects.filter(room_id=OuterRef('pk')).order_by(
+        '-timestamp', '-id')
+    last_pk = 0
+    while True:
+        pks = list(
+            Room.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', flat=True)[:BATCH_SIZE])
+        if not pks:
+            break
+        with transaction.atomic():
+            Room.objects.filter(pk__gte=pks[0], pk__lte=pks[-1]).update(
+                last_message=Subquery(newest.values('pk')[:1]),
+                last_activity_at=Coalesce(
+                    Subquery(newest.values('timestamp')[:1]), 'start_time'))
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chat', '0002_message_room_timestamp_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='last_activity_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['initiator', 'last_activity_at', 'id'], name='room_initiator_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['receiver', 'last_activity_at', 'id'], name='room_receiver_activity_idx'),
+        ),
+    ]
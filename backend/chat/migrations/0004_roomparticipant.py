@@ -0,0 +1,62 @@
+# Generated by Django 4.1.4 on 2026-10-18 12:55
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+def add_participants(apps, schema_editor):
+    """ One watermark per user of every existing room, set at the room's
+    last message so old history does not show up as unread """
+    Room = apps.get_model('chat', 'Room')
+    RoomParticipant = apps.get_model('chat', 'RoomParticipant')
+    last_pk = 0
+    while True:
+        rooms = list(
+            Room.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'initiator_id', 'receiver_id',
+                'last_message_id')[:BATCH_SIZE])
+        if not rooms:
+            break
+        with transaction.atomic():
+            RoomParticipant.objects.bulk_create(
+                [
+                    RoomParticipant(room_id=pk,
+                                    user_id=user_id,
+                                    last_read_message_id=last_message_id)
+                    for pk, initiator_id, receiver_id, last_message_id in rooms
+                    for user_id in {initiator_id, receiver_id} if user_id
+                ],
+                ignore_conflicts=True,
+            )
+        last_pk = rooms[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat', '0003_room_last_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='chat.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='roomparticipant',
+            constraint=models.UniqueConstraint(fields=('room', 'user'), name='roomparticipant_unique_room_user'),
+        ),
+        migrations.RunPython(add_participants, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class Room(models.Model):
@@ -11,10 +12,48 @@ class Room(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=False, related_name="conver_participant"
     )
     start_time = models.DateTimeField(auto_now_add=True)
+    # newest message and its time, kept by chat.signals in the insert's
+    # transaction so room lists never look messages up
+    last_message = models.ForeignKey(
+        'Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    last_activity_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self) -> str:
         return '{} -> {}'.format(self.initiator, self.receiver)
 
+    class Meta:
+        # one per side of the initiator OR receiver filter of the room list,
+        # each walked newest first for its cursor pages
+        indexes = [
+            models.Index(fields=['initiator', 'last_activity_at', 'id'],
+                         name='room_initiator_activity_idx'),
+            models.Index(fields=['receiver', 'last_activity_at', 'id'],
+                         name='room_receiver_activity_idx'),
+        ]
+
+
+class RoomParticipant(models.Model):
+    """ A user's read watermark and unread message count in a room """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_memberships'
+    )
+    last_read_message = models.ForeignKey(
+        'Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'user'],
+                                    name='roomparticipant_unique_room_user'),
+        ]
+
+    def __str__(self) -> str:
+        return '{} in room {} | {} unread'.format(self.user, self.room_id,
+                                                 self.unread_count)
+
 
 class Message(models.Model):
     """ Message db table """
@@ -22,7 +61,9 @@ class Message(models.Model):
                               null=True, related_name='message_sender')
     text = models.CharField(max_length=200, blank=True)
     room = models.ForeignKey(Room, on_delete=models.CASCADE,)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # a default rather than auto_now_add: chat.writer stamps messages when
+    # they are queued and bulk_create must keep that time
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     
     def __str__(self) -> str:
         return '{} -> room {} | {}: {}'.format(self.sender.username, 
@@ -32,4 +73,8 @@ class Message(models.Model):
 
     class Meta:
         ordering = ('timestamp',)
+        indexes = [
+            models.Index(fields=['room', 'timestamp', 'id'],
+                         name='message_room_timestamp_idx'),
+        ]
 
@@ -0,0 +1,49 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+
+from . import history
+
+
+class RoomsPagination(CursorPagination):
+    """ Keyset pagination over a user's rooms, most recently active first """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-last_activity_at', '-id')
+
+
+class MessageHistoryPagination(BasePagination):
+    """
+    Backward keyset pagination over a room's messages by (timestamp, id).
+    A page holds the newest messages older than `?before=`, oldest first,
+    and `before` is the token of the page preceding it.
+    """
+    before_query_param = 'before'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return history.page_size()
+        return max(1, min(size, history.max_page_size()))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.before_query_param)
+        if not encoded:
+            return None
+        try:
+            return history.decode_cursor(encoded)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None) -> list:
+        """ `queryset` is a room id """
+        messages, self.before = history.messages_before(
+            queryset, self.decode_cursor(request), self.get_page_size(request))
+        return messages
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({'before': self.before, 'results': data})
@@ -1,32 +1,58 @@
-from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from rest_framework.serializers import ModelSerializer, Serializer, SerializerMethodField, IntegerField
 from django.db.models import Q
 from rest_framework.exceptions import ValidationError
 from rest_framework import status
 
-from .models import Room, Message
+from . import history
+from .models import Room, Message, RoomParticipant
 from profiles.serializers import ProfileSerializer
+from core.serializers import SparseFieldsMixin
 
 
-class MessageSerializer(ModelSerializer):
+class MessageSerializer(SparseFieldsMixin, ModelSerializer):
     """ Message serializer """
     class Meta:
         model = Message
         exclude = ('room',)
+        expandable_fields = {
+            'sender': (ProfileSerializer, {'read_only': True}),
+        }
+        select_related_fields = {'sender': ('sender', )}
 
 
-class RoomsListSerializer(ModelSerializer):
+class RoomsListSerializer(SparseFieldsMixin, ModelSerializer):
     """ Serialize a list of rooms """
     initiator = ProfileSerializer()
     receiver = ProfileSerializer()
-    last_message = SerializerMethodField()
+    last_message = MessageSerializer(read_only=True)
+    # annotated by chat.unread.with_unread
+    unread_count = IntegerField(read_only=True)
+    last_read_message = IntegerField(source='last_read_message_id',
+                                     read_only=True)
 
     class Meta:
         model = Room
-        fields = ['id', 'initiator', 'receiver', 'last_message']
+        fields = [
+            'id', 'initiator', 'receiver', 'last_message', 'last_activity_at',
+            'unread_count', 'last_read_message'
+        ]
+        select_related_fields = {
+            'initiator': ('initiator', ),
+            'receiver': ('receiver', ),
+            'last_message': ('last_message', ),
+        }
 
-    def get_last_message(self, instance):
-        message = instance.message_set.first()
-        return MessageSerializer(instance=message).data
+
+class RoomReadSerializer(Serializer):
+    """ Validate the message a user has read up to """
+    message = IntegerField(min_value=1)
+
+
+class RoomParticipantSerializer(ModelSerializer):
+    """ Serialize a user's read watermark in a room """
+    class Meta:
+        model = RoomParticipant
+        fields = ['room', 'last_read_message', 'unread_count']
 
 
 class CreateRoomSerializer(ModelSerializer):
@@ -50,12 +76,34 @@ class CreateRoomSerializer(ModelSerializer):
 
         
 
-class RoomSerializer(ModelSerializer):
+class RoomSerializer(SparseFieldsMixin, ModelSerializer):
     """ Serialize a room detail """
     initiator = ProfileSerializer()
     receiver = ProfileSerializer()
-    message_set = MessageSerializer(many=True)
+    message_set = SerializerMethodField()
+    message_set_before = SerializerMethodField()
 
     class Meta:
         model = Room
-        fields = ['id', 'initiator', 'receiver', 'message_set']
\ No newline at end of file
+        fields = [
+            'id', 'initiator', 'receiver', 'message_set', 'message_set_before'
+        ]
+        select_related_fields = {
+            'initiator': ('initiator', ),
+            'receiver': ('receiver', ),
+        }
+
+    def newest_messages(self, instance) -> tuple:
+        """ The newest history page, read once per room """
+        if not hasattr(instance, 'newest_messages'):
+            instance.newest_messages = history.messages_before(instance.pk)
+        return instance.newest_messages
+
+    def get_message_set(self, instance):
+        messages, _ = self.newest_messages(instance)
+        return MessageSerializer(messages, many=True).data
+
+    def get_message_set_before(self, instance):
+        """ `before` token for older messages, None if there are none """
+        _, before = self.newest_messages(instance)
+        return before
\ No newline at end of file
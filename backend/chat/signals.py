@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Room, Message
+from . import unread
+
+
+@receiver(post_save, sender=Room)
+def add_room_participants(sender, instance: Room, created: bool, **kwargs):
+    """ Give both users of a new room a read watermark """
+    if created:
+        unread.add_participants(instance)
+
+
+@receiver(post_save, sender=Message)
+def touch_room(sender, instance: Message, created: bool, **kwargs):
+    """
+    Make a new message its room's last one and unread for the other
+    participant, in the insert's transaction. A message that commits after
+    a newer one leaves the room's last message as it is. The users to
+    notify are left on the message as `unread_changed` for its creator.
+    """
+    if created:
+        Room.objects.filter(
+            pk=instance.room_id,
+            last_activity_at__lte=instance.timestamp).update(
+                last_message=instance, last_activity_at=instance.timestamp)
+        instance.unread_changed = unread.message_added(instance)
@@ -0,0 +1,126 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import F, FilteredRelation, Q
+
+from .models import Room, RoomParticipant, Message
+
+
+def user_group(user_id: int) -> str:
+    """ Channel layer group every socket of a user listens on """
+    return f'user__{user_id}'
+
+
+def add_participants(room: Room) -> None:
+    RoomParticipant.objects.bulk_create(
+        [
+            RoomParticipant(room=room, user_id=user_id)
+            for user_id in {room.initiator_id, room.receiver_id} if user_id
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def with_unread(rooms, user_id: int):
+    """
+    Annotate rooms with the user's `unread_count` and `last_read_message_id`
+    through a filtered join on their participant row: no message is counted.
+    """
+    return rooms.annotate(me=FilteredRelation(
+        'participants', condition=Q(participants__user_id=user_id))).annotate(
+            unread_count=F('me__unread_count'),
+            last_read_message_id=F('me__last_read_message_id'))
+
+
+def message_added(message: Message) -> list:
+    return messages_added(message.room_id, {message.sender_id: 1})
+
+
+def messages_added(room_id: int, senders: dict) -> list:
+    """
+    Count new messages, given as {sender_id: count}, as unread for every
+    other participant, in the insert's transaction. Returns the ids of the
+    users whose counts changed, to be notified once it commits.
+    """
+    participants = RoomParticipant.objects.filter(room_id=room_id)
+    for sender_id, count in senders.items():
+        participants.exclude(user_id=sender_id).update(
+            unread_count=F('unread_count') + count)
+    if len(senders) == 1:
+        # only a lone sender's own count is unchanged
+        participants = participants.exclude(user_id=next(iter(senders)))
+    return list(participants.values_list('user_id', flat=True))
+
+
+def mark_read(room_id: int, user_id: int, message_id: int) -> RoomParticipant:
+    """
+    Move the user's watermark forward to `message_id` and recount what is
+    left unread. Reading up to the room's last message resets the count
+    without touching messages; otherwise only the messages after the new
+    watermark are counted. An older watermark is left as it is.
+    Raises Message.DoesNotExist for a message of another room. The caller
+    notifies the user once this has committed.
+
+    Messages are ordered by (timestamp, id) as in the history and the
+    room's last message: ids of the batched writer are reserved ahead of
+    time and say nothing about the order.
+    """
+    key = Message.objects.filter(pk=message_id, room_id=room_id).values_list(
+        'timestamp', 'pk').first()
+    if key is None:
+        raise Message.DoesNotExist
+    with transaction.atomic():
+        participant = RoomParticipant.objects.select_for_update(
+            of=('self', )).select_related(
+                'room__last_message',
+                'last_read_message').get(room_id=room_id, user_id=user_id)
+        read = participant.last_read_message
+        if read is not None and (read.timestamp, read.pk) >= key:
+            return participant
+        last = participant.room.last_message
+        if last is None or key >= (last.timestamp, last.pk):
+            unread = 0
+        else:
+            timestamp, pk = key
+            unread = Message.objects.filter(
+                Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk),
+                room_id=room_id).exclude(sender_id=user_id).count()
+        participant.last_read_message_id = message_id
+        participant.unread_count = unread
+        participant.save(update_fields=['last_read_message', 'unread_count'])
+    return participant
+
+
+def changed_events(room_id: int, user_ids) -> list:
+    """
+    (user group, `unread_changed` event) pairs with the users' current
+    counts; read them after the change has committed
+    """
+    return [(user_group(user_id), {
+        'type': 'unread_changed',
+        'room': room_id,
+        'unread_count': unread_count,
+        'last_read_message': last_read,
+    }) for user_id, unread_count, last_read in RoomParticipant.objects.filter(
+        room_id=room_id, user_id__in=user_ids).values_list(
+            'user_id', 'unread_count', 'last_read_message_id')]
+
+
+async def send_events(events: list) -> None:
+    """ Hand `changed_events` to the channel layer """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for group, event in events:
+        await channel_layer.group_send(group, event)
+
+
+def push(room_id: int, user_ids) -> None:
+    """
+    Send the users' current counts from synchronous code outside the event
+    loop (views, the message writer thread). Consumers await `send_events`
+    instead.
+    """
+    events = changed_events(room_id, user_ids)
+    if events:
+        async_to_sync(send_events)(events)
@@ -1,10 +1,14 @@
 from django.urls import path
 
-from .views import CreateRoomView, ChatRoomView, DeleteChatView, MyChatsListView
+from .views import (CreateRoomView, ChatRoomView, DeleteChatView, MyChatsListView, RoomMessagesListView,
+                    MarkRoomReadView, MessageWriterStatsView)
 
 urlpatterns = [
     path('create/', CreateRoomView.as_view(), name='create_room'),
     path('my_rooms/', MyChatsListView.as_view(), name='my_rooms'),
+    path('writer/', MessageWriterStatsView.as_view(), name='message_writer_stats'),
     path('<int:pk>/', ChatRoomView.as_view(), name='chat_room'),
+    path('<int:pk>/messages/', RoomMessagesListView.as_view(), name='room_messages'),
+    path('<int:pk>/read/', MarkRoomReadView.as_view(), name='room_read'),
     path('<int:pk>/delete/', DeleteChatView.as_view(), name='del_room'),
 ]
\ No newline at end of file
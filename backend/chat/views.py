@@ -1,13 +1,20 @@
+from functools import partial
+
 from rest_framework.views import APIView
-from rest_framework.generics import CreateAPIView, RetrieveAPIView, DestroyAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.generics import CreateAPIView, RetrieveAPIView, DestroyAPIView, ListAPIView, get_object_or_404
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import transaction
 from django.db.models import Q
 
 
-from .models import Room
-from .serializers import RoomSerializer, CreateRoomSerializer, RoomsListSerializer
+from . import unread
+from .models import Room, Message, RoomParticipant
+from .pagination import MessageHistoryPagination, RoomsPagination
+from .writer import get_message_writer
+from .serializers import (RoomSerializer, CreateRoomSerializer, RoomsListSerializer, MessageSerializer,
+                          RoomReadSerializer, RoomParticipantSerializer)
 from profiles.models import Profile
 
 
@@ -25,14 +32,67 @@ class ChatRoomView(RetrieveAPIView):
     permission_classes = (IsAuthenticated, )
     lookup_field = 'pk'
 
-class MyChatsListView(APIView):
+    def get_queryset(self):
+        return RoomSerializer.optimize_queryset(Room.objects.all(),
+                                                self.request)
+
+class RoomMessagesListView(ListAPIView):
+    """ Older messages of a room, one page before `?before=` at a time """
+    serializer_class = MessageSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = MessageHistoryPagination
+
+    def get_queryset(self):
+        """ The room id the paginator reads the history of """
+        return get_object_or_404(Room.objects.only('id'),
+                                 pk=self.kwargs['pk']).pk
+
+
+class MyChatsListView(ListAPIView):
     """ Retrieve a list of all chat rooms where current user participate """
+    serializer_class = RoomsListSerializer
     permission_classes = (IsAuthenticated, )
-    
+    pagination_class = RoomsPagination
+
+    def get_queryset(self):
+        """
+        One query: the participants, the last message and the user's
+        unread count are joined in
+        """
+        user = self.request.user
+        rooms = unread.with_unread(
+            Room.objects.filter(Q(initiator=user) | Q(receiver=user)), user.pk)
+        return RoomsListSerializer.optimize_queryset(rooms, self.request)
+
+
+class MarkRoomReadView(APIView):
+    """ Move the user's read watermark in a room forward """
+    permission_classes = (IsAuthenticated, )
+
+    def post(self, request, pk):
+        serializer = RoomReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            participant = unread.mark_read(pk, request.user.pk,
+                                           serializer.validated_data['message'])
+        except (Message.DoesNotExist, RoomParticipant.DoesNotExist):
+            return Response({'detail': 'Not found.'},
+                            status=status.HTTP_404_NOT_FOUND)
+        transaction.on_commit(
+            partial(unread.push, participant.room_id, [request.user.pk]))
+        return Response(RoomParticipantSerializer(participant).data)
+
+
+class MessageWriterStatsView(APIView):
+    """ Queue depth and flush latency of the batched chat message writer """
+    permission_classes = (IsAdminUser, )
+
     def get(self, request):
-        my_chats = Room.objects.filter(Q(initiator=request.user) | Q(receiver=request.user))
-        serializer = RoomsListSerializer(my_chats, many=True)
-        return Response(serializer.data)
+        writer = get_message_writer()
+        if writer is None:
+            return Response({'enabled': False}, status=status.HTTP_200_OK)
+        return Response(dict(writer.stats(), enabled=True),
+                        status=status.HTTP_200_OK)
 
 
 class DeleteChatView(DestroyAPIView):
@@ -0,0 +1,304 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from functools import partial
+
+from django.conf import settings
+from django.db import NotSupportedError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Room, Message
+from . import unread
+
+logger = logging.getLogger(__name__)
+
+# reply to `create_message` once the message is queued, or once its batch
+# is committed
+QUEUED, COMMITTED = 'queued', 'committed'
+
+
+def reserve_ids(count: int) -> list:
+    """
+    Take `count` message ids from the table's own id sequence, so inserts
+    that do not go through the writer never reuse them.
+    """
+    table = Message._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # AUTOINCREMENT tables continue after sqlite_sequence.seq
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) '
+                'SELECT %s, COALESCE(MAX(id), 0) FROM {} WHERE NOT EXISTS '
+                '(SELECT 1 FROM sqlite_sequence WHERE name = %s)'.format(
+                    connection.ops.quote_name(table)), [table, table])
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s',
+                [count, table])
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s',
+                           [table])
+            last = cursor.fetchone()[0]
+            return list(range(last - count + 1, last + 1))
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                'FROM generate_series(1, %s)', [table, count])
+            return sorted(pk for pk, in cursor.fetchall())
+    raise NotSupportedError(
+        f'Message ids cannot be reserved on {connection.vendor}')
+
+
+class MessageWriter:
+    """
+    Write-behind writer for chat messages.
+
+    A message gets a reserved id and its timestamp when it is queued, so it
+    can be broadcast at once. Queued messages are inserted with one
+    `bulk_create` per batch, together with their rooms' last message and
+    unread counts, every `flush_interval` seconds after the first one
+    arrives or as soon as `max_pending` are queued.
+
+    A batch that fails is written again one message at a time, so a bad
+    message never holds back the others. A message that keeps failing is
+    retried every `retry_delay` seconds, `max_attempts` times in all, then
+    dropped and its future failed with the error.
+    """
+
+    def __init__(self, flush_interval: float = 0.005, max_pending: int = 200,
+                 id_block_size: int = 100, durability: str = QUEUED,
+                 commit_timeout: float = 5, max_attempts: int = 3,
+                 retry_delay: float = 0.5):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.id_block_size = id_block_size
+        self.durability = durability
+        self.commit_timeout = commit_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._pending = []
+        self._attempts = {}
+        self._ids = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._arrived = threading.Event()
+        self._full = threading.Event()
+        self._thread = None
+        self._metrics = dict(flushes=0,
+                             flushed=0,
+                             dropped=0,
+                             failures=0,
+                             max_backlog=0,
+                             last_flush_seconds=0.0,
+                             max_flush_seconds=0.0,
+                             total_flush_seconds=0.0)
+
+    def has_ids(self) -> bool:
+        return bool(self._ids)
+
+    def reserve(self) -> None:
+        """ Top the reserved ids up by a block; reads the database """
+        ids = reserve_ids(self.id_block_size)
+        with self._lock:
+            self._ids.extend(ids)
+
+    def add(self, room_id: int, sender_id: int, text: str) -> tuple:
+        """
+        Queue a message under the next reserved id. Returns the unsaved
+        message and a future resolved once it is committed, or None when no
+        id is left and `reserve` has to run first. Never reads the database.
+        """
+        with self._lock:
+            if not self._ids:
+                return None
+            message = Message(id=self._ids.popleft(),
+                              room_id=room_id,
+                              sender_id=sender_id,
+                              text=text,
+                              timestamp=timezone.now())
+            written = Future()
+            self._pending.append((message, written))
+            backlog = len(self._pending)
+            self._metrics['max_backlog'] = max(self._metrics['max_backlog'],
+                                               backlog)
+        self._ensure_thread()
+        self._arrived.set()
+        if backlog >= self.max_pending:
+            self._full.set()
+        return message, written
+
+    def flush(self) -> int:
+        """ Persist everything queued so far; returns the number written """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+
+            started = time.monotonic()
+            try:
+                written, dropped = self._write([m for m, _ in pending])
+                failed = {}
+            except Exception:
+                self._metrics['failures'] += 1
+                written, dropped, failed = self._write_each(pending)
+
+            retry = []
+            for message, future in pending:
+                if message.pk in failed:
+                    retry.append((message, future))
+                    continue
+                self._attempts.pop(message.pk, None)
+                if message.room_id in dropped:
+                    self._metrics['dropped'] += 1
+                    future.set_exception(Room.DoesNotExist())
+                else:
+                    future.set_result(message)
+            self._retry(retry, failed)
+
+            elapsed = time.monotonic() - started
+            self._metrics['flushes'] += 1
+            self._metrics['flushed'] += written
+            self._metrics['last_flush_seconds'] = elapsed
+            self._metrics['total_flush_seconds'] += elapsed
+            self._metrics['max_flush_seconds'] = max(
+                self._metrics['max_flush_seconds'], elapsed)
+            return written
+
+    def stats(self) -> dict:
+        """ Queue depth and flush latency metrics """
+        with self._lock:
+            backlog = len(self._pending)
+            reserved = len(self._ids)
+        flushes = self._metrics['flushes']
+        return dict(
+            self._metrics,
+            backlog=backlog,
+            reserved_ids=reserved,
+            durability=self.durability,
+            avg_flush_seconds=(self._metrics['total_flush_seconds'] /
+                               flushes if flushes else 0.0),
+        )
+
+    def _write_each(self, pending: list) -> tuple:
+        """
+        Write message by message; returns (written count, rooms dropped,
+        {message id: error} of the failed ones)
+        """
+        written, dropped, failed = 0, set(), {}
+        for message, _ in pending:
+            try:
+                count, gone = self._write([message])
+            except Exception as error:
+                logger.exception('Chat message %s could not be written',
+                                 message.pk)
+                failed[message.pk] = error
+                continue
+            written += count
+            dropped |= gone
+        return written, dropped, failed
+
+    def _retry(self, retry: list, failed: dict) -> None:
+        """ Queue failed messages again in front of newer ones, or drop them """
+        requeued = []
+        for message, future in retry:
+            attempts = self._attempts.get(message.pk, 0) + 1
+            if attempts < self.max_attempts:
+                self._attempts[message.pk] = attempts
+                requeued.append((message, future))
+                continue
+            self._attempts.pop(message.pk, None)
+            self._metrics['dropped'] += 1
+            logger.error('Dropped chat message %s of room %s after %s attempts',
+                         message.pk, message.room_id, attempts)
+            future.set_exception(failed[message.pk])
+        if requeued:
+            with self._lock:
+                self._pending = requeued + self._pending
+
+    def _write(self, messages: list) -> tuple:
+        """
+        Insert a batch with what post_save does for a single message: the
+        rooms' last message and the other participants' unread counts,
+        pushed once committed. Messages of rooms deleted since they were
+        queued are dropped.
+        """
+        room_ids = {message.room_id for message in messages}
+        with transaction.atomic():
+            existing = set(
+                Room.objects.filter(pk__in=room_ids).values_list('pk',
+                                                                 flat=True))
+            messages = [m for m in messages if m.room_id in existing]
+            Message.objects.bulk_create(messages)
+
+            newest = {}
+            senders = {}
+            for message in messages:
+                last = newest.get(message.room_id)
+                if last is None or (message.timestamp, message.pk) > (
+                        last.timestamp, last.pk):
+                    newest[message.room_id] = message
+                senders.setdefault(message.room_id,
+                                   Counter())[message.sender_id] += 1
+            for room_id, message in newest.items():
+                Room.objects.filter(
+                    pk=room_id,
+                    last_activity_at__lte=message.timestamp).update(
+                        last_message=message,
+                        last_activity_at=message.timestamp)
+                transaction.on_commit(
+                    partial(unread.push, room_id,
+                            unread.messages_added(room_id, senders[room_id])))
+        return len(messages), room_ids - existing
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='chat-message-writer',
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            # sleep until a message arrives, then give the batch
+            # flush_interval to fill up unless it reaches max_pending first
+            self._arrived.wait()
+            self._arrived.clear()
+            self._full.wait(self.flush_interval)
+            self._full.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Chat message writer flush failed')
+            finally:
+                close_old_connections()
+            if self._attempts:
+                # failed messages are back in the queue, give them time
+                time.sleep(self.retry_delay)
+                self._arrived.set()
+
+
+_writer = None
+
+
+def get_message_writer():
+    """ Process wide writer, or None when CHAT_WRITER is disabled """
+    global _writer
+    config = getattr(settings, 'CHAT_WRITER', {})
+    if not config.get('ENABLED', False):
+        return None
+    if _writer is None:
+        _writer = MessageWriter(
+            flush_interval=config.get('FLUSH_INTERVAL', 0.005),
+            max_pending=config.get('MAX_PENDING', 200),
+            id_block_size=config.get('ID_BLOCK_SIZE', 100),
+            durability=config.get('DURABILITY', QUEUED),
+            commit_timeout=config.get('COMMIT_TIMEOUT', 5),
+            max_attempts=config.get('MAX_ATTEMPTS', 3),
+            retry_delay=config.get('RETRY_DELAY', 0.5))
+    return _writer
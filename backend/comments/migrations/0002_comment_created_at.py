@@ -0,0 +1,62 @@
+# Generated by Django 4.1.4 on 2026-10-18 14:02
+
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def backfill_created_at(apps, schema_editor):
+    """ Stamp existing comments with their post's creation time, one
+    committed primary-key range at a time so large tables are never
+    locked by a single long transaction """
+    Comment = apps.get_model('comments', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    created_at = Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('created_at')[:1])
+    pending = Comment.objects.filter(created_at__isnull=True).order_by('pk')
+    last_pk = 0
+    while True:
+        pks = list(
+            pending.filter(pk__gt=last_pk).values_list('pk',
+                                                       flat=True)[:BATCH_SIZE])
+        if not pks:
+            break
+        with transaction.atomic():
+            Comment.objects.filter(pk__gte=pks[0], pk__lte=pks[-1],
+                                   created_at__isnull=True).update(
+                                       created_at=created_at)
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('posts', '0001_initial'),
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='comment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ('created_at', 'id')},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_at', 'id'],
+                               name='comment_post_created_idx'),
+        ),
+    ]
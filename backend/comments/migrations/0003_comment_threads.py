@@ -0,0 +1,61 @@
+# Generated by Django 4.1.4 on 2026-10-18 15:20
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+PATH_SEGMENT = '{:012x}'
+
+
+def backfill_paths(apps, schema_editor):
+    """ Every existing comment is a top level one: its path is its own
+    segment. Written in committed primary-key batches like 0002 """
+    Comment = apps.get_model('comments', 'Comment')
+    pending = Comment.objects.filter(path='').order_by('pk').only('pk')
+    last_pk = 0
+    while True:
+        batch = list(pending.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for comment in batch:
+            comment.path = PATH_SEGMENT.format(comment.pk)
+        with transaction.atomic():
+            Comment.objects.bulk_update(batch, ('path', ))
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('comments', '0002_comment_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='comments.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+    ]
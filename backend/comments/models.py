@@ -4,13 +4,116 @@ from posts.models import Post
 from profiles.models import Profile
 
 
+PATH_SEGMENT = '{:012x}'
+PATH_SEPARATOR = '.'
+PATH_MAX_LENGTH = 255
+MAX_DEPTH = (PATH_MAX_LENGTH + 1) // (len(PATH_SEGMENT.format(0)) + 1)
+
+
+class CommentManager(models.Manager):
+    """ Comment manager with batched loaders for post listings """
+
+    def _first_per_group(self, column: str, groups: list, limit: int,
+                         where: str = '') -> list:
+        """
+        The first `limit` comments of every group of rows sharing `column`,
+        in one windowed query ordered by (created_at, id).
+        """
+        table = self.model._meta.db_table
+        placeholders = ', '.join(['%s'] * len(groups))
+        comments = list(
+            self.raw(
+                f'SELECT * FROM ('
+                f'SELECT *, ROW_NUMBER() OVER ('
+                f'PARTITION BY {column} ORDER BY created_at, id) AS row_number '
+                f'FROM {table} WHERE {column} IN ({placeholders}){where}'
+                f') AS ranked WHERE row_number <= %s ORDER BY {column}, row_number',
+                [*groups, limit]))
+        authors = Profile.objects.in_bulk({c.author_id for c in comments})
+        for comment in comments:
+            comment.author = authors[comment.author_id]
+        return comments
+
+    def prefetch_first(self, posts: list, limit: int = 3) -> None:
+        """
+        Attach the first `limit` top level comments of every post as
+        `first_comments`. Runs one windowed query for the comments and one
+        for their authors, whatever the number of posts.
+        """
+        for post in posts:
+            post.first_comments = []
+        if not posts:
+            return
+
+        by_pk = {post.pk: post for post in posts}
+        for comment in self._first_per_group('post_id', list(by_pk), limit,
+                                             ' AND parent_id IS NULL'):
+            comment.post = by_pk[comment.post_id]
+            by_pk[comment.post_id].first_comments.append(comment)
+
+    def prefetch_replies(self, comments: list, limit: int = 3) -> None:
+        """
+        Attach the first `limit` direct replies of every comment as
+        `first_replies`, with the same two queries as `prefetch_first`.
+        """
+        for comment in comments:
+            comment.first_replies = []
+        if not comments:
+            return
+
+        by_pk = {comment.pk: comment for comment in comments}
+        for reply in self._first_per_group('parent_id', list(by_pk), limit):
+            reply.parent = by_pk[reply.parent_id]
+            by_pk[reply.parent_id].first_replies.append(reply)
+
+    def subtree(self, comment: 'Comment') -> models.QuerySet:
+        """
+        Every descendant of `comment`, depth first. Descendant paths all
+        start with the comment's own path followed by the separator, so the
+        whole subtree is one range scan over the (post, path) index.
+        """
+        return self.filter(
+            post=comment.post_id,
+            path__gte=comment.path + PATH_SEPARATOR,
+            path__lt=comment.path + chr(ord(PATH_SEPARATOR) + 1),
+        ).order_by('path')
+
+
 class Comment(models.Model):
     """ Comments db table """
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     author = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    parent = models.ForeignKey('self',
+                               on_delete=models.CASCADE,
+                               null=True,
+                               blank=True,
+                               related_name='replies')
+    path = models.CharField(max_length=PATH_MAX_LENGTH, blank=True, default='')
+    depth = models.PositiveSmallIntegerField(default=0)
+    reply_count = models.IntegerField(default=0)
     entry = models.TextField(blank=False, null=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CommentManager()
+
+    class Meta:
+        ordering = ('created_at', 'id')
+        indexes = [
+            models.Index(fields=('post', 'created_at', 'id'),
+                         name='comment_post_created_idx'),
+            models.Index(fields=('post', 'path'), name='comment_post_path_idx'),
+        ]
     
+    def assign_path(self) -> None:
+        """ Derive the materialized path of a saved comment from its parent """
+        segment = PATH_SEGMENT.format(self.pk)
+        if self.parent is None:
+            self.path, self.depth = segment, 0
+        else:
+            self.path = self.parent.path + PATH_SEPARATOR + segment
+            self.depth = self.parent.depth + 1
+
     def __str__(self) -> str:
         return 'Author: {} --> Post: {} -> Entry: {}'.format(self.author.id, 
                                                              self.post.id, 
-                                                             self.entry)
\ No newline at end of file
+                                                             self.entry)
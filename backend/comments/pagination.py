@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CommentsPagination(CursorPagination):
+    """ Keyset pagination for the comments of a post, oldest first """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('created_at', 'id')
+
+
+class CommentSubtreePagination(CommentsPagination):
+    """ Keyset pagination over materialized paths, depth first """
+    ordering = ('path', )
@@ -1,19 +1,51 @@
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import (ModelSerializer,
+                                        PrimaryKeyRelatedField,
+                                        SerializerMethodField,
+                                        ValidationError)
 
-from .models import Comment
+from .models import Comment, MAX_DEPTH
 from posts.models import Post
+from posts.serializers import PostCommentsSerializer
 
 
 class CommentCreateSerializer(ModelSerializer):
     """ Create comment serializer """
-    
+    parent = PrimaryKeyRelatedField(queryset=Comment.objects.all(),
+                                    required=False,
+                                    allow_null=True)
+
     class Meta:
         model = Comment
-        fields = ('id', 'entry')
-        
+        fields = ('id', 'entry', 'parent', 'path', 'depth')
+        read_only_fields = ('path', 'depth')
+
+    def validate_parent(self, parent):
+        """ Replies must stay inside the post and under the depth limit """
+        if parent is None:
+            return parent
+        post_pk = self.context['view'].kwargs.get('post_pk')
+        if str(parent.post_id) != str(post_pk):
+            raise ValidationError('Parent comment belongs to another post.')
+        if parent.depth + 1 >= MAX_DEPTH:
+            raise ValidationError('Maximum reply depth reached.')
+        return parent
+
     def create(self, validated_data):
         # assign post to a new comment
         post_pk = self.context['view'].kwargs.get('post_pk')
         validated_data['post'] = Post.objects.filter(pk=post_pk).first()
+        # the path is assigned by the post_save receiver
         return super().create(validated_data)
-        
\ No newline at end of file
+
+
+class CommentThreadSerializer(PostCommentsSerializer):
+    """ Comment with its reply counter and the first replies, if loaded """
+    replies = SerializerMethodField()
+
+    class Meta(PostCommentsSerializer.Meta):
+        fields = ('id', 'post', 'author', 'entry', 'created_at', 'parent',
+                  'depth', 'reply_count', 'replies')
+
+    def get_replies(self, obj) -> list:
+        replies = getattr(obj, 'first_replies', [])
+        return PostCommentsSerializer(replies, many=True).data
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Comment
+
+
+@receiver(post_save, sender=Comment)
+def assign_comment_path(sender, instance: Comment, **kwargs):
+    """
+    Give a comment saved without a path (ORM, admin, fixtures) its
+    materialized path; the path embeds the primary key, known only after
+    the insert
+    """
+    if instance.path:
+        return
+    instance.assign_path()
+    Comment.objects.filter(pk=instance.pk).update(path=instance.path,
+                                                  depth=instance.depth)
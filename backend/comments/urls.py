@@ -1,8 +1,18 @@
 from django.urls import path
 
-from .views import CommentCreateView
+from .views import (CommentCreateView, CommentsListView,
+                    CommentRepliesListView, CommentSubtreeListView)
 
 urlpatterns = [
+    path('<str:post_pk>/comments/',
+         CommentsListView.as_view(),
+         name='comments_list'),
+    path('<str:post_pk>/comments/<str:pk>/replies/',
+         CommentRepliesListView.as_view(),
+         name='comment_replies'),
+    path('<str:post_pk>/comments/<str:pk>/subtree/',
+         CommentSubtreeListView.as_view(),
+         name='comment_subtree'),
     path('<str:post_pk>/create_comment/', 
          CommentCreateView.as_view(), name='comment_create'),    
-]
\ No newline at end of file
+]
@@ -1,9 +1,18 @@
-from rest_framework.generics import CreateAPIView
+import time
+
+from rest_framework.generics import CreateAPIView, ListAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound
+from django.db import transaction
+from django.db.models import F
 
 from posts.models import Post
+from posts import tags, trending
 from .models import Comment
-from .serializers import CommentCreateSerializer
+from .serializers import CommentCreateSerializer, CommentThreadSerializer
+from .pagination import CommentsPagination, CommentSubtreePagination
+
+REPLIES_PREVIEW = 3
 
 
 class CommentCreateView(CreateAPIView):
@@ -13,4 +22,65 @@ class CommentCreateView(CreateAPIView):
     permission_classes = (IsAuthenticated, )
     
     def perform_create(self, serializer):
-        return serializer.save(author=self.request.user)
\ No newline at end of file
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            Post.objects.filter(pk=comment.post_id).update(
+                comment_count=F('comment_count') + 1)
+            if comment.parent_id is not None:
+                Comment.objects.filter(pk=comment.parent_id).update(
+                    reply_count=F('reply_count') + 1)
+            trending.bump_scores({
+                comment.post_id: [(trending.weight('comment'), time.time())]
+            })
+            tags.add_terms(comment.post, comment.entry)
+        return comment
+
+
+class CommentsListView(ListAPIView):
+    """ Get the top level comments of a post, page by page """
+    serializer_class = CommentThreadSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = CommentsPagination
+
+    def get_queryset(self):
+        post_pk = self.kwargs.get('post_pk')
+        if not Post.objects.filter(pk=post_pk).exists():
+            raise NotFound()
+        return Comment.objects.filter(
+            post=post_pk, parent__isnull=True).select_related('author')
+
+    def paginate_queryset(self, queryset) -> list:
+        """ Attach the first replies of every comment on the page """
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            Comment.objects.prefetch_replies(page, limit=REPLIES_PREVIEW)
+        return page
+
+
+class CommentParentMixin:
+    """ Resolve the comment addressed by the `post_pk` and `pk` kwargs """
+
+    def get_parent(self) -> Comment:
+        parent = Comment.objects.filter(pk=self.kwargs.get('pk'),
+                                        post=self.kwargs.get('post_pk')).first()
+        if parent is None:
+            raise NotFound()
+        return parent
+
+
+class CommentRepliesListView(CommentParentMixin, CommentsListView):
+    """ Get the direct replies of a comment, page by page """
+
+    def get_queryset(self):
+        return Comment.objects.filter(
+            parent=self.get_parent()).select_related('author')
+
+
+class CommentSubtreeListView(CommentParentMixin, ListAPIView):
+    """ Get every reply under a comment, depth first, page by page """
+    serializer_class = CommentThreadSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = CommentSubtreePagination
+
+    def get_queryset(self):
+        return Comment.objects.subtree(self.get_parent()).select_related('author')
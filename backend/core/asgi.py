@@ -7,7 +7,6 @@ from django.core.asgi import get_asgi_application
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
-os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = "true"
 
 import chat.routing
 
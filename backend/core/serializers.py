@@ -0,0 +1,76 @@
+from rest_framework.permissions import SAFE_METHODS
+
+
+def query_list(request, name: str) -> set:
+    """ Comma separated values of a query parameter, e.g. ?fields=id,email """
+    values = request.query_params.get(name, '') if request else ''
+    return {value.strip() for value in values.split(',') if value.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin for `?fields=` and `?expand=` on read requests.
+
+    `?fields=id,username` keeps only the listed fields. Unrequested fields
+    are dropped before rendering, so a skipped `SerializerMethodField`
+    never runs its queries.
+
+    `?expand=author` swaps in or adds a nested serializer for each name in
+    `Meta.expandable_fields`, which maps a field to a
+    (serializer class, kwargs) pair.
+
+    `Meta.select_related_fields` and `Meta.prefetch_related_fields` map a
+    field to the lookups it needs. `optimize_queryset` applies only the
+    lookups of the fields that will be rendered.
+
+    Only the serializer built by the view with the request in its context
+    is trimmed. Serializers nested inside it always render in full.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = kwargs.get('context', {}).get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        for name in self.expanded_fields(request):
+            serializer_class, options = self.Meta.expandable_fields[name]
+            self.fields[name] = serializer_class(**options)
+        keep = self.requested_fields(request)
+        for name in set(self.fields) - keep:
+            self.fields.pop(name)
+
+    @classmethod
+    def expanded_fields(cls, request) -> set:
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        return query_list(request, 'expand') & set(expandable)
+
+    @classmethod
+    def requested_fields(cls, request) -> set:
+        """ Names of the fields a read request will render """
+        names = set(cls._declared_field_names()) | cls.expanded_fields(request)
+        wanted = query_list(request, 'fields') & names
+        return wanted or names
+
+    @classmethod
+    def _declared_field_names(cls) -> tuple:
+        fields = getattr(cls.Meta, 'fields', None)
+        if fields is None or fields == '__all__':
+            return tuple(cls().fields)
+        return tuple(fields)
+
+    @classmethod
+    def wants(cls, request, name: str) -> bool:
+        return name in cls.requested_fields(request)
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        """ select/prefetch only what the rendered fields will touch """
+        fields = cls.requested_fields(request)
+        select = getattr(cls.Meta, 'select_related_fields', {})
+        prefetch = getattr(cls.Meta, 'prefetch_related_fields', {})
+        for name in fields & set(select):
+            queryset = queryset.select_related(*select[name])
+        for name in fields & set(prefetch):
+            queryset = queryset.prefetch_related(*prefetch[name])
+        return queryset
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'posts',
     'comments',
     'chat',
+    'uploads',
 ]
 
 
@@ -96,6 +97,17 @@ CHANNEL_LAYERS = {
     },
 }
 
+# profiles.mutual caches friend id lists here and deletes them when a
+# friendship changes. A LocMemCache is private to its process, so that
+# only holds with a single worker process; with more, point every worker
+# at a shared backend, e.g. 'django.core.cache.backends.redis.RedisCache'
+# with LOCATION 'redis://127.0.0.1:6379/1' (needs the redis package)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
@@ -149,6 +161,33 @@ STATICFILES_DIRS = [
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# uploads are stored once per distinct content, see uploads.storage
+DEFAULT_FILE_STORAGE = 'uploads.storage.ContentAddressedStorage'
+
+# media is served by uploads.views.MediaView after a permission check;
+# 'nginx' hands the file over with X-Accel-Redirect to
+# MEDIA_ACCEL_REDIRECT_PREFIX + name (an internal location aliased to
+# MEDIA_ROOT), 'apache' with X-Sendfile, None streams it from Django
+MEDIA_ACCEL_REDIRECT = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# resized copies generated in the background for every uploaded image
+IMAGE_DERIVATIVES = {
+    'thumb': {
+        'SIZE': (150, 150),
+        'CROP': True,
+        'FORMAT': 'WEBP',
+        'QUALITY': 70,
+    },
+    'web': {
+        'SIZE': (1080, 1080),
+        'CROP': False,
+        'FORMAT': 'WEBP',
+        'QUALITY': 80,
+    },
+}
+IMAGE_DERIVATIVE_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -159,3 +198,72 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOWED_ORIGINS = []
 
 AUTH_USER_MODEL = 'profiles.Profile'
+
+
+# chat
+# messages per history page, newest first, for rooms and `load_older`
+CHAT_HISTORY = {
+    'PAGE_SIZE': 30,
+    'MAX_PAGE_SIZE': 100,
+}
+
+# write-behind writer for chat bursts: messages get a reserved id and are
+# broadcast at once, then inserted in batches FLUSH_INTERVAL seconds after
+# the first one is queued or as soon as MAX_PENDING are. DURABILITY
+# 'queued' acknowledges a message when it is queued, 'committed' once its
+# batch is in the database, or as queued after COMMIT_TIMEOUT seconds. A
+# message failing MAX_ATTEMPTS writes, RETRY_DELAY seconds apart, is dropped
+CHAT_WRITER = {
+    'ENABLED': False,
+    'FLUSH_INTERVAL': 0.005,
+    'MAX_PENDING': 200,
+    'ID_BLOCK_SIZE': 100,
+    'DURABILITY': 'queued',
+    'COMMIT_TIMEOUT': 5,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 0.5,
+}
+
+# profiles
+# in-memory friend graph, rebuilt from the database every TTL seconds;
+# other worker processes see a friendship change after their next rebuild
+FRIEND_GRAPH = {
+    'TTL': 300,
+}
+
+# sorted friend id lists cached for mutual friend intersections, see CACHES
+FRIEND_IDS_CACHE_TIMEOUT = 600
+
+
+# posts
+# entries kept per home timeline; new posts may push a timeline past it
+# until the next periodic `manage.py trim_timelines`
+TIMELINE_MAX_LENGTH = 1000
+
+# dotted path of the post search backend; None picks FTS5 on SQLite and a
+# plain `icontains` scan elsewhere
+POST_SEARCH_BACKEND = None
+
+# write-behind buffer for like/dislike bursts, flushed every FLUSH_INTERVAL
+# seconds or as soon as MAX_PENDING (post, user) pairs are queued; a pair
+# failing MAX_ATTEMPTS flushes in a row is dropped
+REACTION_BUFFER = {
+    'ENABLED': False,
+    'FLUSH_INTERVAL': 0.5,
+    'MAX_PENDING': 500,
+    'MAX_ATTEMPTS': 3,
+}
+
+# trending posts: engagement weights decay by half every HALF_LIFE_HOURS,
+# scores under MIN_SCORE are dropped on their next update or by
+# `manage.py decay_trending_scores`. Stored scores are scaled by the half
+# life, changing it reorders existing posts until they are bumped again
+TRENDING = {
+    'HALF_LIFE_HOURS': 6,
+    'MIN_SCORE': 0.01,
+    'WEIGHTS': {
+        'like': 1.0,
+        'dislike': 0.5,
+        'comment': 2.0,
+    },
+}
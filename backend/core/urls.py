@@ -13,10 +13,10 @@ urlpatterns = [
     path('posts/', include('posts.urls')),
     path('posts/', include('comments.urls')),
     path('chat/', include('chat.urls')),
+    path('media/', include('uploads.urls')),
 ]
 
 urlpatterns += dock_urls
 
 if settings.DEBUG:
-    urlpatterns + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -1,7 +1,8 @@
 from django.contrib import admin
 
-from .models import Post
+from .models import Post, Reaction
 
 
 admin.site.register(Post)
+admin.site.register(Reaction)
 
@@ -0,0 +1,203 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+
+from .reactions import apply_reactions, lock_reactions, toggle
+
+logger = logging.getLogger(__name__)
+
+
+class ReactionBuffer:
+    """
+    Write-behind buffer for reaction toggles.
+    Toggles are queued per (post, profile) in arrival order and replayed on
+    top of the stored state at flush time, so the last toggle always wins.
+
+    A batch that fails is retried one key at a time, so a bad key never
+    holds back the others. A key that keeps failing is retried by the next
+    `max_attempts - 1` flushes, then dropped and counted as dead-lettered.
+    """
+
+    def __init__(self, flush_interval: float = 0.5, max_pending: int = 500,
+                 max_attempts: int = 3):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._pending = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._metrics = dict(flushes=0,
+                             flushed=0,
+                             failures=0,
+                             dead_lettered=0,
+                             last_flush_seconds=0.0,
+                             max_flush_seconds=0.0,
+                             total_flush_seconds=0.0)
+
+    def add(self, post_id: int, profile_id: int, value: int) -> None:
+        """ Queue a toggle and wake the flusher once the backlog is full """
+        with self._lock:
+            self._pending.setdefault((int(post_id), profile_id),
+                                     []).append(value)
+            backlog = len(self._pending)
+        self._ensure_thread()
+        if backlog >= self.max_pending:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """ Persist everything queued so far; returns the number of keys """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            started = time.monotonic()
+            try:
+                self._apply(pending)
+                written, failed = len(pending), {}
+            except Exception:
+                self._metrics['failures'] += 1
+                written, failed = self._apply_each(pending)
+            self._retry(failed)
+
+            elapsed = time.monotonic() - started
+            self._metrics['flushes'] += 1
+            self._metrics['flushed'] += written
+            self._metrics['last_flush_seconds'] = elapsed
+            self._metrics['total_flush_seconds'] += elapsed
+            self._metrics['max_flush_seconds'] = max(
+                self._metrics['max_flush_seconds'], elapsed)
+            return written
+
+    def close(self) -> None:
+        """ Stop the flusher thread; toggles still queued are discarded """
+        self._stopped.set()
+        self._wakeup.set()
+        atexit.unregister(self.flush)
+
+    def stats(self) -> dict:
+        """ Backlog and flush latency metrics """
+        with self._lock:
+            backlog = len(self._pending)
+            queued = sum(len(values) for values in self._pending.values())
+        flushes = self._metrics['flushes']
+        return dict(
+            self._metrics,
+            backlog=backlog,
+            queued_toggles=queued,
+            avg_flush_seconds=(self._metrics['total_flush_seconds'] /
+                               flushes if flushes else 0.0),
+        )
+
+    def _apply(self, pending: dict) -> None:
+        with transaction.atomic():
+            apply_reactions(self._resolve(pending))
+        for key in pending:
+            self._attempts.pop(key, None)
+
+    def _apply_each(self, pending: dict) -> tuple:
+        """ Apply key by key; returns (written count, {key: toggles} failed) """
+        written, failed = 0, {}
+        for key, values in pending.items():
+            try:
+                self._apply({key: values})
+                written += 1
+            except Exception:
+                logger.exception('Reaction toggles of %s failed', key)
+                failed[key] = values
+        return written, failed
+
+    def _retry(self, failed: dict) -> None:
+        """ Queue failed keys again in front of newer toggles, or drop them """
+        with self._lock:
+            for key, values in failed.items():
+                self._attempts[key] = self._attempts.get(key, 0) + 1
+                if self._attempts[key] >= self.max_attempts:
+                    del self._attempts[key]
+                    self._metrics['dead_lettered'] += 1
+                    logger.error('Dropped reaction toggles %s of %s', values,
+                                 key)
+                    continue
+                self._pending[key] = values + self._pending.get(key, [])
+
+    def _resolve(self, pending: dict) -> dict:
+        """ Replay queued toggles over the stored reactions, locked """
+        existing, stored = lock_reactions(
+            {post_id for post_id, _ in pending},
+            {profile_id for _, profile_id in pending})
+
+        changes = {}
+        for key, values in pending.items():
+            if key[0] not in existing:
+                continue
+            state = stored.get(key)
+            for value in values:
+                state = toggle(state, value)
+            changes[key] = (stored.get(key), state)
+        return changes
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='reaction-buffer',
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Reaction buffer flush failed')
+            finally:
+                close_old_connections()
+
+
+_buffer = None
+
+
+def get_reaction_buffer():
+    """ Process wide buffer, or None when REACTION_BUFFER is disabled """
+    global _buffer
+    config = getattr(settings, 'REACTION_BUFFER', {})
+    if not config.get('ENABLED', False):
+        return None
+    if _buffer is None:
+        _buffer = ReactionBuffer(
+            flush_interval=config.get('FLUSH_INTERVAL', 0.5),
+            max_pending=config.get('MAX_PENDING', 500),
+            max_attempts=config.get('MAX_ATTEMPTS', 3))
+    return _buffer
+
+
+def reset_reaction_buffer() -> None:
+    """ Stop and forget the process wide buffer, e.g. between tests """
+    global _buffer
+    if _buffer is not None:
+        _buffer.close()
+    _buffer = None
+
+
+@receiver(setting_changed)
+def reaction_buffer_setting_changed(setting: str, **kwargs):
+    if setting == 'REACTION_BUFFER':
+        reset_reaction_buffer()
@@ -0,0 +1,31 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts import tags
+
+
+class Command(BaseCommand):
+    help = 'Index the hashtags and mentions of every existing post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # streamed in chunks from one cursor: only a batch is held in memory
+        posts = Post.objects.order_by('pk').only(
+            'pk', 'entry', 'created_at').iterator(chunk_size=batch_size)
+
+        total = 0
+        while True:
+            batch = list(islice(posts, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                tags.index_posts(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} posts.'))
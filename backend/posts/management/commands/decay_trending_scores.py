@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Drop the trending scores that faded below MIN_SCORE'
+
+    def handle(self, *args, **options):
+        kept = trending.drop_faded()
+        self.stdout.write(
+            self.style.SUCCESS(f'Dropped faded trending scores, {kept} kept.'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the post search index from the posts table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        backend = search.get_backend()
+        posts = Post.objects.order_by('pk').only('pk', 'entry')
+
+        last_pk, total = 0, 0
+        backend.clear()
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                backend.index(batch)
+            last_pk, total = batch[-1].pk, total + len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {total} posts.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import TimelineEntry
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized home timelines from friendships'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        friendships = timeline.Friendship.objects.order_by('pk').values_list(
+            'pk', 'from_profile_id', 'to_profile_id')
+
+        last_pk, total = 0, 0
+        TimelineEntry.objects.all().delete()
+        while True:
+            batch = list(friendships.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                for _, user_id, friend_id in batch:
+                    timeline.backfill_friendship(user_id, friend_id)
+            last_pk, total = batch[-1][0], total + len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt timelines from {total} friendships.'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Post, Reaction
+from comments.models import Comment
+
+
+def count_subquery(queryset, field: str):
+    """ Correlated COUNT(*) of rows pointing at the outer post """
+    counted = (queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('*')).values('total'))
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recompute like/dislike/comment counters of every post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        counters = dict(
+            like_count=count_subquery(
+                Reaction.objects.filter(value=Reaction.Value.LIKE), 'post'),
+            dislike_count=count_subquery(
+                Reaction.objects.filter(value=Reaction.Value.DISLIKE), 'post'),
+            comment_count=count_subquery(Comment.objects, 'post'),
+        )
+
+        last_pk, total = 0, 0
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            # one UPDATE per batch keeps write locks short
+            with transaction.atomic():
+                total += Post.objects.filter(pk__gte=pks[0],
+                                             pk__lte=pks[-1]).update(**counters)
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {total} posts.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Cut the home timelines down to TIMELINE_MAX_LENGTH entries'
+
+    def handle(self, *args, **options):
+        user_ids = timeline.overlong_timelines()
+        deleted = sum(timeline.trim_timeline(user_id) for user_id in user_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f'Trimmed {len(user_ids)} timelines, '
+                               f'{deleted} entries deleted.'))
@@ -0,0 +1,73 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:32
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+BATCH_SIZE = 500
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+    Fill every timeline with the newest posts of the user's friends, one
+    committed range of friendships at a time so large tables are never
+    locked by a single long transaction
+    """
+    Profile = apps.get_model('profiles', 'Profile')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    max_length = getattr(settings, 'TIMELINE_MAX_LENGTH', 1000)
+    friendships = Profile.friends.through.objects.order_by('pk').values_list(
+        'pk', 'from_profile_id', 'to_profile_id')
+
+    last_pk = 0
+    while True:
+        batch = list(friendships.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        with transaction.atomic():
+            for _, user_id, friend_id in batch:
+                posts = Post.objects.filter(author_id=friend_id).order_by(
+                    '-created_at', '-id').values_list('pk',
+                                                      'created_at')[:max_length]
+                TimelineEntry.objects.bulk_create(
+                    [
+                        TimelineEntry(user_id=user_id,
+                                      post_id=pk,
+                                      created_at=created_at)
+                        for pk, created_at in posts
+                    ],
+                    ignore_conflicts=True,
+                )
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0003_post_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='timeline_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='timeline_unique_user_post'),
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
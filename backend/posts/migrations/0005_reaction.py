@@ -0,0 +1,88 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+LIKE, DISLIKE = 1, -1
+BATCH_SIZE = 1000
+
+
+def copy_votes(apps, schema_editor):
+    """ Move both M2M tables into Reaction; a like wins over a dislike """
+    Post = apps.get_model('posts', 'Post')
+    Reaction = apps.get_model('posts', 'Reaction')
+
+    for through, value in ((Post.like.through, LIKE),
+                           (Post.dislike.through, DISLIKE)):
+        last_pk = 0
+        while True:
+            batch = list(
+                through.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'post_id', 'profile_id')[:BATCH_SIZE])
+            if not batch:
+                break
+            Reaction.objects.bulk_create(
+                [
+                    Reaction(post_id=post_id, profile_id=profile_id, value=value)
+                    for _, post_id, profile_id in batch
+                ],
+                ignore_conflicts=True,
+            )
+            last_pk = batch[-1][0]
+
+    def counted(value):
+        votes = (Reaction.objects.filter(post=OuterRef('pk'),
+                                         value=value).order_by().values(
+                                             'post').annotate(
+                                                 total=Count('*')).values('total'))
+        return Coalesce(Subquery(votes, output_field=IntegerField()), 0)
+
+    Post.objects.update(like_count=counted(LIKE), dislike_count=counted(DISLIKE))
+
+
+def restore_votes(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Reaction = apps.get_model('posts', 'Reaction')
+
+    for through, value in ((Post.like.through, LIKE),
+                           (Post.dislike.through, DISLIKE)):
+        through.objects.bulk_create(
+            through(post_id=post_id, profile_id=profile_id)
+            for post_id, profile_id in Reaction.objects.filter(
+                value=value).values_list('post_id', 'profile_id').iterator())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0004_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.SmallIntegerField(choices=[(1, 'like'), (-1, 'dislike')])),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='posts.post')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('post', 'profile'), name='reaction_unique_post_profile'),
+        ),
+        migrations.RunPython(copy_votes, restore_votes),
+        migrations.RemoveField(
+            model_name='post',
+            name='dislike',
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='like',
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.4 on 2026-10-18 16:05
+
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """ FTS5 index for posts.search.FTS5Backend, SQLite only """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        f"entry, tokenize = 'unicode61 remove_diacritics 2')")
+    schema_editor.execute(f'INSERT INTO {FTS_TABLE} (rowid, entry) '
+                          f'SELECT id, entry FROM {Post._meta.db_table}')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_trendingscore'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:07
+
+import math
+import time
+
+from django.conf import settings
+from django.db import migrations, models
+import django.utils.timezone
+
+BATCH_SIZE = 1000
+
+
+def rate():
+    half_life = getattr(settings, 'TRENDING', {}).get('HALF_LIFE_HOURS', 6)
+    return math.log(2) / (half_life * 3600)
+
+
+def rescale(apps, convert):
+    TrendingScore = apps.get_model('posts', 'TrendingScore')
+    last_pk = 0
+    while True:
+        batch = list(
+            TrendingScore.objects.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            break
+        for entry in batch:
+            convert(entry)
+        TrendingScore.objects.bulk_update(batch, ['score', 'decayed_at'])
+        last_pk = batch[-1].pk
+
+
+def to_log_scores(apps, schema_editor):
+    """ score at decayed_at -> ln(score) + rate * decayed_at """
+    TrendingScore = apps.get_model('posts', 'TrendingScore')
+    TrendingScore.objects.filter(score__lte=0).delete()
+
+    def convert(entry):
+        entry.score = math.log(entry.score) + rate() * entry.decayed_at
+
+    rescale(apps, convert)
+
+
+def to_decayed_scores(apps, schema_editor):
+    now = time.time()
+
+    def convert(entry):
+        entry.score = math.exp(entry.score - rate() * now)
+        entry.decayed_at = now
+
+    rescale(apps, convert)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_posttag_postmention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reaction',
+            name='reacted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        # lets the column come back on a reverse migration
+        migrations.AlterField(
+            model_name='trendingscore',
+            name='decayed_at',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(to_log_scores, to_decayed_scores),
+        migrations.RemoveField(
+            model_name='trendingscore',
+            name='decayed_at',
+        ),
+    ]
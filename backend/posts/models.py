@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from profiles.models import Profile
 
@@ -16,11 +17,134 @@ class Post(models.Model):
                                null=False)
     entry = models.TextField(blank=True, null=True)
     file = models.ImageField(upload_to=get_upload_path, blank=True, null=True)
-    like = models.ManyToManyField(Profile, blank=True, related_name='Liked')
-    dislike = models.ManyToManyField(Profile,
-                                     blank=True,
-                                     related_name='Disliked')
+    # denormalized counters, kept in sync by the reaction/comment write paths
+    like_count = models.IntegerField(default=0)
+    dislike_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ('-created_at', '-id')
+        indexes = [
+            models.Index(fields=('author', 'created_at', 'id'),
+                         name='post_author_created_idx'),
+        ]
+
     def __str__(self) -> str:
         return '{}: {}'.format(self.author.username, self.created_at)
+
+
+class Reaction(models.Model):
+    """ Like or dislike left on a post by a profile """
+
+    class Value(models.IntegerChoices):
+        LIKE = 1, 'like'
+        DISLIKE = -1, 'dislike'
+
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='reactions')
+    profile = models.ForeignKey(Profile,
+                                on_delete=models.CASCADE,
+                                related_name='reactions')
+    value = models.SmallIntegerField(choices=Value.choices)
+    # when the current value was set, so clearing it takes back exactly what
+    # it added to the post's trending score
+    reacted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('post', 'profile'),
+                                    name='reaction_unique_post_profile'),
+        ]
+
+    def __str__(self) -> str:
+        return '{} {} post {}'.format(self.profile_id, self.get_value_display(),
+                                      self.post_id)
+
+
+class TimelineEntry(models.Model):
+    """ Materialized home timeline: a post delivered to a user's feed """
+    user = models.ForeignKey(Profile,
+                             on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    # copy of post.created_at so the feed is read from this table alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='timeline_unique_user_post'),
+        ]
+        indexes = [
+            models.Index(fields=('user', 'created_at', 'id'),
+                         name='timeline_user_created_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return '{} <- post {}'.format(self.user_id, self.post_id)
+
+
+class TrendingScore(models.Model):
+    """ Time-decayed engagement score of a post """
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='trending')
+    # ln(sum(weight * e^(rate * unix time))) of the post's engagement, see
+    # `trending.bump_scores`; the index keeps top-N reads a backwards index
+    # scan instead of a sort
+    score = models.FloatField(default=0.0, db_index=True)
+
+    def __str__(self) -> str:
+        return 'post {}: {:.3f}'.format(self.post_id, self.score)
+
+
+class PostTag(models.Model):
+    """ Inverted index entry: a #tag used in a post or in its comments """
+    tag = models.CharField(max_length=64)
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='tags')
+    # copy of post.created_at so tag pages are read from this table alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('tag', 'post'),
+                                    name='posttag_unique_tag_post'),
+        ]
+        indexes = [
+            models.Index(fields=('tag', 'created_at', 'id'),
+                         name='posttag_tag_created_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return '#{} <- post {}'.format(self.tag, self.post_id)
+
+
+class PostMention(models.Model):
+    """ Inverted index entry: a profile @mentioned in a post or its comments """
+    profile = models.ForeignKey(Profile,
+                                on_delete=models.CASCADE,
+                                related_name='mentions')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='mentions')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('profile', 'post'),
+                                    name='postmention_unique_profile_post'),
+        ]
+        indexes = [
+            models.Index(fields=('profile', 'created_at', 'id'),
+                         name='mention_profile_created_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return '@{} <- post {}'.format(self.profile_id, self.post_id)
@@ -0,0 +1,66 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class FriendsPostsPagination(CursorPagination):
+    """ Keyset pagination for the friends feed, newest posts first """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('-created_at', '-id')
+
+
+class PostSearchPagination(BasePagination):
+    """
+    Forward-only keyset pagination over search hits ordered by
+    (rank, -id). The cursor is the (rank, id) of the last hit on the page.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            rank, pk = urlsafe_b64decode(
+                encoded.encode('ascii')).decode('ascii').split(':')
+            return float(rank), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, rank: float, pk: int) -> str:
+        cursor = urlsafe_b64encode(f'{rank!r}:{pk}'.encode('ascii'))
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param,
+                                   cursor.decode('ascii'))
+
+    def paginate_queryset(self, queryset, request, view=None) -> list:
+        """ `queryset` is a search callable taking (after, limit) """
+        self.request = request
+        page_size = self.get_page_size(request)
+        hits = queryset(self.decode_cursor(request), page_size + 1)
+        self.next = None
+        if len(hits) > page_size:
+            hits = hits[:page_size]
+            rank, post = hits[-1]
+            self.next = self.encode_cursor(rank, post.pk)
+        return [post for _, post in hits]
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({'next': self.next, 'results': data})
+
@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Post, Reaction
+from . import trending
+
+COUNTERS = {
+    Reaction.Value.LIKE: 'like_count',
+    Reaction.Value.DISLIKE: 'dislike_count',
+}
+
+
+def trending_weight(value) -> float:
+    return trending.weight(Reaction.Value(value).label) if value else 0.0
+
+
+def toggle(state, value):
+    """ Tapping the current reaction clears it, any other one replaces it """
+    return None if state == value else value
+
+
+def lock_reactions(post_ids, profile_ids) -> tuple:
+    """
+    Lock the posts, then read the stored reactions of the profiles on them.
+    Returns (existing post ids, {(post_id, profile_id): value}).
+
+    Must run inside the transaction that applies the changes: a concurrent
+    toggle of the same post waits for the lock and then reads the state
+    this one wrote, so no counter delta is applied twice.
+    """
+    existing = set(
+        Post.objects.select_for_update().filter(pk__in=post_ids).order_by(
+            'pk').values_list('pk', flat=True))
+    stored = {(post_id, profile_id): value
+              for post_id, profile_id, value in Reaction.objects.filter(
+                  post_id__in=existing, profile_id__in=profile_ids).values_list(
+                      'post_id', 'profile_id', 'value')}
+    return existing, stored
+
+
+def toggle_reactions(profile_id: int, toggles: list) -> dict:
+    """
+    Apply (post_id, value) toggles made by one profile, in order.
+    Returns {post_id: final value or None}; missing posts are left out.
+    """
+    post_ids = {int(post_id) for post_id, _ in toggles}
+
+    with transaction.atomic():
+        existing, stored = lock_reactions(post_ids, {profile_id})
+        previous = {
+            post_id: stored.get((post_id, profile_id))
+            for post_id in existing
+        }
+
+        final = dict(previous)
+        for post_id, value in toggles:
+            if int(post_id) in final:
+                final[int(post_id)] = toggle(final[int(post_id)], value)
+
+        apply_reactions({(post_id, profile_id): (previous[post_id], value)
+                         for post_id, value in final.items()})
+    return final
+
+
+def apply_reactions(changes: dict) -> None:
+    """
+    Persist {(post_id, profile_id): (previous, final)} reaction states with
+    one DELETE, one upsert and one counter UPDATE at most. The previous
+    states must have been read with `lock_reactions` in the same
+    transaction.
+
+    A cleared or replaced reaction takes back the trending weight it added
+    when it was set, a new one adds its weight as of now.
+    """
+    changes = {
+        key: (before, after)
+        for key, (before, after) in changes.items() if before != after
+    }
+    if not changes:
+        return
+
+    now = timezone.now()
+    removed, replaced = Q(), Q()
+    upserts, deltas, events = [], {}, {}
+    for (post_id, profile_id), (before, after) in changes.items():
+        if after is None:
+            removed |= Q(post_id=post_id, profile_id=profile_id)
+        else:
+            upserts.append(
+                Reaction(post_id=post_id,
+                         profile_id=profile_id,
+                         value=after,
+                         reacted_at=now))
+            events.setdefault(post_id, []).append(
+                (trending_weight(after), now.timestamp()))
+        if before is not None:
+            replaced |= Q(post_id=post_id, profile_id=profile_id)
+
+        post_deltas = deltas.setdefault(post_id, dict.fromkeys(COUNTERS, 0))
+        if before is not None:
+            post_deltas[before] -= 1
+        if after is not None:
+            post_deltas[after] += 1
+
+    counters = {
+        field: F(field) + Case(*[
+            When(pk=post_id, then=Value(post_deltas[value]))
+            for post_id, post_deltas in deltas.items() if post_deltas[value]
+        ],
+                               default=Value(0),
+                               output_field=IntegerField())
+        for value, field in COUNTERS.items()
+    }
+
+    with transaction.atomic(savepoint=False):
+        if replaced:
+            for post_id, value, reacted_at in Reaction.objects.filter(
+                    replaced).values_list('post_id', 'value', 'reacted_at'):
+                events.setdefault(post_id, []).append(
+                    (-trending_weight(value), reacted_at.timestamp()))
+        if removed:
+            Reaction.objects.filter(removed).delete()
+        if upserts:
+            Reaction.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=('post', 'profile'),
+                update_fields=('value', 'reacted_at'),
+            )
+        Post.objects.filter(pk__in=deltas).update(**counters)
+        trending.bump_scores(events)
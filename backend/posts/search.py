@@ -0,0 +1,138 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Post
+from . import timeline
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def terms(query: str) -> list:
+    """ Words of a free text query, lowercased and deduplicated """
+    return list(dict.fromkeys(t.lower() for t in TOKEN_RE.findall(query)))
+
+
+def visible_authors(user_id: int, field: str = 'author_id') -> Q:
+    """ Condition on `field` for the caller's own and friends' posts """
+    friends = timeline.Friendship.objects.filter(
+        from_profile_id=user_id).values('to_profile_id')
+    return Q(**{field: user_id}) | Q(**{f'{field}__in': friends})
+
+
+def visible_authors_sql(user_id: int) -> tuple:
+    """ SQL condition on `author_id` for the caller's own and friends' posts """
+    friendship = timeline.Friendship._meta.db_table
+    return (f'(author_id = %s OR author_id IN (SELECT to_profile_id FROM '
+            f'{friendship} WHERE from_profile_id = %s))', [user_id, user_id])
+
+
+class ContainsBackend:
+    """
+    Portable fallback: every term must appear in the entry. Scans the
+    visible posts, all results share rank 0 and come newest first.
+    """
+
+    def index(self, posts: list) -> None:
+        pass
+
+    def remove(self, post_ids: list) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def search(self, query: str, user_id: int, after: tuple = None,
+               limit: int = 10) -> list:
+        words = terms(query)
+        if not words:
+            return []
+        posts = Post.objects.filter(visible_authors(user_id))
+        for word in words:
+            posts = posts.filter(entry__icontains=word)
+        if after is not None:
+            posts = posts.filter(pk__lt=after[1])
+        return [(0.0, pk)
+                for pk in posts.order_by('-pk').values_list('pk', flat=True)
+                [:limit]]
+
+
+class FTS5Backend:
+    """
+    SQLite FTS5 index over `Post.entry`, ranked by bm25 (lower is better).
+    The virtual table keeps its own copy of the text, so an update is a
+    plain delete and insert of the row keyed by the post id.
+    """
+
+    def index(self, posts: list) -> None:
+        if not posts:
+            return
+        self.remove([post.pk for post in posts])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, entry) VALUES (%s, %s)',
+                [(post.pk, post.entry) for post in posts])
+
+    def remove(self, post_ids: list) -> None:
+        if not post_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                list(post_ids))
+
+    def clear(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, query: str, user_id: int, after: tuple = None,
+               limit: int = 10) -> list:
+        words = terms(query)
+        if not words:
+            return []
+        # quoted terms are matched literally, never parsed as FTS5 syntax
+        match = ' '.join('"{}"'.format(word) for word in words)
+        visible, params = visible_authors_sql(user_id)
+        keyset = ''
+        if after is not None:
+            keyset = 'WHERE rank > %s OR (rank = %s AND id < %s)'
+            params = [*params, after[0], after[0], after[1]]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rank, id FROM ('
+                f'SELECT bm25({FTS_TABLE}) AS rank, {FTS_TABLE}.rowid AS id '
+                f'FROM {FTS_TABLE} JOIN {Post._meta.db_table} '
+                f'ON {Post._meta.db_table}.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s AND {visible}'
+                f') AS ranked {keyset} ORDER BY rank, id DESC LIMIT %s',
+                [match, *params, limit])
+            return cursor.fetchall()
+
+
+def default_backend() -> str:
+    if connection.vendor == 'sqlite':
+        return 'posts.search.FTS5Backend'
+    return 'posts.search.ContainsBackend'
+
+
+def get_backend():
+    """ Backend named by POST_SEARCH_BACKEND, else the best one for the db """
+    path = getattr(settings, 'POST_SEARCH_BACKEND', None) or default_backend()
+    return import_string(path)()
+
+
+def search_posts(query: str, user_id: int, after: tuple = None,
+                 limit: int = 10) -> list:
+    """
+    One page of (rank, post) pairs visible to the user, best match first.
+    `after` is the (rank, id) of the last result of the previous page.
+    """
+    hits = get_backend().search(query, user_id, after=after, limit=limit)
+    posts = Post.objects.select_related('author').in_bulk(
+        [pk for _, pk in hits])
+    return [(rank, posts[pk]) for rank, pk in hits if pk in posts]
@@ -1,44 +1,58 @@
-from rest_framework.serializers import (ModelSerializer, SerializerMethodField, ValidationError)
+from rest_framework.serializers import (Serializer, ModelSerializer,
+                                        SerializerMethodField, IntegerField,
+                                        ChoiceField, ListField,
+                                        ValidationError)
 
-from .models import Post
+from .models import Post, Reaction
 from profiles.models import Profile
 from comments.models import Comment
+from comments.pagination import CommentsPagination
+from uploads.serializers import ImageDerivativesField
+from core.serializers import SparseFieldsMixin
+
+
+class PostProfileSerializer(ModelSerializer):
+    """ Serializer for Profile """
+    image_derivatives = ImageDerivativesField(source='image')
+
+    class Meta:
+        model = Profile
+        fields = ('id', 'email', 'username', 'image', 'image_derivatives')
 
 
 class PostCommentsSerializer(ModelSerializer):
     """ Display post comments serializer """
-    author = SerializerMethodField()
+    author = PostProfileSerializer(read_only=True)
     
     class Meta:
         model = Comment
-        fields = ('id', 'post', 'author', 'entry')
-        
-    def get_author(self, obj):
-        author = Profile.objects.filter(pk=obj.author.pk).first()
-        serializer = PostProfileSerializer(author)
-        return serializer.data
+        fields = ('id', 'post', 'author', 'entry', 'created_at')
 
 
-class PostSerializer(ModelSerializer):
+class PostSerializer(SparseFieldsMixin, ModelSerializer):
     """ Serializer for model Post """
-    like = SerializerMethodField()
-    dislike = SerializerMethodField()
+    file_derivatives = ImageDerivativesField(source='file')
+    like = IntegerField(source='like_count', read_only=True)
+    dislike = IntegerField(source='dislike_count', read_only=True)
+    total_comments = IntegerField(source='comment_count', read_only=True)
     comments = SerializerMethodField()
     
     class Meta:
         model = Post
-        fields = ('id', 'entry', 'file', 'like', 'dislike', 'created_at', 'comments')
-        
-    def get_like(self, obj):
-        total_likes = obj.like.count()
-        return total_likes
-    
-    def get_dislike(self, obj):
-        total_dislikes = obj.dislike.count()
-        return total_dislikes
+        fields = ('id', 'entry', 'file', 'file_derivatives', 'like', 'dislike', 'created_at', 'total_comments', 'comments')
+        expandable_fields = {
+            'author': (PostProfileSerializer, {'read_only': True}),
+        }
+        select_related_fields = {'author': ('author', )}
     
     def get_comments(self, obj):
-        post_comments = Comment.objects.filter(post__pk=obj.pk)
+        """ First page of comments, the rest is served by comments_list """
+        if hasattr(obj, 'first_comments'):
+            post_comments = obj.first_comments
+        else:
+            post_comments = Comment.objects.filter(
+                post__pk=obj.pk, parent__isnull=True).select_related(
+                    'author')[:CommentsPagination.page_size]
         serializer = PostCommentsSerializer(post_comments, many=True)
         return serializer.data
    
@@ -55,51 +69,40 @@ class PostCreateSerializer(ModelSerializer):
         
         return data
         
-class PostProfileSerializer(ModelSerializer):
-    """ Serializer for Profile """
-
-    class Meta:
-        model = Profile
-        fields = ('id', 'email', 'username', 'image')
-  
-        
-class FriendsPostsListSerializer(ModelSerializer):
+class FriendsPostsListSerializer(SparseFieldsMixin, ModelSerializer):
     """ Serializer for model Post """
-    author = SerializerMethodField()
-    like = SerializerMethodField()
-    dislike = SerializerMethodField()
+    author = PostProfileSerializer(read_only=True)
+    file_derivatives = ImageDerivativesField(source='file')
+    like = IntegerField(source='like_count', read_only=True)
+    dislike = IntegerField(source='dislike_count', read_only=True)
     comments = SerializerMethodField()
-    total_comments = SerializerMethodField()
+    total_comments = IntegerField(source='comment_count', read_only=True)
     
     
     class Meta:
         model = Post
-        fields = ('id', 'author', 'entry', 'file', 'like', 'dislike', 'created_at', 'total_comments', 'comments')
-        
-    def get_like(self, obj):
-        """ Get a sum of all likes to current post """
-        total_likes = obj.like.count()
-        return total_likes
-    
-    def get_dislike(self, obj):
-        """ Get a sum of all dislikes to current post """
-        total_dislikes = obj.dislike.count()
-        return total_dislikes
+        fields = ('id', 'author', 'entry', 'file', 'file_derivatives', 'like', 'dislike', 'created_at', 'total_comments', 'comments')
         
-    def get_author(self, obj):
-        """ Get an author detail """
-        author = Profile.objects.filter(pk=obj.author.pk).first()
-        serializer = PostProfileSerializer(author)
-        return serializer.data
-    
     def get_comments(self, obj):
         """ Get first 3 comments to current post """
-        post_comments = Comment.objects.filter(post__pk=obj.pk)[:3]
+        if hasattr(obj, 'first_comments'):
+            post_comments = obj.first_comments
+        else:
+            post_comments = Comment.objects.filter(
+                post__pk=obj.pk,
+                parent__isnull=True).select_related('author')[:3]
         serializer = PostCommentsSerializer(post_comments, many=True)
         return serializer.data
-    
-    def get_total_comments(self, obj):
-        """ Get a sum of all comments to current post """
-        post_comments = Comment.objects.filter(post__pk=obj.pk).count()
-        return post_comments
 
+
+class ReactionToggleSerializer(Serializer):
+    """ A single reaction toggle on a post """
+    post = IntegerField()
+    reaction = ChoiceField(choices=Reaction.Value.labels)
+
+
+class ReactionsToggleSerializer(Serializer):
+    """ Serializer for toggling reactions on many posts at once """
+    reactions = ListField(child=ReactionToggleSerializer(),
+                          allow_empty=False,
+                          max_length=100)
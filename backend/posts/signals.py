@@ -0,0 +1,54 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from profiles.models import Profile
+from .models import Post
+from . import search, tags, timeline
+
+
+@receiver(post_save, sender=Post)
+def deliver_new_post(sender, instance: Post, created: bool, **kwargs):
+    """ Fan a freshly created post out to the friends' timelines """
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(m2m_changed, sender=Profile.friends.through)
+def sync_timeline_with_friends(sender, instance: Profile, action: str,
+                               reverse: bool, pk_set: set, **kwargs):
+    """ Backfill or prune a timeline when a friend is added or removed """
+    if action == 'pre_clear':
+        related = instance.profile_set if reverse else instance.friends
+        pk_set = set(related.values_list('pk', flat=True))
+        action = 'post_remove'
+
+    if action not in ('post_add', 'post_remove'):
+        return
+
+    for pk in pk_set:
+        # friends list is directed: user sees the posts of their friends
+        user_pk, friend_pk = (pk, instance.pk) if reverse else (instance.pk,
+                                                                  pk)
+        if action == 'post_add':
+            timeline.backfill_friendship(user_pk, friend_pk)
+        else:
+            timeline.prune_friendship(user_pk, friend_pk)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance: Post, raw: bool = False, **kwargs):
+    """ Keep the search index in step with the post's entry """
+    if not raw:
+        search.get_backend().index([instance])
+
+
+@receiver(post_save, sender=Post)
+def index_post_terms(sender, instance: Post, raw: bool = False, **kwargs):
+    """ Refresh the hashtags and mentions the post is listed under """
+    if not raw:
+        tags.index_posts([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance: Post, **kwargs):
+    search.get_backend().remove([instance.pk])
@@ -0,0 +1,83 @@
+import re
+from collections import defaultdict
+
+from profiles.models import Profile
+from comments.models import Comment
+from .models import Post, PostTag, PostMention
+
+TAG_RE = re.compile(r'(?<![\w#])#(\w+)', re.UNICODE)
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.@+-]+)', re.UNICODE)
+TAG_MAX_LENGTH = PostTag._meta.get_field('tag').max_length
+
+
+def extract(text: str) -> tuple:
+    """ Lowercased #tags and the raw @usernames found in a text """
+    if not text:
+        return set(), set()
+    tags = {
+        tag.lower()
+        for tag in TAG_RE.findall(text) if len(tag) <= TAG_MAX_LENGTH
+    }
+    # a mention ending a sentence keeps its dot out of the username
+    usernames = {name.rstrip('.') for name in MENTION_RE.findall(text)}
+    return tags, usernames
+
+
+def index_posts(posts: list) -> None:
+    """
+    Rebuild the tag and mention rows of the given posts from their entries
+    and their comments' entries: one read of the comments, one of the
+    mentioned profiles, then a delete and a bulk insert per index.
+    """
+    if not posts:
+        return
+    texts = defaultdict(list)
+    for post in posts:
+        texts[post.pk].append(post.entry)
+    for post_id, entry in Comment.objects.filter(post__in=posts).order_by(
+    ).values_list('post_id', 'entry'):
+        texts[post_id].append(entry)
+
+    found = {}
+    for post in posts:
+        found[post.pk] = extract(' '.join(filter(None, texts[post.pk])))
+    usernames = set().union(*(names for _, names in found.values()))
+    profiles = dict(
+        Profile.objects.filter(username__in=usernames).values_list(
+            'username', 'pk')) if usernames else {}
+
+    PostTag.objects.filter(post__in=posts).delete()
+    PostMention.objects.filter(post__in=posts).delete()
+    PostTag.objects.bulk_create([
+        PostTag(tag=tag, post_id=post.pk, created_at=post.created_at)
+        for post in posts for tag in found[post.pk][0]
+    ])
+    PostMention.objects.bulk_create([
+        PostMention(profile_id=profiles[name],
+                    post_id=post.pk,
+                    created_at=post.created_at) for post in posts
+        for name in found[post.pk][1] if name in profiles
+    ])
+
+
+def add_terms(post: Post, text: str) -> None:
+    """ Index the tags and mentions of a new comment under its post """
+    tags, usernames = extract(text)
+    PostTag.objects.bulk_create(
+        [
+            PostTag(tag=tag, post_id=post.pk, created_at=post.created_at)
+            for tag in tags
+        ],
+        ignore_conflicts=True,
+    )
+    if usernames:
+        PostMention.objects.bulk_create(
+            [
+                PostMention(profile_id=pk,
+                            post_id=post.pk,
+                            created_at=post.created_at)
+                for pk in Profile.objects.filter(
+                    username__in=usernames).values_list('pk', flat=True)
+            ],
+            ignore_conflicts=True,
+        )
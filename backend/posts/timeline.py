@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db.models import Count, Q
+
+from profiles.models import Profile
+from .models import Post, TimelineEntry
+
+Friendship = Profile.friends.through
+
+
+def max_length() -> int:
+    """ How many entries a single timeline keeps """
+    return getattr(settings, 'TIMELINE_MAX_LENGTH', 1000)
+
+
+def fan_out_post(post: Post) -> None:
+    """
+    Deliver a new post to every user who has its author as a friend.
+    Timelines may grow past `max_length()` here, `manage.py trim_timelines`
+    cuts them back.
+    """
+    friend_ids = list(
+        Friendship.objects.filter(to_profile_id=post.author_id).values_list(
+            'from_profile_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=friend_id,
+                          post_id=post.pk,
+                          created_at=post.created_at)
+            for friend_id in friend_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_friendship(user_id: int, friend_id: int) -> None:
+    """ Copy the latest posts of a new friend into user's timeline """
+    posts = Post.objects.filter(author_id=friend_id).values_list(
+        'pk', 'created_at')[:max_length()]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=pk, created_at=created_at)
+            for pk, created_at in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim_timeline(user_id)
+
+
+def prune_friendship(user_id: int, friend_id: int) -> None:
+    """ Drop the posts of a removed friend from user's timeline """
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 post__author_id=friend_id).delete()
+
+
+def trim_timeline(user_id: int) -> int:
+    """
+    Cut a timeline down to its newest `max_length()` entries. Reads the
+    first entry past the cap off the (user, created_at, id) index and
+    deletes from there on. Returns the number of entries deleted.
+    """
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    cut = entries.order_by('-created_at', '-id').values_list(
+        'created_at', 'id')[max_length():max_length() + 1]
+    if not cut:
+        return 0
+    created_at, pk = cut[0]
+    deleted, _ = entries.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, id__lte=pk)).delete()
+    return deleted
+
+
+def overlong_timelines() -> list:
+    """ Ids of the users whose timeline holds more than `max_length()` """
+    return list(
+        TimelineEntry.objects.values('user_id').annotate(
+            entries=Count('id')).filter(entries__gt=max_length()).values_list(
+                'user_id', flat=True))
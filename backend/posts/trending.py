@@ -0,0 +1,117 @@
+import math
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import TrendingScore
+
+DEFAULTS = {
+    'HALF_LIFE_HOURS': 6,
+    'MIN_SCORE': 0.01,
+    'WEIGHTS': {
+        'like': 1.0,
+        'dislike': 0.5,
+        'comment': 2.0,
+    },
+}
+
+# score of a post nothing counts towards any more
+EMPTY = -math.inf
+
+
+def config(key: str):
+    return getattr(settings, 'TRENDING', {}).get(key, DEFAULTS[key])
+
+
+def weight(event: str) -> float:
+    return config('WEIGHTS').get(event, 0.0)
+
+
+def rate() -> float:
+    """ Decay rate per second """
+    return math.log(2) / (config('HALF_LIFE_HOURS') * 3600)
+
+
+def decayed(score: float, now: float = None) -> float:
+    """ What a stored score is worth at `now` """
+    now = time.time() if now is None else now
+    return math.exp(score - rate() * now)
+
+
+def log_sum(terms) -> float:
+    """ ln(sum(e^term)) without overflowing """
+    terms = [term for term in terms if term != EMPTY]
+    if not terms:
+        return EMPTY
+    top = max(terms)
+    return top + math.log(sum(math.exp(term - top) for term in terms))
+
+
+def add_events(score: float, events: list) -> float:
+    """
+    Add (weight, at) events to a stored score; a negative weight takes back
+    the contribution an event of that weight made at `at`.
+    """
+    terms = [(math.log(abs(w)) + rate() * at, w > 0) for w, at in events if w]
+    added = log_sum([score] + [term for term, positive in terms if positive])
+    removed = log_sum([term for term, positive in terms if not positive])
+    if removed == EMPTY:
+        return added
+    if removed >= added:
+        return EMPTY
+    return added + math.log1p(-math.exp(removed - added))
+
+
+def bump_scores(events: dict) -> None:
+    """
+    Apply {post_id: [(weight, unix time), ...]} engagement to the posts'
+    scores, dropping the ones left below MIN_SCORE.
+
+    A score is stored as ln(sum(weight * e^(rate * at))) over the post's
+    events: decaying it to now would subtract rate * now from every row
+    alike, so the stored scores keep their order as time passes.
+    """
+    events = {
+        post_id: items
+        for post_id, items in events.items() if any(w for w, _ in items)
+    }
+    if not events:
+        return
+
+    floor = math.log(config('MIN_SCORE')) + rate() * time.time()
+    with transaction.atomic(savepoint=False):
+        # every post gets a row to lock, even one created concurrently
+        TrendingScore.objects.bulk_create(
+            [TrendingScore(post_id=post_id, score=EMPTY) for post_id in events],
+            ignore_conflicts=True,
+        )
+        kept, faded = [], []
+        for entry in TrendingScore.objects.select_for_update().filter(
+                pk__in=events).order_by('pk'):
+            entry.score = add_events(entry.score, events[entry.pk])
+            if entry.score >= floor:
+                kept.append(entry)
+            else:
+                faded.append(entry.pk)
+        TrendingScore.objects.bulk_update(kept, ['score'])
+        if faded:
+            TrendingScore.objects.filter(pk__in=faded).delete()
+
+
+def drop_faded() -> int:
+    """
+    Delete the scores worth less than MIN_SCORE by now, a range of the score
+    index. Returns the number of rows kept.
+    """
+    floor = math.log(config('MIN_SCORE')) + rate() * time.time()
+    TrendingScore.objects.filter(score__lt=floor).delete()
+    return TrendingScore.objects.count()
+
+
+def top_posts(limit: int) -> list:
+    """ Posts with the highest scores, read straight off the score index """
+    return [
+        entry.post for entry in TrendingScore.objects.select_related(
+            'post__author').order_by('-score')[:limit]
+    ]
@@ -2,11 +2,24 @@ from django.urls import path
 
 from .views import (FriendsPostsListView, PostCreateView, PostDetailView,
                     PostUpdateView, PostDeleteView, LikePostView,
-                    DislikePostView)
+                    DislikePostView, ReactionsToggleView,
+                    ReactionBufferStatsView, TrendingPostsView,
+                    PostSearchView, TaggedPostsListView,
+                    MentionedPostsListView)
 
 urlpatterns = [
     path('', FriendsPostsListView.as_view(), name='posts_list'),
     path('create/', PostCreateView.as_view(), name='post_create'),
+    path('trending/', TrendingPostsView.as_view(), name='posts_trending'),
+    path('search/', PostSearchView.as_view(), name='posts_search'),
+    path('tags/<str:tag>/', TaggedPostsListView.as_view(), name='posts_tagged'),
+    path('mentions/',
+         MentionedPostsListView.as_view(),
+         name='posts_mentioning_me'),
+    path('reactions/', ReactionsToggleView.as_view(), name='post_reactions'),
+    path('reactions/buffer/',
+         ReactionBufferStatsView.as_view(),
+         name='reaction_buffer_stats'),
     path('<str:pk>/', PostDetailView.as_view(), name='post_detail'),
     path('<str:pk>/update/', PostUpdateView.as_view(), name='post_update'),
     path('<str:pk>/delete/', PostDeleteView.as_view(), name='post_delete'),
@@ -1,16 +1,21 @@
 from rest_framework.generics import (ListAPIView, CreateAPIView,
                                      RetrieveAPIView, UpdateAPIView,
                                      DestroyAPIView)
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import NotFound
 
-from .models import Post
+from .models import Post, PostMention, PostTag, Reaction, TimelineEntry
+from comments.models import Comment
 from .serializers import (PostSerializer, FriendsPostsListSerializer,
-                          PostCreateSerializer)
+                          PostCreateSerializer, ReactionsToggleSerializer)
 from .permissions import IsPostAuthor
+from .pagination import FriendsPostsPagination, PostSearchPagination
+from .reactions import toggle_reactions
+from .buffer import get_reaction_buffer
+from . import search, trending
 
 
 class LikePostView(APIView):
@@ -18,33 +23,77 @@ class LikePostView(APIView):
     permission_classes = (IsAuthenticated, )
 
     def get(self, request, pk):
-        post = get_object_or_404(Post, pk=pk)
+        buffer = get_reaction_buffer()
+        if buffer is not None:
+            buffer.add(pk, request.user.pk, Reaction.Value.LIKE)
+            return Response({'detail': 'Accepted'},
+                            status=status.HTTP_202_ACCEPTED)
 
-        if post.like.filter(pk=request.user.pk).exists():
-            post.like.remove(request.user)
-        else:
-            post.dislike.remove(request.user)
-            post.like.add(request.user)
+        reacted = toggle_reactions(request.user.pk,
+                                   [(pk, Reaction.Value.LIKE)])
+        if not reacted:
+            raise NotFound()
 
         return Response({'detail': 'Success'}, status=status.HTTP_200_OK)
 
 
 class DislikePostView(APIView):
-    """ Like post or unlike """
+    """ Dislike post or undislike """
     permission_classes = (IsAuthenticated, )
 
     def get(self, request, pk):
-        post = get_object_or_404(Post, pk=pk)
+        buffer = get_reaction_buffer()
+        if buffer is not None:
+            buffer.add(pk, request.user.pk, Reaction.Value.DISLIKE)
+            return Response({'detail': 'Accepted'},
+                            status=status.HTTP_202_ACCEPTED)
 
-        if post.dislike.filter(pk=request.user.pk).exists():
-            post.dislike.remove(request.user)
-        else:
-            post.like.remove(request.user)
-            post.dislike.add(request.user)
+        reacted = toggle_reactions(request.user.pk,
+                                   [(pk, Reaction.Value.DISLIKE)])
+        if not reacted:
+            raise NotFound()
 
         return Response({'detail': 'Success'}, status=status.HTTP_200_OK)
 
 
+class ReactionsToggleView(APIView):
+    """ Toggle reactions on many posts in one request """
+    permission_classes = (IsAuthenticated, )
+
+    def post(self, request):
+        serializer = ReactionsToggleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        toggles = [(item['post'], Reaction.Value[item['reaction'].upper()])
+                   for item in serializer.validated_data['reactions']]
+        reacted = toggle_reactions(request.user.pk, toggles)
+
+        results = []
+        for post_id in dict.fromkeys(post_id for post_id, _ in toggles):
+            if post_id not in reacted:
+                results.append({'post': post_id, 'detail': 'Not found.'})
+                continue
+            value = reacted[post_id]
+            results.append({
+                'post': post_id,
+                'reaction': Reaction.Value(value).label if value else None,
+            })
+
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class ReactionBufferStatsView(APIView):
+    """ Backlog and flush latency of the reaction write-behind buffer """
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request):
+        buffer = get_reaction_buffer()
+        if buffer is None:
+            return Response({'enabled': False}, status=status.HTTP_200_OK)
+        return Response(dict(buffer.stats(), enabled=True),
+                        status=status.HTTP_200_OK)
+
+
 class PostDeleteView(DestroyAPIView):
     """ Delete a single post """
     queryset = Post.objects.all()
@@ -60,6 +109,19 @@ class PostDetailView(RetrieveAPIView):
     permission_classes = (IsAuthenticated, )
     lookup_field = 'pk'
 
+    def get_queryset(self):
+        return PostSerializer.optimize_queryset(Post.objects.all(),
+                                                self.request)
+
+
+class FirstCommentsMixin:
+    """ Batch load the first comments of listed posts, if they are rendered """
+
+    def prefetch_comments(self, posts: list) -> list:
+        if self.get_serializer_class().wants(self.request, 'comments'):
+            Comment.objects.prefetch_first(posts, limit=3)
+        return posts
+
 
 class PostUpdateView(UpdateAPIView, RetrieveAPIView):
     """ Update post data """
@@ -69,17 +131,98 @@ class PostUpdateView(UpdateAPIView, RetrieveAPIView):
     lookup_field = 'pk'
 
 
-class FriendsPostsListView(ListAPIView):
+class IndexedPostsListView(FirstCommentsMixin, ListAPIView):
+    """
+    Base for post lists read from an index table whose rows point at a post
+    and copy its created_at: pages are keyset range reads on that table.
+    """
+    serializer_class = FriendsPostsListSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = FriendsPostsPagination
+
+    def paginate_queryset(self, queryset) -> list:
+        """ Turn a page of index rows into posts with first comments """
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            page = self.prefetch_comments([entry.post for entry in page])
+        return page
+
+    def select_posts(self, queryset):
+        """ Join the posts, and their authors only if they are rendered """
+        if self.get_serializer_class().wants(self.request, 'author'):
+            return queryset.select_related('post__author')
+        return queryset.select_related('post')
+
+
+class FriendsPostsListView(IndexedPostsListView):
     """ Get a list of friends posts """
-    queryset = Post.objects.all()
+    queryset = TimelineEntry.objects.all()
+
+    def get_queryset(self):
+        """ Read the current user's materialized timeline """
+        return self.select_posts(
+            TimelineEntry.objects.filter(user=self.request.user))
+
+
+class TaggedPostsListView(IndexedPostsListView):
+    """ Get the own and friends' posts using a hashtag, newest first """
+
+    def get_queryset(self):
+        return self.select_posts(
+            PostTag.objects.filter(
+                search.visible_authors(self.request.user.pk,
+                                       'post__author_id'),
+                tag=self.kwargs['tag'].lstrip('#').lower()))
+
+
+class MentionedPostsListView(IndexedPostsListView):
+    """ Get the own and friends' posts mentioning the current user """
+
+    def get_queryset(self):
+        return self.select_posts(
+            PostMention.objects.filter(
+                search.visible_authors(self.request.user.pk,
+                                       'post__author_id'),
+                profile=self.request.user))
+
+
+class TrendingPostsView(FirstCommentsMixin, ListAPIView):
+    """ Get the posts with the most recent engagement """
     serializer_class = FriendsPostsListSerializer
     permission_classes = (IsAuthenticated, )
 
     def get_queryset(self) -> list:
-        """ Create a list of posts were created by current user friends """
-        fr_posts = Post.objects.filter(
-            author__in=self.request.user.friends.all())
-        return fr_posts
+        """ Top posts by decayed score, with their first comments """
+        try:
+            limit = int(self.request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 20
+        return self.prefetch_comments(
+            trending.top_posts(max(1, min(limit, 100))))
+
+
+class PostSearchView(FirstCommentsMixin, ListAPIView):
+    """ Full text search over the posts the user can see, best match first """
+    serializer_class = FriendsPostsListSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = PostSearchPagination
+
+    def get_queryset(self):
+        """ A search callable the paginator runs with its keyset and size """
+        query = self.request.query_params.get('q', '')
+        user_id = self.request.user.pk
+
+        def page(after, limit) -> list:
+            return search.search_posts(query, user_id, after=after,
+                                       limit=limit)
+
+        return page
+
+    def paginate_queryset(self, queryset) -> list:
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            page = self.prefetch_comments(page)
+        return page
 
 
 class PostCreateView(CreateAPIView):
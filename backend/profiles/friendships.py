@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Profile, FriendRequest
+
+Friendship = Profile.friends.through
+
+SENT, ALREADY_SENT, RECEIVED = 'sent', 'already_sent', 'received'
+FRIENDS, SELF, NOT_FOUND = 'already_friends', 'self', 'not_found'
+
+
+def relations(sender_id: int, receiver_ids) -> dict:
+    """
+    {receiver_id: FRIENDS | ALREADY_SENT | RECEIVED | None} for the
+    receivers that exist, read in one query.
+    """
+    friends = Friendship.objects.filter(
+        Q(from_profile_id=sender_id, to_profile_id=OuterRef('pk'))
+        | Q(from_profile_id=OuterRef('pk'), to_profile_id=sender_id))
+    sent = FriendRequest.objects.filter(sender_id=sender_id,
+                                        receiver_id=OuterRef('pk'))
+    received = FriendRequest.objects.filter(sender_id=OuterRef('pk'),
+                                            receiver_id=sender_id)
+    rows = Profile.objects.filter(pk__in=receiver_ids).annotate(
+        is_friend=Exists(friends),
+        is_sent=Exists(sent),
+        is_received=Exists(received)).values_list('pk', 'is_friend',
+                                                  'is_sent', 'is_received')
+    result = {}
+    for pk, is_friend, is_sent, is_received in rows:
+        result[pk] = (FRIENDS if is_friend else ALREADY_SENT if is_sent else
+                      RECEIVED if is_received else None)
+    return result
+
+
+def create_request(sender: Profile, receiver: Profile) -> FriendRequest:
+    """
+    Insert a request, or raise IntegrityError if the pair already has one:
+    the canonical pair constraint settles concurrent sends.
+    """
+    with transaction.atomic():
+        return FriendRequest.objects.create(sender=sender, receiver=receiver)
+
+
+def send_requests(sender_id: int, receiver_ids: list) -> list:
+    """
+    Send requests to many profiles in one transaction. Returns one
+    {'receiver', 'status', 'id'} result per distinct receiver, in order.
+    """
+    receiver_ids = list(dict.fromkeys(receiver_ids))
+    with transaction.atomic():
+        known = relations(sender_id, receiver_ids)
+        statuses = {}
+        for pk in receiver_ids:
+            if pk == sender_id:
+                statuses[pk] = SELF
+            elif pk not in known:
+                statuses[pk] = NOT_FOUND
+            else:
+                statuses[pk] = known[pk]
+        fresh = [pk for pk, status in statuses.items() if status is None]
+        FriendRequest.objects.bulk_create(
+            [
+                FriendRequest(sender_id=sender_id, receiver_id=pk)
+                for pk in fresh
+            ],
+            ignore_conflicts=True,
+        )
+        created = dict(
+            FriendRequest.objects.filter(
+                sender_id=sender_id,
+                receiver_id__in=fresh).values_list('receiver_id', 'pk'))
+
+    results = []
+    for pk in receiver_ids:
+        status = statuses[pk]
+        if status is None:
+            # a concurrent request from the other side won the pair
+            status = SENT if pk in created else RECEIVED
+        results.append({
+            'receiver': pk,
+            'status': status,
+            'id': created.get(pk) if status == SENT else None,
+        })
+    return results
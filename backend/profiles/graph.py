@@ -0,0 +1,229 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+Friendship = Profile.friends.through
+
+
+class FriendGraph:
+    """
+    Compressed sparse row adjacency of the friends relation.
+
+    `nodes` holds the sorted profile ids that have friends. The friends of
+    `nodes[i]` are `targets[offsets[i]:offsets[i + 1]]`, also sorted. The
+    arrays take 8 bytes per edge, plus 16 bytes per profile.
+
+    Friendships made or dropped after the build go to a small overlay of
+    added/removed pairs, which is merged on read and thrown away by the
+    next rebuild. Overlay sets are frozen and replaced, never changed in
+    place, so reads need no lock.
+    """
+
+    def __init__(self, nodes: array, offsets: array, targets: array):
+        self.nodes = nodes
+        self.offsets = offsets
+        self.targets = targets
+        self.added = {}
+        self.removed = {}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_edges(cls, edges) -> 'FriendGraph':
+        """ Build from (profile_id, friend_id) pairs sorted by both ids """
+        nodes, offsets, targets = array('q'), array('q'), array('q')
+        previous = None
+        for source, target in edges:
+            if source != previous:
+                nodes.append(source)
+                offsets.append(len(targets))
+                previous = source
+            targets.append(target)
+        offsets.append(len(targets))
+        return cls(nodes, offsets, targets)
+
+    @classmethod
+    def from_database(cls) -> 'FriendGraph':
+        edges = Friendship.objects.order_by(
+            'from_profile_id', 'to_profile_id').values_list(
+                'from_profile_id', 'to_profile_id').iterator(chunk_size=10000)
+        return cls.from_edges(edges)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a)
+                   for a in (self.nodes, self.offsets, self.targets))
+
+    def _row(self, profile_id: int):
+        i = bisect_left(self.nodes, profile_id)
+        if i == len(self.nodes) or self.nodes[i] != profile_id:
+            return ()
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def friends(self, profile_id: int) -> list:
+        """ Sorted friend ids of a profile, overlay included """
+        row = self._row(profile_id)
+        added = self.added.get(profile_id)
+        removed = self.removed.get(profile_id)
+        if not added and not removed:
+            return list(row)
+        ids = set(row)
+        ids.difference_update(removed or ())
+        ids.update(added or ())
+        return sorted(ids)
+
+    def add(self, profile_id: int, friend_id: int) -> None:
+        self.removed[profile_id] = self.removed.get(
+            profile_id, frozenset()) - {friend_id}
+        self.added[profile_id] = self.added.get(profile_id,
+                                                frozenset()) | {friend_id}
+
+    def remove(self, profile_id: int, friend_id: int) -> None:
+        self.added[profile_id] = self.added.get(profile_id,
+                                                frozenset()) - {friend_id}
+        self.removed[profile_id] = self.removed.get(
+            profile_id, frozenset()) | {friend_id}
+
+    def mutual_count(self, profile_id: int, other_id: int) -> int:
+        """ Size of the intersection of two sorted friend lists """
+        a, b = self.friends(profile_id), self.friends(other_id)
+        i = j = count = 0
+        while i < len(a) and j < len(b):
+            if a[i] == b[j]:
+                count, i, j = count + 1, i + 1, j + 1
+            elif a[i] < b[j]:
+                i += 1
+            else:
+                j += 1
+        return count
+
+    def suggestions(self, profile_id: int, limit: int = 10) -> list:
+        """
+        Friends of friends that are not friends yet, as (id, mutual count)
+        pairs ranked by the number of mutual friends, then by id.
+        """
+        friends = self.friends(profile_id)
+        known = set(friends)
+        known.add(profile_id)
+        counts = Counter()
+        for friend_id in friends:
+            counts.update(pk for pk in self.friends(friend_id)
+                          if pk not in known)
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+_graph = None
+# changes committed while a rebuild reads the database, replayed on the
+# new graph; None when no rebuild runs
+_pending = None
+_generation = 0
+_lock = threading.Lock()
+_first_build = threading.Lock()
+
+
+def ttl() -> float:
+    """ Seconds before the graph is rebuilt and its overlay folded in """
+    return getattr(settings, 'FRIEND_GRAPH', {}).get('TTL', 300)
+
+
+def get_friend_graph() -> FriendGraph:
+    """
+    Process wide graph. Only the very first call waits for a build; an
+    expired graph keeps being served while a thread rebuilds it.
+    """
+    global _pending
+    graph = _graph
+    if graph is None:
+        with _first_build:
+            if _graph is None:
+                return rebuild_friend_graph()
+            return _graph
+
+    if time.monotonic() - graph.built_at > ttl():
+        with _lock:
+            if _pending is None:
+                _pending = []
+                _start_rebuild()
+    return graph
+
+
+def _start_rebuild() -> None:
+    threading.Thread(target=_rebuild_logged,
+                     name='friend-graph-rebuild',
+                     daemon=True).start()
+
+
+def _rebuild_logged() -> None:
+    try:
+        rebuild_friend_graph()
+    except Exception:
+        logger.exception('Friend graph rebuild failed')
+        with _lock:
+            if _graph is not None:
+                # keep serving it, try again after another ttl
+                _graph.built_at = time.monotonic()
+    finally:
+        close_old_connections()
+
+
+def rebuild_friend_graph() -> FriendGraph:
+    """
+    Build the graph from the database and swap it in, with the changes
+    committed during the build replayed on it
+    """
+    global _graph, _pending
+    with _lock:
+        generation = _generation
+        if _pending is None:
+            _pending = []
+    try:
+        graph = FriendGraph.from_database()
+    except BaseException:
+        with _lock:
+            _pending = None
+        raise
+    with _lock:
+        if generation != _generation:
+            # reset meanwhile
+            return graph
+        for profile_id, friend_id, added in _pending:
+            _apply(graph, profile_id, friend_id, added)
+        _graph, _pending = graph, None
+    return graph
+
+
+def reset_friend_graph() -> None:
+    global _graph, _pending, _generation
+    with _lock:
+        _graph, _pending = None, None
+        _generation += 1
+
+
+def _apply(graph: FriendGraph, profile_id: int, friend_id: int,
+           added: bool) -> None:
+    if added:
+        graph.add(profile_id, friend_id)
+    else:
+        graph.remove(profile_id, friend_id)
+
+
+def friendship_changed(profile_id: int, friend_id: int, added: bool) -> None:
+    """ Apply a committed friendship change to the graph, if one is built """
+    with _lock:
+        if _pending is not None:
+            _pending.append((profile_id, friend_id, added))
+        if _graph is not None:
+            _apply(_graph, profile_id, friend_id, added)
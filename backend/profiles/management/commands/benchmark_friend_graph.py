@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from profiles.graph import FriendGraph
+
+
+def synthetic_edges(profiles: int, edges: int, rng: random.Random):
+    """ Sorted random edges, `edges / profiles` friends per profile """
+    degree = max(1, edges // profiles)
+    population = range(1, profiles + 1)
+    for source in population:
+        friends = [
+            pk for pk in rng.sample(population, degree + 1) if pk != source
+        ][:degree]
+        for target in sorted(friends):
+            yield source, target
+
+
+class Command(BaseCommand):
+    help = 'Time the friend graph on a synthetic graph, without the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=100000)
+        parser.add_argument('--edges', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        profiles, queries = options['profiles'], options['queries']
+
+        started = time.perf_counter()
+        graph = FriendGraph.from_edges(
+            synthetic_edges(profiles, options['edges'], rng))
+        build = time.perf_counter() - started
+        self.stdout.write(
+            f'built {graph.edge_count} edges over {len(graph.nodes)} '
+            f'profiles in {build:.2f}s, {graph.nbytes() / 2**20:.1f} MiB')
+
+        sample = [rng.randint(1, profiles) for _ in range(queries)]
+        for profile_id in sample[:queries // 10]:
+            graph.add(profile_id, rng.randint(1, profiles))
+
+        started = time.perf_counter()
+        for profile_id in sample:
+            graph.suggestions(profile_id, limit=10)
+        suggestions = (time.perf_counter() - started) / queries
+
+        started = time.perf_counter()
+        for profile_id, other_id in zip(sample, reversed(sample)):
+            graph.mutual_count(profile_id, other_id)
+        mutual = (time.perf_counter() - started) / queries
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'suggestions: {suggestions * 1000:.3f} ms/query, '
+                f'mutual count: {mutual * 1000:.3f} ms/query'))
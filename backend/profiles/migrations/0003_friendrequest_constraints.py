@@ -0,0 +1,39 @@
+# Generated by Django 4.1.4 on 2026-10-18 17:40
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+def dedupe_requests(apps, schema_editor):
+    """ Drop self requests and keep only the oldest request of each pair """
+    FriendRequest = apps.get_model('profiles', 'FriendRequest')
+    FriendRequest.objects.filter(sender=models.F('receiver')).delete()
+    seen, duplicates = set(), []
+    for pk, sender_id, receiver_id in FriendRequest.objects.order_by(
+            'created_at', 'pk').values_list('pk', 'sender_id', 'receiver_id'):
+        pair = (min(sender_id, receiver_id), max(sender_id, receiver_id))
+        if pair in seen:
+            duplicates.append(pk)
+        seen.add(pair)
+    for start in range(0, len(duplicates), 500):
+        FriendRequest.objects.filter(
+            pk__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_profile_lower_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='friendrequest',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Least('sender', 'receiver'), django.db.models.functions.comparison.Greatest('sender', 'receiver'), name='friendrequest_unique_pair'),
+        ),
+        migrations.AddConstraint(
+            model_name='friendrequest',
+            constraint=models.CheckConstraint(check=models.Q(('sender', models.F('receiver')), _negated=True), name='friendrequest_not_self'),
+        ),
+    ]
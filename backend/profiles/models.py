@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Greatest, Least, Lower
 from django.contrib.auth.models import AbstractUser
 
 
@@ -18,6 +19,13 @@ class Profile(AbstractUser):
         'username',
     ]
 
+    class Meta(AbstractUser.Meta):
+        # case-insensitive prefix search reads ranges of these indexes
+        indexes = [
+            models.Index(Lower('username'), name='profile_username_lower_idx'),
+            models.Index(Lower('email'), name='profile_email_lower_idx'),
+        ]
+
 
 class FriendRequest(models.Model):
     """ Profile to profile friend request table """
@@ -33,5 +41,15 @@ class FriendRequest(models.Model):
                                  related_name='receiver')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # one pending request per pair of profiles, whoever sent it
+            models.UniqueConstraint(Least('sender', 'receiver'),
+                                    Greatest('sender', 'receiver'),
+                                    name='friendrequest_unique_pair'),
+            models.CheckConstraint(check=~models.Q(sender=models.F('receiver')),
+                                   name='friendrequest_not_self'),
+        ]
+
     def __str__(self) -> str:
         return f"{self.sender.email} --> {self.receiver.email}: {self.created_at}"
@@ -0,0 +1,74 @@
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .graph import Friendship
+
+
+def cache_key(profile_id: int) -> str:
+    return f'profiles:friend_ids:{profile_id}'
+
+
+def timeout() -> int:
+    return getattr(settings, 'FRIEND_IDS_CACHE_TIMEOUT', 600)
+
+
+def friend_ids_many(profile_ids) -> dict:
+    """
+    {profile_id: sorted array of friend ids}, read from the cache. Misses
+    are loaded together in one query and written back.
+    """
+    profile_ids = set(profile_ids)
+    keys = {cache_key(pk): pk for pk in profile_ids}
+    cached = cache.get_many(keys)
+    found = {keys[key]: ids for key, ids in cached.items()}
+    missing = profile_ids - set(found)
+    if missing:
+        loaded = {pk: array('q') for pk in missing}
+        for profile_id, friend_id in Friendship.objects.filter(
+                from_profile_id__in=missing).order_by(
+                    'from_profile_id', 'to_profile_id').values_list(
+                        'from_profile_id', 'to_profile_id'):
+            loaded[profile_id].append(friend_id)
+        cache.set_many({cache_key(pk): ids
+                        for pk, ids in loaded.items()}, timeout())
+        found.update(loaded)
+    return found
+
+
+def friend_ids(profile_id: int) -> array:
+    return friend_ids_many([profile_id])[profile_id]
+
+
+def invalidate(*profile_ids) -> None:
+    """ Forget cached friend lists, called when a friendship changes """
+    cache.delete_many([cache_key(pk) for pk in profile_ids])
+
+
+def intersect(a, b) -> list:
+    """ Common values of two sorted sequences, in one merge pass """
+    common, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            common.append(a[i])
+            i, j = i + 1, j + 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return common
+
+
+def mutual_friend_ids(profile_id: int, other_id: int) -> list:
+    ids = friend_ids_many([profile_id, other_id])
+    return intersect(ids[profile_id], ids[other_id])
+
+
+def mutual_counts(profile_id: int, other_ids) -> dict:
+    """ {other_id: number of friends in common with profile_id} """
+    ids = friend_ids_many([profile_id, *other_ids])
+    return {
+        other_id: len(intersect(ids[profile_id], ids[other_id]))
+        for other_id in other_ids
+    }
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class ProfilesPagination(CursorPagination):
+    """ Keyset pagination for the profile directory, in signup order """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('id', )
+
+
+class MutualFriendsPagination(LimitOffsetPagination):
+    """ Offset pagination over a precomputed list of mutual friend ids """
+    default_limit = 20
+    max_limit = 100
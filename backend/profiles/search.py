@@ -0,0 +1,103 @@
+import string
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Profile
+from .graph import get_friend_graph
+
+FRIEND, FRIEND_OF_FRIEND, OTHER = 'friend', 'friend_of_friend', None
+# how many prefix matches per field are read from each expression index
+CANDIDATES = 50
+# most friend of friend ids sent to the database in one IN list
+FRIENDS_OF_FRIENDS = 500
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def fold(text: str) -> str:
+    """
+    Lowercase `text` the way the database's LOWER() does. SQLite only folds
+    ASCII letters, so there other letters match case-sensitively.
+    """
+    if connection.vendor == 'sqlite':
+        return text.translate(ASCII_LOWER)
+    return text.lower()
+
+
+def prefix_range(prefix: str) -> tuple:
+    """ [prefix, upper) bounds that hold exactly the strings with prefix """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def prefix_filter(prefix: str) -> Q:
+    low, high = prefix_range(prefix)
+    return (Q(username_lower__gte=low, username_lower__lt=high)
+            | Q(email_lower__gte=low, email_lower__lt=high))
+
+
+def friends_of_friends(graph, user_id: int, friends: set) -> set:
+    """ Up to FRIENDS_OF_FRIENDS ids two hops away that are not friends """
+    found = set()
+    for friend_id in sorted(friends):
+        for other_id in graph.friends(friend_id):
+            if other_id != user_id and other_id not in friends:
+                found.add(other_id)
+                if len(found) == FRIENDS_OF_FRIENDS:
+                    return found
+    return found
+
+
+def search_profiles(user_id: int, query: str, limit: int = 10) -> list:
+    """
+    Profiles whose username or email starts with `query`, case-insensitive.
+    Friends rank first, then friends of friends, then everyone else, each
+    group by username.
+
+    Every read is a range scan on an index over Lower(username) or
+    Lower(email). General matches are capped per field; friends and
+    friends of friends are read separately so they are never pushed out
+    by strangers.
+    """
+    prefix = fold(query.strip())
+    if not prefix:
+        return []
+
+    graph = get_friend_graph()
+    friends = set(graph.friends(user_id))
+    profiles = Profile.objects.only(
+        'id', 'email', 'username', 'image').annotate(
+            username_lower=Lower('username'),
+            email_lower=Lower('email')).exclude(pk=user_id)
+    low, high = prefix_range(prefix)
+
+    found = {}
+    for circle in (friends, friends_of_friends(graph, user_id, friends)):
+        if len(found) >= limit or not circle:
+            break
+        for profile in profiles.filter(
+                prefix_filter(prefix),
+                pk__in=circle).order_by('username_lower',
+                                        'pk')[:limit - len(found)]:
+            found[profile.pk] = profile
+    for field in ('username_lower', 'email_lower'):
+        matches = profiles.filter(**{
+            f'{field}__gte': low,
+            f'{field}__lt': high
+        }).order_by(field)[:CANDIDATES]
+        for profile in matches:
+            found.setdefault(profile.pk, profile)
+
+    def relation(profile: Profile):
+        if profile.pk in friends:
+            return FRIEND
+        if not friends.isdisjoint(graph.friends(profile.pk)):
+            return FRIEND_OF_FRIEND
+        return OTHER
+
+    ranks = {FRIEND: 0, FRIEND_OF_FRIEND: 1, OTHER: 2}
+    for profile in found.values():
+        profile.relation = relation(profile)
+    ranked = sorted(found.values(),
+                    key=lambda p: (ranks[p.relation], p.username_lower, p.pk))
+    return ranked[:limit]
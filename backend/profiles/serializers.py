@@ -1,9 +1,17 @@
-from rest_framework.serializers import (ModelSerializer, CharField,
-                                        ValidationError, SerializerMethodField)
+from django.db import IntegrityError
+from rest_framework.serializers import (Serializer, ModelSerializer,
+                                        CharField, IntegerField, ListField,
+                                        ValidationError,
+                                        SerializerMethodField)
 
 from .models import Profile, FriendRequest
+from . import friendships
 from posts.models import Post
 from posts.serializers import PostSerializer
+from comments.models import Comment
+from comments.pagination import CommentsPagination
+from uploads.serializers import ImageDerivativesField
+from core.serializers import SparseFieldsMixin
 
 ##########################:: Friend requests ::#################################
 
@@ -17,79 +25,116 @@ class FriendRequestSerializer(ModelSerializer):
         fields = ('id', 'sender', 'created_at')
 
     def get_sender(self, obj):
-        profile = Profile.objects.filter(pk=obj.sender.pk).first()
-        serializer = ProfileSerializer(profile)
+        serializer = ProfileSerializer(obj.sender)
         return serializer.data
 
 
 class FriendRequestCreateSerializer(ModelSerializer):
     """ Serializer for friend request """
+    messages = {
+        friendships.ALREADY_SENT: 'Request has sent already',
+        friendships.RECEIVED: 'The user has sent request to you already',
+        friendships.FRIENDS: 'This user is in your friend list already.',
+    }
 
     class Meta:
         model = FriendRequest
         fields = ('id', 'sender', 'receiver', 'created_at')
+        # pairs are enforced by a database constraint, see create()
+        validators = []
 
     def validate(self, data: dict):
         user1: object = data['sender']
         user2: object = data['receiver']
 
-        # check wether sender sent a request before
-        req_from_user1 = FriendRequest.objects.filter(sender=user1,
-                                                      receiver=user2).first()
-        if req_from_user1 != None:
-            raise ValidationError({'message': 'Request has sent already'})
-
-        # check wether receiver sent a request to sender before
-        req_from_user2 = FriendRequest.objects.filter(sender=user2,
-                                                      receiver=user1).first()
-        if req_from_user2 != None:
+        if user1 == user2:
             raise ValidationError(
-                {'message': 'The user has sent request to you already'})
+                {'message': 'You can not send a request to yourself.'})
 
-        if user1 in user2.friends.all():
-            raise ValidationError(
-                {'message': 'This user is in your friend list already.'})
+        # pending requests and friendship, both directions, in one query
+        relation = friendships.relations(user1.pk, [user2.pk])[user2.pk]
+        if relation is not None:
+            raise ValidationError({'message': self.messages[relation]})
 
         return data
 
+    def create(self, validated_data):
+        """ A concurrent send of the same pair loses on the constraint """
+        try:
+            return friendships.create_request(validated_data['sender'],
+                                              validated_data['receiver'])
+        except IntegrityError:
+            # raised after validation, so DRF won't wrap the message in a list
+            raise ValidationError(
+                {'message': [self.messages[friendships.ALREADY_SENT]]})
+
+
+class FriendRequestBulkCreateSerializer(Serializer):
+    """ Receivers of friend requests sent by the current user at once """
+    receivers = ListField(child=IntegerField(),
+                          allow_empty=False,
+                          max_length=100)
+
 
 #######################:: Profile detail/update ::##############################
 
 
-class ProfileSerializer(ModelSerializer):
+class ProfileSerializer(SparseFieldsMixin, ModelSerializer):
     """ Serializer for Profile """
+    image_derivatives = ImageDerivativesField(source='image')
 
     class Meta:
         model = Profile
-        fields = ('id', 'email', 'username', 'image')
+        fields = ('id', 'email', 'username', 'image', 'image_derivatives')
+
+
+class ProfileSuggestionSerializer(ProfileSerializer):
+    """ Suggested profile with the number of friends in common """
+    mutual_friends = IntegerField(read_only=True)
+
+    class Meta(ProfileSerializer.Meta):
+        fields = ProfileSerializer.Meta.fields + ('mutual_friends', )
+
+
+class ProfileSearchSerializer(ProfileSerializer):
+    """ Search hit with its relation to the caller: friend, friend_of_friend
+    or null """
+    relation = CharField(read_only=True, allow_null=True)
+
+    class Meta(ProfileSerializer.Meta):
+        fields = ProfileSerializer.Meta.fields + ('relation', )
 
 
-class ProfileDetailSerializer(ModelSerializer):
+class ProfileDetailSerializer(SparseFieldsMixin, ModelSerializer):
     """ Serializer for Profile """
+    image_derivatives = ImageDerivativesField(source='image')
     friend_requests = SerializerMethodField()
     friends = SerializerMethodField()
     posts = SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = ('id', 'email', 'username', 'image', 'friends',
-                  'friend_requests', 'posts')
+        fields = ('id', 'email', 'username', 'image', 'image_derivatives',
+                  'friends', 'friend_requests', 'posts')
+        prefetch_related_fields = {'friends': ('friends', )}
 
     def get_posts(self, obj):
         """ Show only posts created by current user """
-        user_posts = Post.objects.filter(author=obj)
+        user_posts = list(Post.objects.filter(author=obj))
+        Comment.objects.prefetch_first(user_posts,
+                                       limit=CommentsPagination.page_size)
         serializer = PostSerializer(user_posts, many=True)
         return serializer.data
 
     def get_friends(self, obj):
         """ Show only current user's friends """
-        friend_list = Profile.objects.filter(pk=obj.pk).first().friends
-        serializer = ProfileSerializer(friend_list, many=True)
+        serializer = ProfileSerializer(obj.friends.all(), many=True)
         return serializer.data
 
     def get_friend_requests(self, obj):
         """ Get a list of all requests sent to current user """
-        reqs = FriendRequest.objects.filter(receiver=obj.id)
+        reqs = FriendRequest.objects.filter(
+            receiver=obj.id).select_related('sender')
         serializer = FriendRequestSerializer(reqs, many=True)
         return serializer.data
 
@@ -0,0 +1,35 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .models import Profile
+from . import graph, mutual
+
+
+@receiver(m2m_changed, sender=Profile.friends.through)
+def sync_friend_graph(sender, instance: Profile, action: str, reverse: bool,
+                      pk_set: set, **kwargs):
+    """
+    Mirror added and removed friends into the in-memory graph and drop the
+    changed profiles' cached friend lists, once committed
+    """
+    if action == 'pre_clear':
+        related = instance.profile_set if reverse else instance.friends
+        pk_set = set(related.values_list('pk', flat=True))
+        action = 'post_remove'
+
+    if action not in ('post_add', 'post_remove'):
+        return
+
+    changed = set()
+    for pk in pk_set:
+        profile_pk, friend_pk = (pk, instance.pk) if reverse else (instance.pk,
+                                                                   pk)
+        changed.add(profile_pk)
+        transaction.on_commit(
+            partial(graph.friendship_changed, profile_pk, friend_pk,
+                    action == 'post_add'))
+    if changed:
+        transaction.on_commit(partial(mutual.invalidate, *changed))
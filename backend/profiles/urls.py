@@ -4,7 +4,10 @@ from .authentication import RegisterView, LoginView, LogoutView
 from .views import (ProfileDetailView, ProfileUpdateView,
                     FriendRequestCreateView, FriendRequestAcceptView,
                     FriendRequestRefuseView, RemoveFriendView,
-                    ProfileFriendsListView, ProfilesListView)
+                    ProfileFriendsListView, ProfilesListView,
+                    ProfileSuggestionsView, MutualFriendsListView,
+                    MutualFriendsCountView, ProfileSearchView,
+                    FriendRequestBulkCreateView)
 
 urlpatterns = [
     # profile auth
@@ -14,7 +17,20 @@ urlpatterns = [
 
     # profile detail/update
     path('all/', ProfilesListView.as_view(), name='profiles_list'),
+    path('search/', ProfileSearchView.as_view(), name='profiles_search'),
+    path('send_friend_requests/',
+         FriendRequestBulkCreateView.as_view(),
+         name='send_friend_requests'),
+    path('suggestions/',
+         ProfileSuggestionsView.as_view(),
+         name='profile_suggestions'),
+    path('mutual_counts/',
+         MutualFriendsCountView.as_view(),
+         name='mutual_friends_counts'),
     path('<str:pk>/', ProfileDetailView.as_view(), name='profile_detail'),
+    path('<str:pk>/mutual/',
+         MutualFriendsListView.as_view(),
+         name='mutual_friends'),
     path('<str:pk>/update/',
          ProfileUpdateView.as_view(),
          name='profile_update'),
@@ -4,11 +4,19 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 
 from .models import Profile, FriendRequest
 from .serializers import (ProfileDetailSerializer, ProfileSerializer,
-                          FriendRequestCreateSerializer)
+                          FriendRequestCreateSerializer,
+                          ProfileSuggestionSerializer,
+                          ProfileSearchSerializer,
+                          FriendRequestBulkCreateSerializer)
 from .permissions import IsProfileOwner
+from .graph import get_friend_graph
+from .pagination import MutualFriendsPagination, ProfilesPagination
+from .search import search_profiles
+from . import friendships, mutual
 
 
 class ProfileDetailView(RetrieveAPIView):
@@ -18,6 +26,10 @@ class ProfileDetailView(RetrieveAPIView):
     permission_classes = (IsAuthenticated, )
     lookup_field = 'pk'
 
+    def get_queryset(self):
+        return ProfileDetailSerializer.optimize_queryset(
+            Profile.objects.all(), self.request)
+
 
 class ProfileUpdateView(UpdateAPIView, RetrieveAPIView):
     """ Display profile data and update one """
@@ -40,6 +52,18 @@ class FriendRequestCreateView(CreateAPIView):
     )
 
 
+class FriendRequestBulkCreateView(APIView):
+    """ Send friend requests to many profiles, with a result per profile """
+    permission_classes = (IsAuthenticated, )
+
+    def post(self, request):
+        serializer = FriendRequestBulkCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = friendships.send_requests(
+            request.user.pk, serializer.validated_data['receivers'])
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
 class FriendRequestAcceptView(APIView):
     permission_classes = (IsAuthenticated, )
     """ Accept a friend request and add user to friend list """
@@ -130,7 +154,87 @@ class ProfileFriendsListView(APIView):
 
 
 class ProfilesListView(ListAPIView):
-    """ List of all profiles """
+    """ List of all profiles, page by page """
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
-    permission_classes = (IsAuthenticated, )
\ No newline at end of file
+    permission_classes = (IsAuthenticated, )
+    pagination_class = ProfilesPagination
+
+
+class ProfileSearchView(ListAPIView):
+    """ Typeahead over usernames and emails, friends ranked first """
+    serializer_class = ProfileSearchSerializer
+    permission_classes = (IsAuthenticated, )
+
+    def get_queryset(self) -> list:
+        try:
+            limit = int(self.request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        return search_profiles(self.request.user.pk,
+                               self.request.query_params.get('q', ''),
+                               max(1, min(limit, 20)))
+
+
+class ProfileSuggestionsView(ListAPIView):
+    """ People the current user may know: friends of friends, best first """
+    serializer_class = ProfileSuggestionSerializer
+    permission_classes = (IsAuthenticated, )
+
+    def get_queryset(self) -> list:
+        try:
+            limit = int(self.request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        ranked = get_friend_graph().suggestions(self.request.user.pk,
+                                                max(1, min(limit, 50)))
+        profiles = Profile.objects.in_bulk([pk for pk, _ in ranked])
+        suggestions = []
+        for pk, mutual in ranked:
+            if pk in profiles:
+                profiles[pk].mutual_friends = mutual
+                suggestions.append(profiles[pk])
+        return suggestions
+
+
+class MutualFriendsListView(ListAPIView):
+    """ Friends the current user and a profile have in common """
+    serializer_class = ProfileSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = MutualFriendsPagination
+
+    def get_queryset(self) -> list:
+        """ Sorted ids of the mutual friends; profiles load per page """
+        other = Profile.objects.filter(pk=self.kwargs.get('pk')).first()
+        if other is None:
+            raise NotFound()
+        return mutual.mutual_friend_ids(self.request.user.pk, other.pk)
+
+    def paginate_queryset(self, queryset) -> list:
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            profiles = Profile.objects.in_bulk(page)
+            page = [profiles[pk] for pk in page if pk in profiles]
+        return page
+
+
+class MutualFriendsCountView(APIView):
+    """ Mutual friend counts between the current user and many profiles """
+    permission_classes = (IsAuthenticated, )
+    max_ids = 100
+
+    def get(self, request):
+        try:
+            ids = [
+                int(pk) for pk in request.query_params.get('ids', '').split(',')
+                if pk.strip()
+            ]
+        except ValueError:
+            raise ValidationError({'ids': 'Expected comma separated ids.'})
+        if len(ids) > self.max_ids:
+            raise ValidationError(
+                {'ids': f'At most {self.max_ids} ids per request.'})
+
+        counts = mutual.mutual_counts(request.user.pk, ids)
+        return Response({str(pk): count for pk, count in counts.items()},
+                        status=status.HTTP_200_OK)
@@ -0,0 +1,322 @@
+import asyncio
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import channel_layers
+from channels.testing import WebsocketCommunicator
+from django.db.models.signals import pre_save
+
+from profiles.models import Profile
+from chat.consumers import RoomConsumer
+from chat.models import Room, Message
+from chat import writer
+
+SLOW_WRITE = 0.3
+
+
+@pytest.fixture
+def in_memory_layer(settings):
+    settings.CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer'
+        }
+    }
+    channel_layers.backends.clear()
+    yield
+    channel_layers.backends.clear()
+
+
+@pytest.fixture
+def room() -> Room:
+    initiator = Profile.objects.create_user(email='test_email@email.com',
+                                            username='test_user',
+                                            password='test_pass')
+    receiver = Profile.objects.create_user(email='test_email2@email.com',
+                                           username='test_user2',
+                                           password='test_pass2')
+    return Room.objects.create(initiator=initiator, receiver=receiver)
+
+
+@pytest.fixture
+def slow_writes():
+    def receiver(**kwargs):
+        time.sleep(SLOW_WRITE)
+
+    pre_save.connect(receiver, sender=Message)
+    yield
+    pre_save.disconnect(receiver, sender=Message)
+
+
+def connect(user=None) -> WebsocketCommunicator:
+    communicator = WebsocketCommunicator(RoomConsumer.as_asgi(), '/ws/chat/')
+    if user is not None:
+        communicator.scope['user'] = user
+    return communicator
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_message_does_not_block_loop(in_memory_layer, room: Room,
+                                            slow_writes) -> None:
+    gaps = []
+
+    async def heartbeat(stop: asyncio.Event):
+        last = time.monotonic()
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            gaps.append(now - last)
+            last = now
+
+    async def scenario():
+        sender, listener = connect(room.initiator), connect(room.receiver)
+        for communicator in (sender, listener):
+            assert (await communicator.connect())[0]
+            await communicator.send_json_to({'action': 'join_room',
+                                             'pk': room.pk, 'request_id': 1})
+        await listener.send_json_to({'action': 'subscribe_to_messages_in_room',
+                                     'pk': room.pk, 'request_id': 2})
+        await listener.receive_nothing()
+
+        stop = asyncio.Event()
+        beat = asyncio.create_task(heartbeat(stop))
+        started = time.monotonic()
+        await sender.send_json_to({'action': 'create_message',
+                                   'message': {'text': 'hi'},
+                                   'request_id': 3})
+        events = [await listener.receive_json_from(timeout=5) for _ in range(2)]
+        elapsed = time.monotonic() - started
+        stop.set()
+        await beat
+        for communicator in (sender, listener):
+            await communicator.disconnect()
+        return {event['action']: event for event in events}, elapsed
+
+    events, elapsed = async_to_sync(scenario)()
+    event = events['create']
+    assert event['data']['text'] == 'hi'
+    assert event['data']['sender'] == room.initiator.pk
+    assert elapsed >= SLOW_WRITE
+    assert max(gaps) < SLOW_WRITE / 2
+    assert Message.objects.get().sender == room.initiator
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_message_requires_join(in_memory_layer, room: Room) -> None:
+    async def scenario():
+        communicator = connect(room.initiator)
+        await communicator.connect()
+        await communicator.send_json_to({'action': 'create_message',
+                                         'message': {'text': 'hi'},
+                                         'request_id': 1})
+        response = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return response
+
+    response = async_to_sync(scenario)()
+    assert response['errors'] == [{'detail': 'Join a room first.'}]
+    assert response['response_status'] == 400
+    assert not Message.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_mark_read_requires_login(in_memory_layer, room: Room) -> None:
+    async def scenario():
+        anonymous, member = connect(), connect(room.initiator)
+        responses = []
+        for communicator in (anonymous, member):
+            await communicator.connect()
+            await communicator.send_json_to({'action': 'mark_read',
+                                             'message_id': 1,
+                                             'request_id': 1})
+            responses.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+        return responses
+
+    anonymous, member = async_to_sync(scenario)()
+    assert anonymous['response_status'] == 401
+    assert member['errors'] == [{'detail': 'Join a room first.'}]
+    assert member['response_status'] == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_message_legacy_sender(in_memory_layer, room: Room) -> None:
+    async def scenario():
+        communicator = connect()
+        await communicator.connect()
+        await communicator.send_json_to({'action': 'join_room',
+                                         'pk': room.pk, 'request_id': 1})
+        await communicator.send_json_to({'action': 'create_message',
+                                         'message': {'text': 'hi',
+                                                     'sender': 'test_user2',
+                                                     'room': room.pk},
+                                         'request_id': 2})
+        await communicator.receive_nothing()
+        await communicator.disconnect()
+
+    async_to_sync(scenario)()
+    assert Message.objects.get().sender == room.receiver
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_older(in_memory_layer, room: Room, settings) -> None:
+    settings.CHAT_HISTORY = {'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 2}
+    for number in range(3):
+        Message.objects.create(room=room, sender=room.initiator,
+                               text=str(number))
+
+    async def scenario():
+        communicator = connect(room.initiator)
+        await communicator.connect()
+        await communicator.send_json_to({'action': 'join_room',
+                                         'pk': room.pk, 'request_id': 1})
+        await communicator.send_json_to({'action': 'retrieve',
+                                         'pk': room.pk, 'request_id': 2})
+        newest = await communicator.receive_json_from()
+        await communicator.send_json_to({
+            'action': 'load_older',
+            'before': newest['data']['message_set_before'],
+            'request_id': 3,
+        })
+        older = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return newest, older
+
+    newest, older = async_to_sync(scenario)()
+    assert [message['text'] for message in newest['data']['message_set']] == ['1', '2']
+    assert older['action'] == 'load_older'
+    assert [message['text'] for message in older['data']['results']] == ['0']
+    assert older['data']['before'] is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_unread_counts_pushed(in_memory_layer, room: Room) -> None:
+    async def scenario():
+        sender, reader = connect(room.initiator), connect(room.receiver)
+        for communicator in (sender, reader):
+            await communicator.connect()
+            await communicator.send_json_to({'action': 'join_room',
+                                             'pk': room.pk, 'request_id': 1})
+        await sender.send_json_to({'action': 'create_message',
+                                   'message': {'text': 'hi'},
+                                   'request_id': 2})
+        pushed = await reader.receive_json_from(timeout=5)
+        await reader.send_json_to({'action': 'mark_read',
+                                   'message_id': await last_message_id(),
+                                   'request_id': 3})
+        responses = [await reader.receive_json_from(timeout=5) for _ in range(2)]
+        await sender.receive_nothing()
+        for communicator in (sender, reader):
+            await communicator.disconnect()
+        return pushed, {response['action']: response for response in responses}
+
+    @database_sync_to_async
+    def last_message_id():
+        return Message.objects.get().pk
+
+    pushed, responses = async_to_sync(scenario)()
+    message = Message.objects.get()
+    assert pushed['action'] == 'unread'
+    assert pushed['data'] == {'room': room.pk, 'unread_count': 1,
+                              'last_read_message': None}
+    assert responses['mark_read']['data'] == {'room': room.pk,
+                                              'last_read_message': message.pk,
+                                              'unread_count': 0}
+    assert responses['unread']['data']['unread_count'] == 0
+
+
+@pytest.fixture
+def message_writer(settings, monkeypatch):
+    def enable(**config):
+        settings.CHAT_WRITER = {'ENABLED': True, 'FLUSH_INTERVAL': 0.005, **config}
+        monkeypatch.setattr(writer, '_writer', None)
+        return writer.get_message_writer()
+
+    return enable
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_message_batched(in_memory_layer, room: Room, message_writer) -> None:
+    message_writer(FLUSH_INTERVAL=60)
+
+    async def scenario():
+        sender, listener = connect(room.initiator), connect(room.receiver)
+        for communicator in (sender, listener):
+            await communicator.connect()
+            await communicator.send_json_to({'action': 'join_room',
+                                             'pk': room.pk, 'request_id': 1})
+        await listener.send_json_to({'action': 'subscribe_to_messages_in_room',
+                                     'pk': room.pk, 'request_id': 2})
+        await listener.receive_nothing()
+        await sender.send_json_to({'action': 'create_message',
+                                   'message': {'text': 'hi'},
+                                   'request_id': 3})
+        reply = await sender.receive_json_from(timeout=5)
+        event = await listener.receive_json_from(timeout=5)
+        for communicator in (sender, listener):
+            await communicator.disconnect()
+        return reply, event
+
+    reply, event = async_to_sync(scenario)()
+    assert reply['response_status'] == 202
+    assert event['action'] == 'create'
+    assert event['pk'] == reply['data']['id']
+    assert event['data'] == reply['data']
+    # broadcast before anything is written
+    assert not Message.objects.exists()
+    assert writer.get_message_writer().flush() == 1
+    message = Message.objects.get()
+    assert (message.pk, message.sender, message.text) == (reply['data']['id'], room.initiator, 'hi')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_message_batched_committed(in_memory_layer, room: Room,
+                                          message_writer) -> None:
+    message_writer(DURABILITY=writer.COMMITTED)
+
+    async def scenario():
+        communicator = connect(room.initiator)
+        await communicator.connect()
+        await communicator.send_json_to({'action': 'join_room',
+                                         'pk': room.pk, 'request_id': 1})
+        for number in range(3):
+            await communicator.send_json_to({'action': 'create_message',
+                                             'message': {'text': str(number)},
+                                             'request_id': 2 + number})
+        replies = [await communicator.receive_json_from(timeout=5) for _ in range(3)]
+        await communicator.disconnect()
+        return replies
+
+    replies = async_to_sync(scenario)()
+    assert [reply['response_status'] for reply in replies] == [201] * 3
+    assert sorted(Message.objects.values_list('pk', flat=True)) == sorted(
+        reply['data']['id'] for reply in replies)
+    room.refresh_from_db()
+    assert room.last_message.text == '2'
+    assert writer.get_message_writer().stats()['flushed'] == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_message_batched_commit_timeout(in_memory_layer, room: Room,
+                                               message_writer) -> None:
+    message_writer(DURABILITY=writer.COMMITTED, FLUSH_INTERVAL=60,
+                   COMMIT_TIMEOUT=0.1)
+
+    async def scenario():
+        communicator = connect(room.initiator)
+        await communicator.connect()
+        await communicator.send_json_to({'action': 'join_room',
+                                         'pk': room.pk, 'request_id': 1})
+        await communicator.send_json_to({'action': 'create_message',
+                                         'message': {'text': 'hi'},
+                                         'request_id': 2})
+        reply = await communicator.receive_json_from(timeout=5)
+        await communicator.disconnect()
+        return reply
+
+    reply = async_to_sync(scenario)()
+    assert reply['response_status'] == 202
+    # the message is still written once its batch is flushed
+    assert writer.get_message_writer().flush() == 1
+    assert Message.objects.get().pk == reply['data']['id']
@@ -1,6 +1,8 @@
 from django.urls import reverse, resolve
 
-from chat.views import (ChatRoomView, MyChatsListView, DeleteChatView, CreateRoomView)
+from chat.views import (ChatRoomView, MyChatsListView, DeleteChatView, CreateRoomView,
+                        RoomMessagesListView, MarkRoomReadView,
+                        MessageWriterStatsView)
 
 def test_chat_room_url():
     assert resolve(reverse('chat_room',
@@ -18,3 +20,19 @@ def test_delete_chat_room_url():
 def test_create_room_url():
     assert resolve(reverse('create_room')).func.view_class == CreateRoomView
 
+
+    
+def test_room_messages_url():
+    assert resolve(reverse('room_messages',
+                           kwargs={'pk':
+                                   1})).func.view_class == RoomMessagesListView
+
+    
+def test_room_read_url():
+    assert resolve(reverse('room_read',
+                           kwargs={'pk':
+                                   1})).func.view_class == MarkRoomReadView
+
+    
+def test_message_writer_stats_url():
+    assert resolve(reverse('message_writer_stats')).func.view_class == MessageWriterStatsView
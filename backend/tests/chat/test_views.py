@@ -2,11 +2,14 @@ import pytest
 import sys, shutil, os
 from django.conf import settings
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.db import IntegrityError
 from django.urls import reverse
 from rest_framework.test import APIClient
 
 from profiles.models import Profile
-from chat.models import Room, Message
+from chat.models import Room, Message, RoomParticipant
+from chat import unread
+from chat.writer import MessageWriter
 
 client = APIClient()
 
@@ -70,9 +73,79 @@ def test_rooms_list_not_logged_in(user_object: Profile, user_object2: Profile) -
 def test_rooms_list_logged_in(user_object: Profile, user_object2: Profile, user_payload: dict) -> None:
     client.post(reverse('login'), user_payload, format='json')
     res = client.get(reverse('my_rooms'))
-    assert res.data == list()
+    assert res.data['results'] == list()
     assert res.status_code == 200
+
+
+@pytest.mark.django_db
+def test_rooms_list_by_last_activity(user_object: Profile, user_object2: Profile,
+                                     user_object3: Profile, user_payload: dict,
+                                     django_assert_num_queries) -> None:
+    client.post(reverse('login'), user_payload, format='json')
+    quiet = Room.objects.create(initiator=user_object, receiver=user_object2)
+    busy = Room.objects.create(initiator=user_object3, receiver=user_object)
+    Room.objects.create(initiator=user_object2, receiver=user_object3)
+    Message.objects.create(room=quiet, sender=user_object, text='first')
+    Message.objects.create(room=busy, sender=user_object3, text='second')
+    Message.objects.create(room=quiet, sender=user_object2, text='third')
+
+    with django_assert_num_queries(3):  # session, user, rooms
+        res = client.get(reverse('my_rooms'))
+    assert [room['id'] for room in res.data['results']] == [quiet.pk, busy.pk]
+    assert res.data['results'][0]['last_message']['text'] == 'third'
+    assert res.data['results'][1]['last_message']['text'] == 'second'
+
+    res = client.get(reverse('my_rooms'), {'page_size': 1})
+    assert [room['id'] for room in res.data['results']] == [quiet.pk]
+    res = client.get(res.data['next'])
+    assert [room['id'] for room in res.data['results']] == [busy.pk]
     
+@pytest.mark.django_db
+def test_rooms_list_unread_counts(user_object: Profile, user_object2: Profile,
+                                  user_payload: dict) -> None:
+    client.post(reverse('login'), user_payload, format='json')
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    Message.objects.create(room=room, sender=user_object, text='mine')
+    first = Message.objects.create(room=room, sender=user_object2, text='1')
+    second = Message.objects.create(room=room, sender=user_object2, text='2')
+    last = Message.objects.create(room=room, sender=user_object2, text='3')
+    res = client.get(reverse('my_rooms'))
+    assert res.data['results'][0]['unread_count'] == 3
+    assert res.data['results'][0]['last_read_message'] is None
+    assert room.participants.get(user=user_object2).unread_count == 1
+
+    url = reverse('room_read', kwargs={'pk': room.pk})
+    res = client.post(url, {'message': first.pk}, format='json')
+    assert res.data == {'room': room.pk, 'last_read_message': first.pk, 'unread_count': 2}
+    res = client.post(url, {'message': last.pk}, format='json')
+    assert res.data['unread_count'] == 0
+    # the watermark never moves back
+    res = client.post(url, {'message': second.pk}, format='json')
+    assert res.data['last_read_message'] == last.pk
+    res = client.get(reverse('my_rooms'))
+    assert res.data['results'][0]['unread_count'] == 0
+    assert res.data['results'][0]['last_read_message'] == last.pk
+
+
+@pytest.mark.django_db
+def test_room_read_errors(user_object: Profile, user_object2: Profile,
+                          user_object3: Profile, user_payload: dict) -> None:
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    other = Room.objects.create(initiator=user_object2, receiver=user_object3)
+    message = Message.objects.create(room=other, sender=user_object2, text='hi')
+    url = reverse('room_read', kwargs={'pk': room.pk})
+    res = client.post(url, {'message': message.pk}, format='json')
+    assert res.status_code == 403
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.post(url, {'message': message.pk}, format='json')
+    assert res.status_code == 404
+    res = client.post(reverse('room_read', kwargs={'pk': other.pk}),
+                      {'message': message.pk}, format='json')
+    assert res.status_code == 404
+    res = client.post(url, {}, format='json')
+    assert res.status_code == 400
+
+
 @pytest.mark.django_db
 def test_chat_room_not_logged_in(user_object: Profile, user_object2: Profile) -> None:
     room = Room.objects.create(initiator=user_object, receiver=user_object2)
@@ -92,6 +165,72 @@ def test_chat_room_logged_in(user_object: Profile, user_object2: Profile, user_p
     assert res.status_code == 200
     
     
+@pytest.mark.django_db
+def test_chat_room_sparse_fields(user_object: Profile, user_object2: Profile, user_payload: dict) -> None:
+    client.post(reverse('login'), user_payload, format='json')
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    Message.objects.create(room=room, sender=user_object, text='hi')
+    res = client.get(reverse('chat_room', kwargs={'pk': room.pk}), {'fields': 'id,receiver'})
+    assert set(res.data) == {'id', 'receiver'}
+    res = client.get(reverse('my_rooms'), {'fields': 'id'})
+    assert res.data['results'] == [{'id': room.pk}]
+    res = client.get(reverse('my_rooms'))
+    assert res.data['results'][0]['last_message']['text'] == 'hi'
+    
+    
+@pytest.mark.django_db
+def test_chat_room_newest_messages_page(user_object: Profile, user_object2: Profile,
+                                        user_payload: dict, settings) -> None:
+    settings.CHAT_HISTORY = {'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 3}
+    client.post(reverse('login'), user_payload, format='json')
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    for number in range(5):
+        Message.objects.create(room=room, sender=user_object, text=str(number))
+    res = client.get(reverse('chat_room', kwargs={'pk': room.pk}))
+    assert [message['text'] for message in res.data['message_set']] == ['3', '4']
+
+    url = reverse('room_messages', kwargs={'pk': room.pk})
+    res = client.get(url, {'before': res.data['message_set_before']})
+    assert [message['text'] for message in res.data['results']] == ['1', '2']
+    res = client.get(url, {'before': res.data['before']})
+    assert [message['text'] for message in res.data['results']] == ['0']
+    assert res.data['before'] is None
+
+    res = client.get(url, {'page_size': 10})
+    assert [message['text'] for message in res.data['results']] == ['2', '3', '4']
+
+
+@pytest.mark.django_db
+def test_room_messages_same_timestamp(user_object: Profile, user_object2: Profile,
+                                      user_payload: dict, settings) -> None:
+    settings.CHAT_HISTORY = {'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 2}
+    client.post(reverse('login'), user_payload, format='json')
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    messages = [Message.objects.create(room=room, sender=user_object, text=str(number))
+                for number in range(3)]
+    Message.objects.filter(room=room).update(timestamp=messages[0].timestamp)
+    url = reverse('room_messages', kwargs={'pk': room.pk})
+    res = client.get(url)
+    assert [message['text'] for message in res.data['results']] == ['1', '2']
+    res = client.get(url, {'before': res.data['before']})
+    assert [message['text'] for message in res.data['results']] == ['0']
+
+
+@pytest.mark.django_db
+def test_room_messages_errors(user_object: Profile, user_object2: Profile,
+                              user_payload: dict) -> None:
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    url = reverse('room_messages', kwargs={'pk': room.pk})
+    res = client.get(url)
+    assert res.status_code == 403
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.get(url, {'before': 'garbage'})
+    assert res.data['detail'] == 'Invalid cursor'
+    assert res.status_code == 404
+    res = client.get(reverse('room_messages', kwargs={'pk': room.pk + 1}))
+    assert res.status_code == 404
+
+
 @pytest.mark.django_db
 def test_delete_chat_room_not_logged_in(user_object: Profile, user_object2: Profile) -> None:
     room = Room.objects.create(initiator=user_object, receiver=user_object2)
@@ -106,3 +245,106 @@ def test_delete_chat_room_logged_in(user_object: Profile, user_object2: Profile,
     room = Room.objects.create(initiator=user_object, receiver=user_object2)
     res = client.delete(reverse('del_room', kwargs={'pk': room.pk}))
     assert res.status_code == 204
+
+
+@pytest.mark.django_db
+def test_message_writer_batches(user_object: Profile, user_object2: Profile,
+                                user_object3: Profile) -> None:
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    other = Room.objects.create(initiator=user_object2, receiver=user_object3)
+    gone = Room.objects.create(initiator=user_object, receiver=user_object3)
+    writer = MessageWriter(flush_interval=60, id_block_size=3)
+    assert writer.add(room.pk, user_object.pk, 'no ids') is None
+    writer.reserve()
+    first, _ = writer.add(room.pk, user_object.pk, 'hi')
+    second, _ = writer.add(room.pk, user_object.pk, 'there')
+    reply, _ = writer.add(other.pk, user_object3.pk, 'hey')
+    assert writer.add(gone.pk, user_object.pk, 'late') is None
+    writer.reserve()
+    late, written = writer.add(gone.pk, user_object.pk, 'late')
+    assert [first.pk, second.pk, reply.pk, late.pk] == list(range(first.pk, first.pk + 4))
+    # the reserved ids are skipped by ordinary inserts
+    direct = Message.objects.create(room=other, sender=user_object2, text='direct')
+    assert direct.pk > late.pk + 1
+    gone.delete()
+    assert writer.stats()['backlog'] == 4
+
+    assert writer.flush() == 3
+    assert list(Message.objects.filter(room=room).values_list('pk', 'text')) == [
+        (first.pk, 'hi'), (second.pk, 'there')]
+    assert Message.objects.get(pk=first.pk).timestamp == first.timestamp
+    room.refresh_from_db()
+    assert room.last_message_id == second.pk
+    assert room.last_activity_at == second.timestamp
+    assert RoomParticipant.objects.get(room=room, user=user_object2).unread_count == 2
+    assert RoomParticipant.objects.get(room=room, user=user_object).unread_count == 0
+    # the direct insert is newer than the queued reply
+    other.refresh_from_db()
+    assert other.last_message_id == direct.pk
+    assert RoomParticipant.objects.get(room=other, user=user_object2).unread_count == 1
+    with pytest.raises(Room.DoesNotExist):
+        written.result(timeout=0)
+
+    stats = writer.stats()
+    assert stats['backlog'] == 0
+    assert stats['flushes'] == 1
+    assert stats['flushed'] == 3
+    assert stats['dropped'] == 1
+    assert stats['max_backlog'] == 4
+    assert stats['reserved_ids'] == 2
+    assert stats['last_flush_seconds'] > 0
+
+
+@pytest.mark.django_db
+def test_mark_read_orders_writer_messages_by_time(user_object: Profile,
+                                                  user_object2: Profile) -> None:
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    writer = MessageWriter(flush_interval=60, id_block_size=10)
+    writer.reserve()
+    direct = Message.objects.create(room=room, sender=user_object, text='direct')
+    # queued after the direct insert, under a lower reserved id
+    queued, _ = writer.add(room.pk, user_object.pk, 'queued')
+    assert queued.pk < direct.pk
+    assert writer.flush() == 1
+    room.refresh_from_db()
+    assert room.last_message_id == queued.pk
+
+    participant = unread.mark_read(room.pk, user_object2.pk, direct.pk)
+    assert (participant.last_read_message_id, participant.unread_count) == (direct.pk, 1)
+    participant = unread.mark_read(room.pk, user_object2.pk, queued.pk)
+    assert (participant.last_read_message_id, participant.unread_count) == (queued.pk, 0)
+    # an older message leaves the watermark where it is
+    participant = unread.mark_read(room.pk, user_object2.pk, direct.pk)
+    assert participant.last_read_message_id == queued.pk
+
+
+@pytest.mark.django_db
+def test_message_writer_drops_failing_message(user_object: Profile,
+                                              user_object2: Profile) -> None:
+    room = Room.objects.create(initiator=user_object, receiver=user_object2)
+    writer = MessageWriter(flush_interval=60, max_attempts=2)
+    writer.reserve()
+    bad, failed = writer.add(room.pk, user_object.pk, None)
+    good, written = writer.add(room.pk, user_object.pk, 'hi')
+
+    assert writer.flush() == 1
+    assert written.result(timeout=0) == good
+    assert not failed.done()
+    assert writer.stats()['backlog'] == 1
+
+    assert writer.flush() == 0
+    with pytest.raises(IntegrityError):
+        failed.result(timeout=0)
+    assert list(Message.objects.values_list('pk', flat=True)) == [good.pk]
+    stats = writer.stats()
+    assert (stats['backlog'], stats['failures'], stats['dropped']) == (0, 2, 1)
+
+
+@pytest.mark.django_db
+def test_message_writer_stats(user_object: Profile, user_payload: dict, settings) -> None:
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.get(reverse('message_writer_stats'))
+    assert res.status_code == 403
+    Profile.objects.filter(pk=user_object.pk).update(is_staff=True)
+    res = client.get(reverse('message_writer_stats'))
+    assert res.data == {'enabled': False}
@@ -1,10 +1,32 @@
 from django.urls import reverse, resolve
 
-from comments.views import (
-    CommentCreateView, )
+from comments.views import (CommentCreateView, CommentsListView,
+                            CommentRepliesListView, CommentSubtreeListView)
 
 
 def test_create_comment_url():
     assert resolve(reverse('comment_create',
                            kwargs={'post_pk':
                                    1})).func.view_class == CommentCreateView
+
+
+def test_comments_list_url():
+    assert resolve(reverse('comments_list',
+                           kwargs={'post_pk':
+                                   1})).func.view_class == CommentsListView
+
+
+def test_comment_replies_url():
+    assert resolve(
+        reverse('comment_replies', kwargs={
+            'post_pk': 1,
+            'pk': 2
+        })).func.view_class == CommentRepliesListView
+
+
+def test_comment_subtree_url():
+    assert resolve(
+        reverse('comment_subtree', kwargs={
+            'post_pk': 1,
+            'pk': 2
+        })).func.view_class == CommentSubtreeListView
@@ -1,5 +1,6 @@
 import pytest
 import sys, shutil, os
+from datetime import timedelta
 from django.conf import settings
 from io import BytesIO
 from PIL import Image
@@ -91,6 +92,8 @@ def test_comment_create_logged_in_with_data(user_object: object,
                       payload,
                       format='json')
     assert Comment.objects.filter(post=post_object).count() == 1
+    post_object.refresh_from_db()
+    assert post_object.comment_count == 1
     assert res.data['id'] == 1
     assert res.data['entry'] == payload['entry']
     assert res.status_code == 201
@@ -112,6 +115,177 @@ def test_comment_create_logged_in_no_data(user_object: object,
     delete_all_testing_files(str(user_object.email))
 
 
+@pytest.mark.django_db
+def test_comments_list_logged_in(user_object: object, post_object: object,
+                                 user_payload: dict) -> None:
+    for i in range(25):
+        Comment.objects.create(post=post_object,
+                               author=user_object,
+                               entry=f'comment_{i}')
+    Post.objects.filter(pk=post_object.pk).update(comment_count=25)
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.get(
+        reverse('comments_list', kwargs={'post_pk': post_object.pk}))
+    assert len(res.data['results']) == 20
+    assert res.data['results'][0]['entry'] == 'comment_0'
+    assert res.data['results'][0]['author']['id'] == user_object.id
+    res = client.get(res.data['next'])
+    assert [c['entry'] for c in res.data['results']
+            ] == [f'comment_{i}' for i in range(20, 25)]
+    assert res.data['next'] == None
+
+    detail = client.get(reverse('post_detail', kwargs={'pk': post_object.pk}))
+    assert detail.data['total_comments'] == 25
+    assert len(detail.data['comments']) == 20
+    delete_all_testing_files(str(user_object.email))
+
+
+@pytest.mark.django_db
+def test_comments_ordered_by_created_at(user_object: object,
+                                       post_object: object,
+                                       user_payload: dict) -> None:
+    comments = [
+        Comment.objects.create(post=post_object,
+                               author=user_object,
+                               entry=f'comment_{i}') for i in range(4)
+    ]
+    moment = comments[0].created_at
+    # the newest row was written first, two rows share a timestamp
+    Comment.objects.filter(pk=comments[0].pk).update(created_at=moment +
+                                                     timedelta(minutes=5))
+    Comment.objects.filter(pk__in=[comments[1].pk, comments[2].pk
+                                   ]).update(created_at=moment)
+    Comment.objects.filter(pk=comments[3].pk).update(created_at=moment -
+                                                     timedelta(minutes=5))
+    expected = ['comment_3', 'comment_1', 'comment_2', 'comment_0']
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.get(
+        reverse('comments_list', kwargs={'post_pk': post_object.pk}),
+        {'page_size': 2})
+    entries = [c['entry'] for c in res.data['results']]
+    res = client.get(res.data['next'])
+    entries += [c['entry'] for c in res.data['results']]
+    assert entries == expected
+
+    detail = client.get(reverse('post_detail', kwargs={'pk': post_object.pk}))
+    assert [c['entry'] for c in detail.data['comments']] == expected
+    Comment.objects.prefetch_first([post_object], limit=3)
+    assert [c.entry for c in post_object.first_comments] == expected[:3]
+    delete_all_testing_files(str(user_object.email))
+
+
+@pytest.mark.django_db
+def test_comment_replies_thread(user_object: object, post_object: object,
+                                user_payload: dict) -> None:
+    client.post(reverse('login'), user_payload, format='json')
+    create_url = reverse('comment_create', kwargs={'post_pk': post_object.pk})
+
+    def reply(entry: str, parent: int = None) -> dict:
+        res = client.post(create_url,
+                          dict(entry=entry, parent=parent),
+                          format='json')
+        assert res.status_code == 201
+        return res.data
+
+    root = reply('root')
+    other_root = reply('other root')
+    first = reply('first', root['id'])
+    second = reply('second', root['id'])
+    nested = reply('nested', first['id'])
+    assert root['path'] == '{:012x}'.format(root['id'])
+    assert nested['path'] == '.'.join(
+        '{:012x}'.format(pk) for pk in (root['id'], first['id'], nested['id']))
+    assert nested['depth'] == 2
+    post_object.refresh_from_db()
+    assert post_object.comment_count == 5
+    assert Comment.objects.get(pk=root['id']).reply_count == 2
+
+    res = client.get(
+        reverse('comments_list', kwargs={'post_pk': post_object.pk}))
+    assert [c['entry'] for c in res.data['results']] == ['root', 'other root']
+    assert [r['entry'] for r in res.data['results'][0]['replies']
+            ] == ['first', 'second']
+    assert res.data['results'][1]['replies'] == []
+
+    res = client.get(
+        reverse('comment_replies',
+                kwargs={
+                    'post_pk': post_object.pk,
+                    'pk': root['id']
+                }), {'page_size': 1})
+    assert [c['entry'] for c in res.data['results']] == ['first']
+    assert [r['entry'] for r in res.data['results'][0]['replies']
+            ] == ['nested']
+    res = client.get(res.data['next'])
+    assert [c['entry'] for c in res.data['results']] == ['second']
+
+    res = client.get(
+        reverse('comment_subtree',
+                kwargs={
+                    'post_pk': post_object.pk,
+                    'pk': root['id']
+                }))
+    assert [c['entry'] for c in res.data['results']
+            ] == ['first', 'nested', 'second']
+    assert other_root['id'] not in [c['id'] for c in res.data['results']]
+
+    detail = client.get(reverse('post_detail', kwargs={'pk': post_object.pk}))
+    assert [c['entry'] for c in detail.data['comments']
+            ] == ['root', 'other root']
+    delete_all_testing_files(str(user_object.email))
+
+
+@pytest.mark.django_db
+def test_comment_path_assigned_on_save(user_object: object,
+                                       post_object: object) -> None:
+    root = Comment.objects.create(post=post_object,
+                                  author=user_object,
+                                  entry='root')
+    reply = Comment.objects.create(post=post_object,
+                                   author=user_object,
+                                   parent=root,
+                                   entry='reply')
+    assert root.path == '{:012x}'.format(root.pk)
+    reply.refresh_from_db()
+    assert reply.path == '{:012x}.{:012x}'.format(root.pk, reply.pk)
+    assert reply.depth == 1
+    assert list(Comment.objects.subtree(root)) == [reply]
+
+
+@pytest.mark.django_db
+def test_comment_reply_to_another_post(user_object: object,
+                                       post_object: object,
+                                       user_payload: dict) -> None:
+    other_post = Post.objects.create(author=user_object, entry='other')
+    parent = Comment.objects.create(post=other_post,
+                                    author=user_object,
+                                    entry='elsewhere')
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.post(reverse('comment_create',
+                              kwargs={'post_pk': post_object.pk}),
+                      dict(entry='reply', parent=parent.pk),
+                      format='json')
+    assert res.status_code == 400
+    assert res.data['parent'][0] == 'Parent comment belongs to another post.'
+    res = client.get(
+        reverse('comment_replies',
+                kwargs={
+                    'post_pk': post_object.pk,
+                    'pk': parent.pk
+                }))
+    assert res.status_code == 404
+    delete_all_testing_files(str(user_object.email))
+
+
+@pytest.mark.django_db
+def test_comments_list_post_not_exist(user_object: object,
+                                      user_payload: dict) -> None:
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.get(reverse('comments_list', kwargs={'post_pk': 99}))
+    assert res.data['detail'] == 'Not found.'
+    assert res.status_code == 404
+
+
 def delete_all_testing_files(profile_email: str) -> None:
     """Delete test files from media"""
     try:
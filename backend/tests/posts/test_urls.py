@@ -1,7 +1,10 @@
 from django.urls import reverse, resolve
 
 from posts.views import (FriendsPostsListView, PostCreateView, PostUpdateView,
-                         PostDetailView, LikePostView, DislikePostView)
+                         PostDetailView, LikePostView, DislikePostView,
+                         ReactionsToggleView, ReactionBufferStatsView,
+                         TrendingPostsView, PostSearchView,
+                         TaggedPostsListView, MentionedPostsListView)
 
 
 def test_post_list_url():
@@ -32,3 +35,33 @@ def test_dislike_post_url():
     assert resolve(reverse('post_dislike',
                            kwargs={'pk':
                                    1})).func.view_class == DislikePostView
+
+
+def test_reactions_toggle_url():
+    assert resolve(
+        reverse('post_reactions')).func.view_class == ReactionsToggleView
+
+
+def test_reaction_buffer_stats_url():
+    assert resolve(reverse(
+        'reaction_buffer_stats')).func.view_class == ReactionBufferStatsView
+
+
+def test_trending_posts_url():
+    assert resolve(
+        reverse('posts_trending')).func.view_class == TrendingPostsView
+
+
+def test_posts_search_url():
+    assert resolve(reverse('posts_search')).func.view_class == PostSearchView
+
+
+def test_posts_tagged_url():
+    assert resolve(reverse(
+        'posts_tagged',
+        kwargs={'tag': 'django'})).func.view_class == TaggedPostsListView
+
+
+def test_posts_mentioning_me_url():
+    assert resolve(reverse(
+        'posts_mentioning_me')).func.view_class == MentionedPostsListView
@@ -1,14 +1,22 @@
 import pytest
-import sys, shutil, os
+import sys, shutil, os, time
 from django.conf import settings
-from io import BytesIO
+from io import BytesIO, StringIO
 from PIL import Image
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.urls import reverse
+from django.core.management import call_command
+from django.db.models import F
 from rest_framework.test import APIClient
 
 from profiles.models import Profile
-from posts.models import Post
+from posts.models import (Post, PostMention, PostTag, Reaction,
+                          TimelineEntry, TrendingScore)
+from posts.buffer import (ReactionBuffer, get_reaction_buffer,
+                          reset_reaction_buffer)
+from posts import buffer, search, trending
+from posts.reactions import toggle_reactions
+from comments.models import Comment
 
 client = APIClient()
 
@@ -86,20 +94,91 @@ def test_friends_posts_list_logged_in(user_object: object, user_payload: dict,
     user_object2.friends.add(user_object)
     client.post(reverse('login'), user_payload, format='json')
     res = client.get(reverse('posts_list'))
-    assert len(res.data) == 1
-    assert res.data[0]['id'] == 1
-    assert res.data[0]['author']['id'] == user_object2.id
-    assert res.data[0]['author']['email'] == 'test_email2@email.com'
-    assert res.data[0]['author']['username'] == 'test_user2'
-    assert res.data[0]['author']['image'] == None
-    assert res.data[0]['entry'] == 'test_entry2'
-    assert res.data[0]['file'] != None
+    results = res.data['results']
+    assert len(results) == 1
+    assert results[0]['id'] == 1
+    assert results[0]['author']['id'] == user_object2.id
+    assert results[0]['author']['email'] == 'test_email2@email.com'
+    assert results[0]['author']['username'] == 'test_user2'
+    assert results[0]['author']['image'] == None
+    assert results[0]['entry'] == 'test_entry2'
+    assert results[0]['file'] != None
+    assert res.data['next'] == None
     assert res.status_code == 200
     delete_all_testing_files(str(user_object.email))
     delete_all_testing_files(str(user_object2.email))
     delete_all_testing_files(str(user_object3.email))
 
 
+@pytest.mark.django_db
+def test_friends_posts_list_cursor_pages(user_object: object,
+                                         user_payload: dict,
+                                         user_object2: object) -> None:
+    for i in range(5):
+        Post.objects.create(author=user_object2, entry=f'entry_{i}')
+    user_object.friends.add(user_object2)
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.get(reverse('posts_list'), {'page_size': 2})
+    seen = [post['id'] for post in res.data['results']]
+    while res.data['next'] != None:
+        res = client.get(res.data['next'])
+        seen += [post['id'] for post in res.data['results']]
+    assert seen == [5, 4, 3, 2, 1]
+    assert res.status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('posts_count', [1, 8])
+def test_friends_posts_list_query_count(django_assert_num_queries,
+                                        user_object: object,
+                                        user_payload: dict,
+                                        user_object2: object,
+                                        user_object3: object,
+                                        posts_count: int) -> None:
+    for i in range(posts_count):
+        post = Post.objects.create(author=user_object2, entry=f'entry_{i}')
+        for commenter in (user_object, user_object2, user_object3,
+                          user_object):
+            Comment.objects.create(post=post, author=commenter, entry='c')
+    user_object.friends.add(user_object2)
+    client.post(reverse('login'), user_payload, format='json')
+    # session, user, posts page, first comments, comment authors
+    with django_assert_num_queries(5):
+        res = client.get(reverse('posts_list'))
+    assert len(res.data['results']) == posts_count
+    assert len(res.data['results'][0]['comments']) == 3
+    assert res.data['results'][0]['comments'][0]['author'][
+        'id'] == user_object.id
+
+
+@pytest.mark.django_db
+def test_timeline_follows_friendships(user_object: object, user_payload: dict,
+                                      user_object2: object,
+                                      settings) -> None:
+    settings.TIMELINE_MAX_LENGTH = 2
+    Post.objects.create(author=user_object2, entry='before_friendship')
+    user_object.friends.add(user_object2)
+    user_object2.friends.add(user_object)
+    assert TimelineEntry.objects.filter(user=user_object).count() == 1
+    client.post(reverse('login'), user_payload, format='json')
+    for i in range(3):
+        client.post(reverse('post_create'), dict(entry=f'mine_{i}'),
+                    format='multipart')
+        Post.objects.create(author=user_object2, entry=f'entry_{i}')
+    entries = TimelineEntry.objects.filter(user=user_object)
+    assert entries.count() == 4
+    call_command('trim_timelines', stdout=StringIO())
+    assert [e.post.entry for e in entries.order_by('-created_at')] == [
+        'entry_2', 'entry_1'
+    ]
+    assert TimelineEntry.objects.filter(user=user_object2).count() == 2
+    user_object.friends.remove(user_object2)
+    user_object2.friends.remove(user_object)
+    assert TimelineEntry.objects.count() == 0
+    res = client.get(reverse('posts_list'))
+    assert res.data['results'] == []
+
+
 # create post
 @pytest.mark.django_db
 def test_post_create_not_logged_in(user_object: object,
@@ -375,7 +454,7 @@ def test_like_post_not_logged_in(user_object: object, user_payload: dict,
                                entry='test_entry')
     assert Post.objects.all().count() == 1
     res = client.get(reverse('post_like', kwargs={'pk': 1}))
-    assert post.like.all().count() == 0
+    assert likes(post).count() == 0
     assert res.data[
         'detail'] == 'Authentication credentials were not provided.'
     assert res.status_code == 403
@@ -393,8 +472,8 @@ def test_like_post_logged_in(user_object2: object, user_object: object,
     assert Post.objects.all().count() == 1
     client.post(reverse('login'), user_payload, format='json')
     res = client.get(reverse('post_like', kwargs={'pk': 1}))
-    assert post.like.all().count() == 1
-    assert post.like.all().first() == user_object
+    assert likes(post).count() == 1
+    assert likes(post).first().profile == user_object
     assert res.data['detail'] == 'Success'
     assert res.status_code == 200
     delete_all_testing_files(str(user_object2.email))
@@ -412,7 +491,7 @@ def test_like_post_logged_in_post_not_exist(user_object2: object,
     assert Post.objects.all().count() == 1
     client.post(reverse('login'), user_payload, format='json')
     res = client.get(reverse('post_like', kwargs={'pk': 99}))
-    assert post.like.all().count() == 0
+    assert likes(post).count() == 0
     assert res.data['detail'] == 'Not found.'
     assert res.status_code == 404
     delete_all_testing_files(str(user_object2.email))
@@ -426,17 +505,21 @@ def test_like_post_logged_in_when_dislike_exist(
     post = Post.objects.create(author=user_object2,
                                file=temporary_image,
                                entry='test_entry')
-    post.dislike.add(user_object)
+    Reaction.objects.create(post=post,
+                            profile=user_object,
+                            value=Reaction.Value.DISLIKE)
     assert Post.objects.all().count() == 1
-    assert post.dislike.all().count() == 1
-    assert post.dislike.all().first() == user_object
+    assert dislikes(post).count() == 1
+    assert dislikes(post).first().profile == user_object
     client.post(reverse('login'), user_payload, format='json')
     res = client.get(reverse('post_like', kwargs={'pk': 1}))
-    assert post.like.all().count() == 1
-    assert post.like.all().first() == user_object
+    assert likes(post).count() == 1
+    assert likes(post).first().profile == user_object
     assert res.data['detail'] == 'Success'
     assert res.status_code == 200
-    assert post.dislike.all().count() == 0
+    assert dislikes(post).count() == 0
+    post.refresh_from_db()
+    assert post.like_count == 1
     delete_all_testing_files(str(user_object2.email))
 
 
@@ -452,7 +535,7 @@ def test_dislike_post_not_logged_in(user_object: object, user_payload: dict,
                                entry='test_entry')
     assert Post.objects.all().count() == 1
     res = client.get(reverse('post_dislike', kwargs={'pk': 1}))
-    assert post.dislike.all().count() == 0
+    assert dislikes(post).count() == 0
     assert res.data[
         'detail'] == 'Authentication credentials were not provided.'
     assert res.status_code == 403
@@ -470,8 +553,8 @@ def test_dislike_post_logged_in(user_object2: object, user_object: object,
     assert Post.objects.all().count() == 1
     client.post(reverse('login'), user_payload, format='json')
     res = client.get(reverse('post_dislike', kwargs={'pk': 1}))
-    assert post.dislike.all().count() == 1
-    assert post.dislike.all().first() == user_object
+    assert dislikes(post).count() == 1
+    assert dislikes(post).first().profile == user_object
     assert res.data['detail'] == 'Success'
     assert res.status_code == 200
     delete_all_testing_files(str(user_object2.email))
@@ -489,7 +572,7 @@ def test_dislike_post_logged_in_post_not_exist(user_object2: object,
     assert Post.objects.all().count() == 1
     client.post(reverse('login'), user_payload, format='json')
     res = client.get(reverse('post_dislike', kwargs={'pk': 99}))
-    assert post.dislike.all().count() == 0
+    assert dislikes(post).count() == 0
     assert res.data['detail'] == 'Not found.'
     assert res.status_code == 404
     delete_all_testing_files(str(user_object2.email))
@@ -503,20 +586,372 @@ def test_dislike_post_logged_in_when_dislike_exist(
     post = Post.objects.create(author=user_object2,
                                file=temporary_image,
                                entry='test_entry')
-    post.like.add(user_object)
+    Reaction.objects.create(post=post,
+                            profile=user_object,
+                            value=Reaction.Value.LIKE)
     assert Post.objects.all().count() == 1
-    assert post.like.all().count() == 1
-    assert post.like.all().first() == user_object
+    assert likes(post).count() == 1
+    assert likes(post).first().profile == user_object
     client.post(reverse('login'), user_payload, format='json')
     res = client.get(reverse('post_dislike', kwargs={'pk': 1}))
-    assert post.dislike.all().count() == 1
-    assert post.dislike.all().first() == user_object
+    assert dislikes(post).count() == 1
+    assert dislikes(post).first().profile == user_object
     assert res.data['detail'] == 'Success'
     assert res.status_code == 200
-    assert post.like.all().count() == 0
+    assert likes(post).count() == 0
     delete_all_testing_files(str(user_object2.email))
 
 
+@pytest.mark.django_db
+def test_like_toggle_updates_counters(user_object2: object, user_object: object,
+                                      user_payload: dict) -> None:
+    post = Post.objects.create(author=user_object2, entry='test_entry')
+    client.post(reverse('login'), user_payload, format='json')
+    client.get(reverse('post_dislike', kwargs={'pk': post.pk}))
+    post.refresh_from_db()
+    assert (post.like_count, post.dislike_count) == (0, 1)
+    client.get(reverse('post_like', kwargs={'pk': post.pk}))
+    post.refresh_from_db()
+    assert (post.like_count, post.dislike_count) == (1, 0)
+    client.get(reverse('post_like', kwargs={'pk': post.pk}))
+    post.refresh_from_db()
+    assert (post.like_count, post.dislike_count) == (0, 0)
+    res = client.get(reverse('post_detail', kwargs={'pk': post.pk}))
+    assert res.data['like'] == 0
+    assert res.data['dislike'] == 0
+
+
+@pytest.mark.django_db
+def test_reconcile_post_counters(user_object2: object,
+                                 user_object: object) -> None:
+    post = Post.objects.create(author=user_object2, entry='test_entry')
+    Reaction.objects.create(post=post,
+                            profile=user_object,
+                            value=Reaction.Value.LIKE)
+    Reaction.objects.create(post=post,
+                            profile=user_object2,
+                            value=Reaction.Value.DISLIKE)
+    Post.objects.filter(pk=post.pk).update(like_count=7, comment_count=3)
+    call_command('reconcile_post_counters', stdout=StringIO())
+    post.refresh_from_db()
+    assert post.like_count == 1
+    assert post.dislike_count == 1
+    assert post.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_toggle_many_reactions(user_object2: object, user_object: object,
+                               user_payload: dict) -> None:
+    post = Post.objects.create(author=user_object2, entry='test_entry')
+    post2 = Post.objects.create(author=user_object2, entry='test_entry2')
+    client.post(reverse('login'), user_payload, format='json')
+    payload = dict(reactions=[
+        dict(post=post.pk, reaction='like'),
+        dict(post=post2.pk, reaction='dislike'),
+        dict(post=post2.pk, reaction='like'),
+        dict(post=99, reaction='like'),
+    ])
+    res = client.post(reverse('post_reactions'), payload, format='json')
+    assert res.data['results'] == [
+        dict(post=post.pk, reaction='like'),
+        dict(post=post2.pk, reaction='like'),
+        dict(post=99, detail='Not found.'),
+    ]
+    assert res.status_code == 200
+    post2.refresh_from_db()
+    assert (post2.like_count, post2.dislike_count) == (1, 0)
+    res = client.post(reverse('post_reactions'),
+                      dict(reactions=[dict(post=post.pk, reaction='like')]),
+                      format='json')
+    assert res.data['results'] == [dict(post=post.pk, reaction=None)]
+    assert likes(post).count() == 0
+
+
+@pytest.mark.django_db
+def test_reaction_buffer_last_toggle_wins(user_object2: object,
+                                          user_object: object) -> None:
+    post = Post.objects.create(author=user_object2, entry='test_entry')
+    Reaction.objects.create(post=post,
+                            profile=user_object2,
+                            value=Reaction.Value.LIKE)
+    Post.objects.filter(pk=post.pk).update(like_count=1)
+    buffer = ReactionBuffer(flush_interval=60)
+    for value in (Reaction.Value.LIKE, Reaction.Value.DISLIKE,
+                  Reaction.Value.LIKE):
+        buffer.add(post.pk, user_object.pk, value)
+    buffer.add(post.pk, user_object2.pk, Reaction.Value.LIKE)
+    buffer.add(99, user_object.pk, Reaction.Value.LIKE)
+    assert buffer.stats()['backlog'] == 3
+    assert buffer.stats()['queued_toggles'] == 5
+    assert buffer.flush() == 3
+    assert likes(post).get().profile == user_object
+    assert dislikes(post).count() == 0
+    post.refresh_from_db()
+    assert (post.like_count, post.dislike_count) == (1, 0)
+    stats = buffer.stats()
+    assert stats['backlog'] == 0
+    assert stats['flushes'] == 1
+    assert stats['last_flush_seconds'] > 0
+
+
+@pytest.mark.django_db
+def test_reaction_counters_follow_stored_state(user_object2: object,
+                                               user_object: object) -> None:
+    post = Post.objects.create(author=user_object2, entry='test_entry')
+    buffer = ReactionBuffer(flush_interval=60)
+    buffer.add(post.pk, user_object.pk, Reaction.Value.LIKE)
+    # a direct toggle commits between queueing and flushing
+    toggle_reactions(user_object.pk, [(post.pk, Reaction.Value.LIKE)])
+    buffer.flush()
+    toggle_reactions(user_object.pk, [(post.pk, Reaction.Value.DISLIKE)])
+    post.refresh_from_db()
+    assert (post.like_count, post.dislike_count) == (likes(post).count(),
+                                                     dislikes(post).count())
+    assert (post.like_count, post.dislike_count) == (0, 1)
+
+
+@pytest.mark.django_db
+def test_reaction_buffer_dead_letters_failing_key(user_object2: object,
+                                                  user_object: object,
+                                                  monkeypatch) -> None:
+    good = Post.objects.create(author=user_object2, entry='good')
+    bad = Post.objects.create(author=user_object2, entry='bad')
+    apply_reactions = buffer.apply_reactions
+
+    def failing(changes):
+        if any(post_id == bad.pk for post_id, _ in changes):
+            raise RuntimeError('poisoned')
+        apply_reactions(changes)
+
+    monkeypatch.setattr(buffer, 'apply_reactions', failing)
+    reactions = ReactionBuffer(flush_interval=60, max_attempts=2)
+    reactions.add(bad.pk, user_object.pk, Reaction.Value.LIKE)
+    reactions.add(good.pk, user_object.pk, Reaction.Value.LIKE)
+    assert reactions.flush() == 1
+    assert likes(good).get().profile == user_object
+    assert reactions.stats()['backlog'] == 1
+
+    reactions.add(good.pk, user_object.pk, Reaction.Value.LIKE)
+    assert reactions.flush() == 1
+    assert likes(good).count() == 0
+    stats = reactions.stats()
+    assert (stats['backlog'], stats['failures'], stats['dead_lettered']) == (0, 2, 1)
+    assert likes(bad).count() == 0
+
+
+@pytest.fixture
+def reaction_buffer(settings):
+    settings.REACTION_BUFFER = dict(ENABLED=True, FLUSH_INTERVAL=60)
+    yield get_reaction_buffer()
+    reset_reaction_buffer()
+
+
+@pytest.mark.django_db
+def test_like_post_buffered(user_object2: object, user_object: object,
+                            user_payload: dict, reaction_buffer) -> None:
+    post = Post.objects.create(author=user_object2, entry='test_entry')
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.get(reverse('post_like', kwargs={'pk': post.pk}))
+    assert res.status_code == 202
+    assert likes(post).count() == 0
+    assert get_reaction_buffer() is reaction_buffer
+    reaction_buffer.flush()
+    assert likes(post).get().profile == user_object
+
+
+@pytest.mark.django_db
+def test_trending_posts(user_object2: object, user_object: object,
+                        user_object3: object, user_payload: dict) -> None:
+    quiet = Post.objects.create(author=user_object2, entry='quiet')
+    liked = Post.objects.create(author=user_object2, entry='liked')
+    commented = Post.objects.create(author=user_object3, entry='commented')
+    client.post(reverse('login'), user_payload, format='json')
+    client.get(reverse('post_like', kwargs={'pk': liked.pk}))
+    client.post(reverse('comment_create', kwargs={'post_pk': commented.pk}),
+                dict(entry='comment'),
+                format='json')
+    res = client.get(reverse('posts_trending'))
+    assert [post['id'] for post in res.data] == [commented.pk, liked.pk]
+    assert res.data[0]['comments'][0]['entry'] == 'comment'
+    client.get(reverse('post_like', kwargs={'pk': liked.pk}))
+    assert not TrendingScore.objects.filter(pk=liked.pk).exists()
+    assert not TrendingScore.objects.filter(pk=quiet.pk).exists()
+
+
+@pytest.mark.django_db
+def test_trending_order_is_time_invariant(user_object2: object,
+                                          settings) -> None:
+    settings.TRENDING = dict(HALF_LIFE_HOURS=1, MIN_SCORE=0.01)
+    old = Post.objects.create(author=user_object2, entry='old')
+    new = Post.objects.create(author=user_object2, entry='new')
+    now = time.time()
+    # 4 an hour ago is worth 2 now, a fresh 1.5 lands in between
+    trending.bump_scores({old.pk: [(4.0, now - 3600)], new.pk: [(1.5, now)]})
+    assert trending.top_posts(2) == [old, new]
+    scores = dict(TrendingScore.objects.values_list('pk', 'score'))
+    assert trending.decayed(scores[old.pk], now) == pytest.approx(2.0)
+    # taking back an event removes what it added at the time
+    trending.bump_scores({old.pk: [(-1.0, now - 3600), (1.0, now)]})
+    score = TrendingScore.objects.get(pk=old.pk).score
+    assert trending.decayed(score, now) == pytest.approx(2.5)
+    assert trending.top_posts(2) == [old, new]
+
+
+@pytest.mark.django_db
+def test_decay_trending_scores(user_object2: object, settings) -> None:
+    settings.TRENDING = dict(HALF_LIFE_HOURS=1, MIN_SCORE=0.1)
+    post = Post.objects.create(author=user_object2, entry='old')
+    faded = Post.objects.create(author=user_object2, entry='faded')
+    now = time.time()
+    trending.bump_scores({post.pk: [(4.0, now)],
+                          faded.pk: [(0.15, now)]})
+    # an hour later
+    TrendingScore.objects.update(score=F('score') - trending.rate() * 3600)
+    call_command('decay_trending_scores', stdout=StringIO())
+    assert TrendingScore.objects.get().pk == post.pk
+
+
+@pytest.mark.django_db
+def test_search_posts(user_object2: object, user_object: object,
+                      user_object3: object, user_payload: dict) -> None:
+    user_object.friends.add(user_object2)
+    best = Post.objects.create(author=user_object2,
+                               entry='Garden garden GARDEN party')
+    weaker = Post.objects.create(author=user_object,
+                                 entry='a long note that mentions the garden '
+                                 'somewhere among many other words')
+    Post.objects.create(author=user_object3, entry='hidden garden')
+    edited = Post.objects.create(author=user_object2, entry='kitchen')
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.get(reverse('posts_search'), {'q': 'garden', 'page_size': 1})
+    assert [post['id'] for post in res.data['results']] == [best.pk]
+    res = client.get(res.data['next'])
+    assert [post['id'] for post in res.data['results']] == [weaker.pk]
+    assert res.data['next'] is None
+
+    edited.entry = 'garden tools'
+    edited.save()
+    best.delete()
+    res = client.get(reverse('posts_search'), {'q': 'GARDEN'})
+    assert {post['id'] for post in res.data['results']
+            } == {weaker.pk, edited.pk}
+    res = client.get(reverse('posts_search'), {'q': 'kitchen'})
+    assert res.data['results'] == []
+    res = client.get(reverse('posts_search'), {'q': '"garden*'})
+    assert len(res.data['results']) == 2
+    res = client.get(reverse('posts_search'), {'cursor': 'nonsense'})
+    assert res.status_code == 404
+
+
+@pytest.mark.django_db
+def test_search_posts_fallback_backend(user_object2: object,
+                                       user_object: object,
+                                       user_payload: dict, settings) -> None:
+    settings.POST_SEARCH_BACKEND = 'posts.search.ContainsBackend'
+    user_object.friends.add(user_object2)
+    older = Post.objects.create(author=user_object2, entry='Garden party')
+    newer = Post.objects.create(author=user_object, entry='my garden')
+    client.post(reverse('login'), user_payload, format='json')
+    res = client.get(reverse('posts_search'), {'q': 'garden', 'page_size': 1})
+    assert [post['id'] for post in res.data['results']] == [newer.pk]
+    res = client.get(res.data['next'])
+    assert [post['id'] for post in res.data['results']] == [older.pk]
+
+
+@pytest.mark.django_db
+def test_rebuild_search_index(user_object: object) -> None:
+    post = Post.objects.create(author=user_object, entry='rebuilt entry')
+    search.get_backend().clear()
+    assert search.search_posts('rebuilt', user_object.pk) == []
+    call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+    assert [hit.pk for _, hit in search.search_posts('rebuilt', user_object.pk)
+            ] == [post.pk]
+
+
+@pytest.mark.django_db
+def test_tagged_and_mentioned_posts(user_object2: object, user_object: object,
+                                    user_object3: object,
+                                    user_payload: dict) -> None:
+    user_object.friends.add(user_object2)
+    older = Post.objects.create(author=user_object2,
+                                entry='#Django night with @test_user.')
+    newer = Post.objects.create(author=user_object2, entry='more #django')
+    untagged = Post.objects.create(author=user_object2, entry='no tags here')
+    # not a friend's post
+    Post.objects.create(author=user_object3, entry='#django for @test_user')
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.get(reverse('posts_tagged', kwargs={'tag': 'DJANGO'}),
+                     {'page_size': 1})
+    assert [post['id'] for post in res.data['results']] == [newer.pk]
+    res = client.get(res.data['next'])
+    assert [post['id'] for post in res.data['results']] == [older.pk]
+
+    client.post(reverse('comment_create', kwargs={'post_pk': untagged.pk}),
+                dict(entry='@test_user look #Django'),
+                format='json')
+    newer.entry = 'edited @test_user'
+    newer.save()
+    res = client.get(reverse('posts_tagged', kwargs={'tag': 'django'}))
+    assert [post['id'] for post in res.data['results']
+            ] == [untagged.pk, older.pk]
+    res = client.get(reverse('posts_mentioning_me'))
+    assert [post['id'] for post in res.data['results']
+            ] == [untagged.pk, newer.pk, older.pk]
+
+
+@pytest.mark.django_db
+def test_backfill_post_tags(user_object: object) -> None:
+    posts = [
+        Post.objects.create(author=user_object, entry=f'#tag{i % 2} @test_user')
+        for i in range(5)
+    ]
+    Comment.objects.create(post=posts[0], author=user_object, entry='#extra')
+    PostTag.objects.all().delete()
+    PostMention.objects.all().delete()
+    call_command('backfill_post_tags', batch_size=2, stdout=StringIO())
+    assert PostTag.objects.filter(tag='tag0').count() == 3
+    assert PostTag.objects.filter(tag='extra').get().post == posts[0]
+    assert PostMention.objects.filter(profile=user_object).count() == 5
+
+
+@pytest.mark.django_db
+def test_post_sparse_fields_and_expand(user_object2: object,
+                                       user_object: object,
+                                       user_payload: dict,
+                                       django_assert_num_queries) -> None:
+    user_object.friends.add(user_object2)
+    post = Post.objects.create(author=user_object2, entry='sparse')
+    Comment.objects.create(post=post, author=user_object, entry='comment')
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.get(reverse('post_detail', kwargs={'pk': post.pk}),
+                     {'expand': 'author'})
+    assert res.data['author']['id'] == user_object2.pk
+    assert res.data['comments'][0]['entry'] == 'comment'
+    res = client.get(reverse('post_detail', kwargs={'pk': post.pk}),
+                     {'fields': 'id,author'})
+    assert set(res.data) == {'id'}
+    res = client.get(reverse('post_detail', kwargs={'pk': post.pk}),
+                     {'fields': 'id,author', 'expand': 'author'})
+    assert set(res.data) == {'id', 'author'}
+
+    client.get(reverse('posts_list'))
+    # session, user, timeline page: no comment or author reads
+    with django_assert_num_queries(3):
+        res = client.get(reverse('posts_list'), {'fields': 'id,entry'})
+    assert res.data['results'] == [{'id': post.pk, 'entry': 'sparse'}]
+
+
+def likes(post: Post):
+    return post.reactions.filter(value=Reaction.Value.LIKE)
+
+
+def dislikes(post: Post):
+    return post.reactions.filter(value=Reaction.Value.DISLIKE)
+
+
 def delete_all_testing_files(profile_email: str) -> None:
     """Delete test files from media"""
     try:
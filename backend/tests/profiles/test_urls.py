@@ -4,7 +4,10 @@ from profiles.authentication import RegisterView, LogoutView, LoginView
 from profiles.views import (ProfileDetailView, ProfileUpdateView,
                             FriendRequestCreateView, FriendRequestAcceptView,
                             FriendRequestRefuseView, ProfilesListView,
-                            ProfileFriendsListView, RemoveFriendView)
+                            ProfileFriendsListView, RemoveFriendView,
+                            ProfileSuggestionsView, MutualFriendsListView,
+                            MutualFriendsCountView, ProfileSearchView,
+                            FriendRequestBulkCreateView)
 
 
 def test_register_url():
@@ -73,3 +76,29 @@ def test_remove_friend_url():
             'user_pk': 1,
             'friend_pk': 2
         })).func.view_class == RemoveFriendView
+
+
+def test_profile_suggestions_url():
+    assert resolve(reverse(
+        'profile_suggestions')).func.view_class == ProfileSuggestionsView
+
+
+def test_mutual_friends_url():
+    assert resolve(reverse(
+        'mutual_friends', kwargs={'pk':
+                                  1})).func.view_class == MutualFriendsListView
+
+
+def test_mutual_friends_counts_url():
+    assert resolve(reverse(
+        'mutual_friends_counts')).func.view_class == MutualFriendsCountView
+
+
+def test_profiles_search_url():
+    assert resolve(
+        reverse('profiles_search')).func.view_class == ProfileSearchView
+
+
+def test_send_friend_requests_url():
+    assert resolve(reverse(
+        'send_friend_requests')).func.view_class == FriendRequestBulkCreateView
@@ -1,13 +1,19 @@
 import pytest
 import sys, shutil, os
 from django.conf import settings
-from io import BytesIO
+from io import BytesIO, StringIO
 from PIL import Image
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.urls import reverse
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
+from django.core.cache import cache
 
 from profiles.models import Profile, FriendRequest
+from profiles.graph import get_friend_graph, reset_friend_graph
+from profiles import friendships
 
 client = APIClient()
 
@@ -223,6 +229,26 @@ def test_detail_another_user_profile_logged_in(user_payload: dict,
     assert res.data['username'] == user_payload['email'].split('@')[0]
 
 
+@pytest.mark.django_db
+def test_detail_sparse_fields(user_payload: dict) -> None:
+    client.post(reverse('register'), user_payload, format='json')
+    created_user = dict(email=user_payload['email'],
+                        password=user_payload['password'])
+    client.post(reverse('login'), created_user, format='json')
+    with CaptureQueriesContext(connection) as queries:
+        res = client.get(reverse('profile_detail', kwargs={'pk': 1}),
+                         {'fields': 'id,username,image'})
+    assert set(res.data) == {'id', 'username', 'image'}
+    skipped = ('posts_post', 'profiles_friendrequest', 'profiles_profile_friends')
+    assert not [
+        q['sql'] for q in queries.captured_queries
+        if any(table in q['sql'] for table in skipped)
+    ]
+    res = client.get(reverse('profile_detail', kwargs={'pk': 1}),
+                     {'fields': 'unknown'})
+    assert 'posts' in res.data and 'friends' in res.data
+
+
 # update view
 # put request
 @pytest.mark.django_db
@@ -417,6 +443,83 @@ def test_friend_request_with_no_data_logged_in(user_payload: dict,
     assert req.status_code == 400
 
 
+@pytest.mark.django_db
+def test_friend_request_constraints(user_payload: dict, user2_payload: dict,
+                                    monkeypatch) -> None:
+    user1 = client.post(reverse('register'), user_payload, format='json')
+    user2 = client.post(reverse('register'), user2_payload, format='json')
+    sender = Profile.objects.get(id=user1.data['id'])
+    receiver = Profile.objects.get(id=user2.data['id'])
+    FriendRequest.objects.create(sender=receiver, receiver=sender)
+    with pytest.raises(IntegrityError), transaction.atomic():
+        FriendRequest.objects.create(sender=sender, receiver=receiver)
+    with pytest.raises(IntegrityError), transaction.atomic():
+        FriendRequest.objects.create(sender=sender, receiver=sender)
+
+    created_user = dict(email=user_payload['email'],
+                        password=user_payload['password'])
+    client.post(reverse('login'), created_user, format='json')
+    req = client.post(reverse('send_friend_request',
+                              kwargs={
+                                  'sender_pk': sender.pk,
+                                  'receiver_pk': sender.pk
+                              }),
+                      dict(sender=sender.pk, receiver=sender.pk),
+                      format='json')
+    assert req.data['message'][0] == 'You can not send a request to yourself.'
+    # a concurrent send that passed validation still loses on the constraint
+    monkeypatch.setattr(friendships, 'relations',
+                        lambda sender_id, ids: {pk: None for pk in ids})
+    req = client.post(reverse('send_friend_request',
+                              kwargs={
+                                  'sender_pk': sender.pk,
+                                  'receiver_pk': receiver.pk
+                              }),
+                      dict(sender=sender.pk, receiver=receiver.pk),
+                      format='json')
+    assert req.data['message'][0] == 'Request has sent already'
+    assert req.status_code == 400
+    assert FriendRequest.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_friend_requests_bulk(user_payload: dict) -> None:
+    me = Profile.objects.create_user(email=user_payload['email'],
+                                     username='me',
+                                     password=user_payload['password'])
+    fresh, friend, pending, incoming = [
+        Profile.objects.create_user(email=f'{name}@email.com',
+                                    username=name,
+                                    password='test_pass')
+        for name in ('fresh', 'friend', 'pending', 'incoming')
+    ]
+    make_friends((me, friend))
+    FriendRequest.objects.create(sender=me, receiver=pending)
+    FriendRequest.objects.create(sender=incoming, receiver=me)
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.post(reverse('send_friend_requests'),
+                      dict(receivers=[
+                          fresh.pk, friend.pk, pending.pk, incoming.pk, me.pk,
+                          999, fresh.pk
+                      ]),
+                      format='json')
+    assert res.status_code == 200
+    created = FriendRequest.objects.get(sender=me, receiver=fresh)
+    assert res.data['results'] == [
+        dict(receiver=fresh.pk, status='sent', id=created.pk),
+        dict(receiver=friend.pk, status='already_friends', id=None),
+        dict(receiver=pending.pk, status='already_sent', id=None),
+        dict(receiver=incoming.pk, status='received', id=None),
+        dict(receiver=me.pk, status='self', id=None),
+        dict(receiver=999, status='not_found', id=None),
+    ]
+    res = client.post(reverse('send_friend_requests'),
+                      dict(receivers=[]),
+                      format='json')
+    assert res.status_code == 400
+
+
 @pytest.mark.django_db
 def test_friend_request_accept_loggen_in_as_receiver(
         user_payload: dict, user2_payload: dict) -> None:
@@ -714,8 +817,250 @@ def test_profiles_list_logged_in(user_payload: dict,
                         password=user_payload['password'])
     client.post(reverse('login'), created_user, format='json')
     res = client.get(reverse('profiles_list'), format='json')
-    assert len(res.data) == Profile.objects.all().count()
+    assert len(res.data['results']) == Profile.objects.all().count()
     assert res.status_code == 200
+    res = client.get(reverse('profiles_list'), {'page_size': 1})
+    first = res.data['results']
+    res = client.get(res.data['next'])
+    assert [p['id'] for p in first + res.data['results']
+            ] == list(Profile.objects.order_by('id').values_list('id',
+                                                                 flat=True))
+
+
+@pytest.fixture
+def friend_graph() -> None:
+    reset_friend_graph()
+    yield
+    reset_friend_graph()
+
+
+def make_friends(*pairs) -> None:
+    for user, friend in pairs:
+        user.friends.add(friend)
+        friend.friends.add(user)
+
+
+@pytest.mark.django_db
+def test_profile_suggestions(user_payload: dict, friend_graph: None,
+                             django_capture_on_commit_callbacks) -> None:
+    client.post(reverse('register'), user_payload, format='json')
+    me = Profile.objects.get(email=user_payload['email'])
+    alice, bob, carol, dave, erin = [
+        Profile.objects.create_user(email=f'{name}@email.com',
+                                    username=name,
+                                    password='test_pass')
+        for name in ('alice', 'bob', 'carol', 'dave', 'erin')
+    ]
+    make_friends((me, alice), (me, bob), (alice, carol), (bob, carol),
+                 (bob, dave))
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.get(reverse('profile_suggestions'))
+    assert [(p['id'], p['mutual_friends']) for p in res.data
+            ] == [(carol.pk, 2), (dave.pk, 1)]
+    assert get_friend_graph().mutual_count(me.pk, carol.pk) == 2
+
+    f_req = FriendRequest.objects.create(sender=dave, receiver=me)
+    with django_capture_on_commit_callbacks(execute=True):
+        client.get(
+            reverse('accept_friend_request',
+                    kwargs={
+                        'user_pk': me.pk,
+                        'f_req_pk': f_req.pk
+                    }))
+        make_friends((dave, erin))
+    res = client.get(reverse('profile_suggestions'), {'limit': 1})
+    assert [(p['id'], p['mutual_friends']) for p in res.data
+            ] == [(carol.pk, 2)]
+    res = client.get(reverse('profile_suggestions'))
+    assert [p['id'] for p in res.data] == [carol.pk, erin.pk]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.get(
+            reverse('remove_friend',
+                    kwargs={
+                        'user_pk': me.pk,
+                        'friend_pk': bob.pk
+                    }))
+    res = client.get(reverse('profile_suggestions'))
+    assert [(p['id'], p['mutual_friends']) for p in res.data
+            ] == [(bob.pk, 1), (carol.pk, 1), (erin.pk, 1)]
+
+
+@pytest.mark.django_db
+def test_friend_graph_rebuilds_in_background(friend_graph: None,
+                                             monkeypatch) -> None:
+    from profiles import graph as friend_graph_module
+
+    alice, bob, carol = [
+        Profile.objects.create_user(email=f'{name}@email.com',
+                                    username=name,
+                                    password='test_pass')
+        for name in ('alice', 'bob', 'carol')
+    ]
+    make_friends((alice, bob))
+    started = []
+    monkeypatch.setattr(friend_graph_module, '_start_rebuild',
+                        lambda: started.append(True))
+
+    old = get_friend_graph()
+    old.built_at -= friend_graph_module.ttl() + 1
+    assert get_friend_graph() is old
+    assert get_friend_graph() is old
+    assert len(started) == 1
+
+    # committed while the rebuild reads the database
+    friend_graph_module.friendship_changed(alice.pk, carol.pk, True)
+    assert old.friends(alice.pk) == [bob.pk, carol.pk]
+    new = friend_graph_module.rebuild_friend_graph()
+    assert get_friend_graph() is new is not old
+    assert new.friends(alice.pk) == [bob.pk, carol.pk]
+
+    friend_graph_module.friendship_changed(alice.pk, carol.pk, False)
+    assert new.friends(alice.pk) == [bob.pk]
+    assert isinstance(new.removed[alice.pk], frozenset)
+
+
+@pytest.mark.django_db
+def test_mutual_friends(user_payload: dict, user2_payload: dict,
+                        django_capture_on_commit_callbacks) -> None:
+    cache.clear()
+    me = Profile.objects.create_user(email=user_payload['email'],
+                                     username='me',
+                                     password=user_payload['password'])
+    other = Profile.objects.create_user(email=user2_payload['email'],
+                                        username='other',
+                                        password=user2_payload['password'])
+    common = [
+        Profile.objects.create_user(email=f'common{i}@email.com',
+                                    username=f'common{i}',
+                                    password='test_pass') for i in range(3)
+    ]
+    make_friends(*[(me, friend) for friend in common],
+                 *[(other, friend) for friend in common[1:]])
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.get(reverse('mutual_friends', kwargs={'pk': other.pk}),
+                     {'limit': 1})
+    assert res.data['count'] == 2
+    assert [p['id'] for p in res.data['results']] == [common[1].pk]
+    res = client.get(res.data['next'])
+    assert [p['id'] for p in res.data['results']] == [common[2].pk]
+
+    f_req = FriendRequest.objects.create(sender=common[0], receiver=other)
+    other_client = APIClient()
+    other_client.post(reverse('login'), user2_payload, format='json')
+    with django_capture_on_commit_callbacks(execute=True):
+        other_client.get(
+            reverse('accept_friend_request',
+                    kwargs={
+                        'user_pk': other.pk,
+                        'f_req_pk': f_req.pk
+                    }))
+    res = client.get(reverse('mutual_friends', kwargs={'pk': other.pk}))
+    assert res.data['count'] == 3
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.get(
+            reverse('remove_friend',
+                    kwargs={
+                        'user_pk': me.pk,
+                        'friend_pk': common[2].pk
+                    }))
+    res = client.get(reverse('mutual_friends_counts'),
+                     {'ids': f'{other.pk},{common[0].pk},999'})
+    assert res.data == {str(other.pk): 2, str(common[0].pk): 0, '999': 0}
+    res = client.get(reverse('mutual_friends_counts'), {'ids': 'x'})
+    assert res.status_code == 400
+    res = client.get(reverse('mutual_friends', kwargs={'pk': 999}))
+    assert res.status_code == 404
+
+
+@pytest.mark.django_db
+def test_profiles_search(user_payload: dict, friend_graph: None) -> None:
+    me = Profile.objects.create_user(email=user_payload['email'],
+                                     username='me',
+                                     password=user_payload['password'])
+    friend, stranger, fof, other = [
+        Profile.objects.create_user(email=email, username=name,
+                                    password='test_pass')
+        for name, email in (('Samwise', 'gardener@email.com'),
+                            ('sam_a', 'a@email.com'),
+                            ('sam_z', 'z@email.com'),
+                            ('rosie', 'SAMANTHA@email.com'))
+    ]
+    make_friends((me, friend), (friend, fof))
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.get(reverse('profiles_search'), {'q': 'SAM'})
+    assert [(p['id'], p['relation']) for p in res.data] == [
+        (friend.pk, 'friend'),
+        (fof.pk, 'friend_of_friend'),
+        (other.pk, None),
+        (stranger.pk, None),
+    ]
+    res = client.get(reverse('profiles_search'), {'q': 'gard'})
+    assert [p['id'] for p in res.data] == [friend.pk]
+    res = client.get(reverse('profiles_search'), {'q': 'me', 'limit': 1})
+    assert res.data == []
+
+
+@pytest.mark.django_db
+def test_profiles_search_friends_limit(user_payload: dict,
+                                       friend_graph: None) -> None:
+    me = Profile.objects.create_user(email=user_payload['email'],
+                                     username='me',
+                                     password=user_payload['password'])
+    friends = [
+        Profile.objects.create_user(email=f'{name}@email.com',
+                                    username=name,
+                                    password='test_pass')
+        for name in ('Émile_b', 'Émile_a', 'émile')
+    ]
+    make_friends(*[(me, friend) for friend in friends])
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.get(reverse('profiles_search'), {'q': 'Émile', 'limit': 1})
+    assert [p['id'] for p in res.data] == [friends[1].pk]
+
+
+@pytest.mark.django_db
+def test_profiles_search_friends_of_friends_past_candidates(
+        user_payload: dict, friend_graph: None, monkeypatch) -> None:
+    from profiles import search
+
+    monkeypatch.setattr(search, 'CANDIDATES', 3)
+    me = Profile.objects.create_user(email=user_payload['email'],
+                                     username='me',
+                                     password=user_payload['password'])
+    friend = Profile.objects.create_user(email='friend@email.com',
+                                         username='friend',
+                                         password='test_pass')
+    for i in range(4):
+        Profile.objects.create_user(email=f'stranger{i}@email.com',
+                                    username=f'zed_a{i}',
+                                    password='test_pass')
+    fof = Profile.objects.create_user(email='fof@email.com',
+                                      username='zed_z',
+                                      password='test_pass')
+    make_friends((me, friend), (friend, fof))
+    client.post(reverse('login'), user_payload, format='json')
+
+    res = client.get(reverse('profiles_search'), {'q': 'zed', 'limit': 2})
+    assert [(p['username'], p['relation']) for p in res.data] == [
+        ('zed_z', 'friend_of_friend'),
+        ('zed_a0', None),
+    ]
+
+
+def test_benchmark_friend_graph() -> None:
+    out = StringIO()
+    call_command('benchmark_friend_graph',
+                 profiles=100,
+                 edges=1000,
+                 queries=10,
+                 stdout=out)
+    assert 'built 1000 edges over 100 profiles' in out.getvalue()
 
 
 def delete_all_testing_files(profile_email: str) -> None:
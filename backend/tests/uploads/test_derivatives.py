@@ -0,0 +1,80 @@
+import pytest
+from io import BytesIO, StringIO
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from profiles.models import Profile
+from posts.models import Post
+from uploads import derivatives
+
+client = APIClient()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.fixture
+def user_object() -> Profile:
+    new_user = Profile.objects.create_user(email='test_email@email.com',
+                                           username='test_user',
+                                           password='test_pass')
+    return new_user
+
+
+@pytest.fixture
+def image_name() -> str:
+    io = BytesIO()
+    Image.new('RGB', (1600, 800), (255, 0, 0)).save(io, format='JPEG')
+    return default_storage.save('profile/test/foo.jpg',
+                                ContentFile(io.getvalue()))
+
+
+@pytest.mark.django_db
+def test_render_derivatives(image_name: str) -> None:
+    root = image_name[:-len('.jpg')]
+    written = derivatives.render(image_name)
+    assert written == [
+        f'derivatives/thumb/{root}.webp',
+        f'derivatives/web/{root}.webp',
+    ]
+    with default_storage.open(written[0]) as thumb:
+        assert Image.open(thumb).size == (150, 150)
+    with default_storage.open(written[1]) as web:
+        assert Image.open(web).size == (1080, 540)
+    assert derivatives.render(image_name) == []
+
+
+@pytest.mark.django_db
+def test_backfill_image_derivatives(user_object: Profile,
+                                    image_name: str) -> None:
+    Post.objects.create(author=user_object, entry='entry', file=image_name)
+    call_command('backfill_image_derivatives', stdout=StringIO())
+    assert default_storage.exists(derivatives.derivative_name(
+        image_name, 'thumb'))
+
+
+@pytest.mark.django_db
+def test_post_detail_exposes_derivatives(user_object: Profile,
+                                         image_name: str) -> None:
+    post = Post.objects.create(author=user_object,
+                               entry='entry',
+                               file=image_name)
+    client.force_authenticate(user_object)
+    pending = client.get(reverse('post_detail', kwargs={'pk': post.pk}))
+    derivatives.render(image_name)
+    res = client.get(reverse('post_detail', kwargs={'pk': post.pk}))
+    client.force_authenticate(None)
+    original = f'http://testserver/media/{image_name}'
+    assert pending.data['file_derivatives'] == {'thumb': original,
+                                                'web': original}
+    root = image_name[:-len('.jpg')]
+    assert res.data['file_derivatives'] == {
+        'thumb': f'http://testserver/media/derivatives/thumb/{root}.webp',
+        'web': f'http://testserver/media/derivatives/web/{root}.webp',
+    }
@@ -0,0 +1,99 @@
+import pytest
+from datetime import timedelta
+from io import BytesIO, StringIO
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.utils import timezone
+
+from profiles.models import Profile
+from posts.models import Post
+from uploads.models import StoredFile
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.fixture
+def user_object() -> Profile:
+    new_user = Profile.objects.create_user(email='test_email@email.com',
+                                           username='test_user',
+                                           password='test_pass')
+    return new_user
+
+
+def image_file(name: str, color: tuple) -> ContentFile:
+    io = BytesIO()
+    Image.new('RGB', (20, 20), color).save(io, format='PNG')
+    return ContentFile(io.getvalue(), name=name)
+
+
+@pytest.mark.django_db
+def test_same_content_stored_once() -> None:
+    first = default_storage.save('a.PNG', image_file('a.PNG', (255, 0, 0)))
+    second = default_storage.save('b.png', image_file('b.png', (255, 0, 0)))
+    other = default_storage.save('c.png', image_file('c.png', (0, 0, 255)))
+    assert first == second
+    assert first != other
+    assert first.startswith('cas/') and first.endswith('.png')
+    assert first.split('/')[1] == first.split('/')[3][:2]
+    assert not any(default_storage.listdir('tmp')[1])
+
+
+@pytest.mark.django_db
+def test_stored_files_reference_counted(user_object: Profile) -> None:
+    post = Post.objects.create(author=user_object,
+                               file=image_file('a.png', (255, 0, 0)))
+    Post.objects.create(author=user_object,
+                        file=image_file('b.png', (255, 0, 0)))
+    user_object.image = image_file('c.png', (255, 0, 0))
+    user_object.save()
+    stored = StoredFile.objects.get()
+    assert stored.name == post.file.name
+    assert stored.ref_count == 3
+
+    user_object.image = image_file('d.png', (0, 255, 0))
+    user_object.save()
+    Post.objects.all().delete()
+    assert StoredFile.objects.get(name=post.file.name).ref_count == 0
+    assert StoredFile.objects.get(name=user_object.image.name).ref_count == 1
+
+
+@pytest.mark.django_db
+def test_collect_orphan_files(user_object: Profile) -> None:
+    post = Post.objects.create(author=user_object,
+                               file=image_file('a.png', (255, 0, 0)))
+    kept = Post.objects.create(author=user_object,
+                               file=image_file('b.png', (0, 0, 255)))
+    name = post.file.name
+    post.delete()
+
+    call_command('collect_orphan_files', stdout=StringIO())
+    assert default_storage.exists(name)
+
+    StoredFile.objects.filter(name=name).update(updated_at=timezone.now() -
+                                                timedelta(hours=2))
+    call_command('collect_orphan_files', stdout=StringIO())
+    assert not default_storage.exists(name)
+    assert not StoredFile.objects.filter(name=name).exists()
+    assert default_storage.exists(kept.file.name)
+
+
+@pytest.mark.django_db
+def test_collect_spares_reused_orphan(user_object: Profile) -> None:
+    post = Post.objects.create(author=user_object,
+                               file=image_file('a.png', (255, 0, 0)))
+    name = post.file.name
+    post.delete()
+    StoredFile.objects.filter(name=name).update(updated_at=timezone.now() -
+                                                timedelta(hours=2))
+    # the same content is uploaded again, its row is not acquired yet
+    assert default_storage.save('b.png', image_file('b.png',
+                                                    (255, 0, 0))) == name
+
+    call_command('collect_orphan_files', stdout=StringIO())
+    assert default_storage.exists(name)
+    assert StoredFile.objects.filter(name=name).exists()
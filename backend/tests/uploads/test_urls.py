@@ -0,0 +1,8 @@
+from django.urls import reverse, resolve
+
+from uploads.views import MediaView
+
+
+def test_media_url():
+    assert resolve(reverse('media', kwargs={'name': 'cas/ab/cd/abcd.png'
+                                            })).func.view_class == MediaView
@@ -0,0 +1,101 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from profiles.models import Profile
+
+client = APIClient()
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path) -> None:
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.fixture
+def user_object() -> Profile:
+    new_user = Profile.objects.create_user(email='test_email@email.com',
+                                           username='test_user',
+                                           password='test_pass')
+    return new_user
+
+
+@pytest.fixture
+def logged_in(user_object: Profile):
+    client.force_authenticate(user_object)
+    yield user_object
+    client.force_authenticate(None)
+
+
+@pytest.fixture
+def media_name() -> str:
+    return default_storage.save('file.png', ContentFile(CONTENT))
+
+
+@pytest.mark.django_db
+def test_media_not_logged_in(media_name: str) -> None:
+    res = client.get(reverse('media', kwargs={'name': media_name}))
+    assert res.status_code == 403
+
+
+@pytest.mark.django_db
+def test_media_logged_in(logged_in: Profile, media_name: str) -> None:
+    res = client.get(reverse('media', kwargs={'name': media_name}))
+    assert res.status_code == 200
+    assert b''.join(res.streaming_content) == CONTENT
+    assert res['Content-Type'] == 'image/png'
+    assert res['Accept-Ranges'] == 'bytes'
+    assert 'immutable' in res['Cache-Control']
+
+    cached = client.get(reverse('media', kwargs={'name': media_name}),
+                        HTTP_IF_NONE_MATCH=res['ETag'])
+    assert cached.status_code == 304
+
+
+@pytest.mark.django_db
+def test_media_range_requests(logged_in: Profile, media_name: str) -> None:
+    url = reverse('media', kwargs={'name': media_name})
+    res = client.get(url, HTTP_RANGE='bytes=10-19')
+    assert res.status_code == 206
+    assert b''.join(res.streaming_content) == CONTENT[10:20]
+    assert res['Content-Range'] == f'bytes 10-19/{len(CONTENT)}'
+
+    res = client.get(url, HTTP_RANGE='bytes=-4')
+    assert b''.join(res.streaming_content) == CONTENT[-4:]
+
+    res = client.get(url, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+    assert res.status_code == 416
+    assert res['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+
+@pytest.mark.django_db
+def test_media_accel_redirect(logged_in: Profile, media_name: str,
+                              settings) -> None:
+    settings.MEDIA_ACCEL_REDIRECT = 'nginx'
+    res = client.get(reverse('media', kwargs={'name': media_name}))
+    assert res['X-Accel-Redirect'] == f'/protected-media/{media_name}'
+    assert res.content == b''
+
+
+@pytest.mark.django_db
+def test_media_accel_redirect_quotes_name(logged_in: Profile, settings,
+                                          tmp_path) -> None:
+    settings.MEDIA_ACCEL_REDIRECT = 'nginx'
+    (tmp_path / 'my files').mkdir()
+    (tmp_path / 'my files' / '100% ?#café.png').write_bytes(CONTENT)
+    res = client.get(
+        reverse('media', kwargs={'name': 'my files/100% ?#café.png'}))
+    assert res.status_code == 200
+    assert res['X-Accel-Redirect'] == (
+        '/protected-media/my%20files/100%25%20%3F%23caf%C3%A9.png')
+
+
+@pytest.mark.django_db
+def test_media_not_found(logged_in: Profile) -> None:
+    res = client.get(reverse('media', kwargs={'name': '../settings.py'}))
+    assert res.status_code == 404
+    res = client.get(reverse('media', kwargs={'name': 'missing.png'}))
+    assert res.status_code == 404
@@ -0,0 +1,119 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'thumb': {
+        'SIZE': (150, 150),
+        'CROP': True,
+        'FORMAT': 'WEBP',
+        'QUALITY': 70,
+    },
+    'web': {
+        'SIZE': (1080, 1080),
+        'CROP': False,
+        'FORMAT': 'WEBP',
+        'QUALITY': 80,
+    },
+}
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+# derivatives live at predictable names next to the content addressed blobs
+derivative_storage = FileSystemStorage()
+
+_executor = None
+
+
+def specs() -> dict:
+    return getattr(settings, 'IMAGE_DERIVATIVES', DEFAULTS)
+
+
+def derivative_name(name: str, key: str) -> str:
+    """ Storage name of derivative `key` of the original `name` """
+    root, _ = os.path.splitext(name)
+    extension = EXTENSIONS[specs()[key]['FORMAT']]
+    return 'derivatives/{0}/{1}.{2}'.format(key, root, extension)
+
+
+def derivative_urls(name: str, fallback: str) -> dict:
+    """
+    URL of every derivative of the original `name`, or `fallback` for the
+    ones not rendered yet
+    """
+    urls = {}
+    for key in specs():
+        target = derivative_name(name, key)
+        urls[key] = (derivative_storage.url(target)
+                     if derivative_storage.exists(target) else fallback)
+    return urls
+
+
+def render(name: str, force: bool = False) -> list:
+    """ Write every derivative of the original `name`, returns new names """
+    with default_storage.open(name) as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+
+    written = []
+    for key, spec in specs().items():
+        target = derivative_name(name, key)
+        if derivative_storage.exists(target):
+            if not force:
+                continue
+            derivative_storage.delete(target)
+
+        if spec['CROP']:
+            resized = ImageOps.fit(image, spec['SIZE'], Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail(spec['SIZE'], Image.Resampling.LANCZOS)
+
+        if spec['FORMAT'] == 'JPEG' and resized.mode != 'RGB':
+            resized = resized.convert('RGB')
+
+        buffer = BytesIO()
+        resized.save(buffer,
+                     format=spec['FORMAT'],
+                     quality=spec['QUALITY'],
+                     optimize=True,
+                     progressive=True)
+        written.append(
+            derivative_storage.save(target, ContentFile(buffer.getvalue())))
+    return written
+
+
+def delete(name: str) -> None:
+    """ Remove every derivative of the original `name` """
+    for key in specs():
+        derivative_storage.delete(derivative_name(name, key))
+
+
+def executor() -> ThreadPoolExecutor:
+    """ Worker pool shared by all derivative jobs of this process """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2),
+            thread_name_prefix='image-derivatives')
+    return _executor
+
+
+def _render_logged(name: str) -> None:
+    try:
+        render(name)
+    except Exception:
+        logger.exception('Could not render derivatives of %s', name)
+
+
+def schedule(name: str) -> None:
+    """ Render derivatives in the worker pool once the upload is committed """
+    transaction.on_commit(lambda: executor().submit(_render_logged, name))
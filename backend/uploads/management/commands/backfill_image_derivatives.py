@@ -0,0 +1,43 @@
+from concurrent.futures import as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from uploads import derivatives
+from uploads.signals import IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Generate missing derivatives for every uploaded image'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force',
+                            action='store_true',
+                            help='Re-render derivatives that already exist')
+
+    def handle(self, *args, **options):
+        pool = derivatives.executor()
+        done, failed = 0, 0
+
+        for model, field in IMAGE_FIELDS:
+            names = (apps.get_model(model).objects.exclude(**{
+                field: ''
+            }).exclude(**{
+                f'{field}__isnull': True
+            }).values_list(field, flat=True).distinct().iterator())
+
+            jobs = {
+                pool.submit(derivatives.render, name, options['force']): name
+                for name in names
+            }
+            for job in as_completed(jobs):
+                try:
+                    job.result()
+                    done += 1
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{jobs[job]}: {error}')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rendered derivatives of {done} images, {failed} failed.'))
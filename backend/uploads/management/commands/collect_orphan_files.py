@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from uploads import derivatives
+from uploads.models import StoredFile
+
+
+class Command(BaseCommand):
+    help = 'Delete stored files no Post or Profile refers to anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60,
+            help='Minutes a file must have been unreferenced for')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        orphans = StoredFile.objects.filter(ref_count__lte=0,
+                                            updated_at__lt=cutoff)
+
+        total = 0
+        while True:
+            names = list(
+                orphans.values_list('name',
+                                    flat=True)[:options['batch_size']])
+            if not names:
+                break
+
+            with transaction.atomic():
+                for name in names:
+                    # rows re-referenced or touched by an upload of the same
+                    # content meanwhile no longer match `orphans`; the file
+                    # goes before the delete commits, an upload waiting on
+                    # the row then writes a fresh copy
+                    if orphans.filter(name=name).delete()[0]:
+                        default_storage.delete(name)
+                        derivatives.delete(name)
+                        total += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Collected {total} orphaned files.'))
@@ -0,0 +1,53 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:43
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.utils.timezone
+
+IMAGE_FIELDS = (
+    ('posts', 'Post', 'file'),
+    ('profiles', 'Profile', 'image'),
+)
+
+
+def count_existing_files(apps, schema_editor):
+    """ Reference count the uploads that predate content addressing """
+    StoredFile = apps.get_model('uploads', 'StoredFile')
+
+    counts = {}
+    for app_label, model_name, field in IMAGE_FIELDS:
+        used = (apps.get_model(app_label, model_name).objects.exclude(
+            **{field: ''}).exclude(**{f'{field}__isnull': True}).values(
+                field).annotate(total=Count('pk')).values_list(field, 'total'))
+        for name, total in used.iterator():
+            counts[name] = counts.get(name, 0) + total
+
+    StoredFile.objects.bulk_create(
+        [StoredFile(name=name, ref_count=total) for name, total in counts.items()],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('posts', '0006_trendingscore'),
+        ('profiles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='storedfile',
+            index=models.Index(fields=['ref_count', 'updated_at'], name='storedfile_orphans_idx'),
+        ),
+        migrations.RunPython(count_existing_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+
+class StoredFileManager(models.Manager):
+    """ Reference counting of stored files """
+
+    def acquire(self, name: str) -> None:
+        """ Count one more row pointing at `name` """
+        self.bulk_create([self.model(name=name, ref_count=0)],
+                         ignore_conflicts=True)
+        self.filter(name=name).update(ref_count=models.F('ref_count') + 1,
+                                      updated_at=timezone.now())
+
+    def touch(self, name: str) -> int:
+        """
+        Mark `name` as just used, so the orphan collector leaves it alone.
+        Returns 0 when there is no row, e.g. it was collected meanwhile.
+        """
+        return self.filter(name=name).update(updated_at=timezone.now())
+
+    def release(self, name: str) -> None:
+        """ Count one less row pointing at `name` """
+        self.filter(name=name).update(ref_count=models.F('ref_count') - 1,
+                                      updated_at=timezone.now())
+
+
+class StoredFile(models.Model):
+    """ A stored upload and the number of Post/Profile rows using it """
+    name = models.CharField(max_length=255, primary_key=True)
+    ref_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = StoredFileManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('ref_count', 'updated_at'),
+                         name='storedfile_orphans_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return '{} ({})'.format(self.name, self.ref_count)
@@ -0,0 +1,27 @@
+from rest_framework.serializers import Field
+
+from .derivatives import derivative_urls
+
+
+class ImageDerivativesField(Field):
+    """
+    Read-only URLs of the resized versions of an image field; sizes still
+    being rendered point at the original
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+
+        urls = derivative_urls(value.name, value.url)
+        request = self.context.get('request')
+        if request is not None:
+            urls = {
+                key: request.build_absolute_uri(url)
+                for key, url in urls.items()
+            }
+        return urls
@@ -0,0 +1,48 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import derivatives
+from .models import StoredFile
+
+# (model, field) pairs holding user uploaded images
+IMAGE_FIELDS = (
+    ('posts.Post', 'file'),
+    ('profiles.Profile', 'image'),
+)
+
+
+def remember_file(sender, instance, **kwargs):
+    """ Keep the stored file name to spot a new upload on save """
+    value = instance.__dict__.get(IMAGE_FIELDS_BY_MODEL[sender])
+    instance._uploads_original = str(value) if value else None
+
+
+def track_upload(sender, instance, **kwargs):
+    """ Move the reference and queue derivatives when the file changes """
+    name = getattr(instance, IMAGE_FIELDS_BY_MODEL[sender]).name or None
+    original = getattr(instance, '_uploads_original', None)
+    if name != original:
+        if name:
+            StoredFile.objects.acquire(name)
+            derivatives.schedule(name)
+        if original:
+            StoredFile.objects.release(original)
+    instance._uploads_original = name
+
+
+def release_upload(sender, instance, **kwargs):
+    """ Drop the reference of a deleted row """
+    name = getattr(instance, IMAGE_FIELDS_BY_MODEL[sender]).name
+    if name:
+        StoredFile.objects.release(name)
+
+
+IMAGE_FIELDS_BY_MODEL = {
+    apps.get_model(model): field
+    for model, field in IMAGE_FIELDS
+}
+
+for model in IMAGE_FIELDS_BY_MODEL:
+    post_init.connect(remember_file, sender=model)
+    post_save.connect(track_upload, sender=model)
+    post_delete.connect(release_upload, sender=model)
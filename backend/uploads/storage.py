@@ -0,0 +1,60 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage keeping a single copy of every distinct content
+    under cas/<aa>/<bb>/<sha256><ext>.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # the final name is derived from the content in _save()
+        return name
+
+    def _save(self, name, content):
+        temp_dir = self.path('tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+
+        # hash while streaming to disk, the upload is read only once
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            name = self.content_name(digest.hexdigest(), name)
+            path = self.path(name)
+            # claim an existing copy before reusing it: the collector only
+            # deletes rows that stayed untouched, and unlinks their file
+            # before its delete commits, so once the update returns the
+            # copy is either safe or already gone
+            from .models import StoredFile
+            StoredFile.objects.touch(name)
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return name
+
+    @staticmethod
+    def content_name(hexdigest: str, name: str) -> str:
+        """ Sharded storage name of a content hash, keeping the extension """
+        extension = os.path.splitext(name)[1].lower()
+        return 'cas/{0}/{1}/{2}{3}'.format(hexdigest[:2], hexdigest[2:4],
+                                           hexdigest, extension)
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import MediaView
+
+urlpatterns = [
+    path('<path:name>', MediaView.as_view(), name='media'),
+]
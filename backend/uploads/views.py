@@ -0,0 +1,125 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header: str, size: int):
+    """
+    (start, end) of a single `bytes=` range, None to send the whole file,
+    or False when the range can not be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def read_range(path: str, start: int, length: int):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class MediaView(APIView):
+    """ Serve uploaded media to authenticated users """
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request, name):
+        try:
+            path = safe_join(settings.MEDIA_ROOT, name)
+        except SuspiciousFileOperation:
+            raise NotFound()
+        if not os.path.isfile(path):
+            raise NotFound()
+
+        stat = os.stat(path)
+        etag = '"{:x}-{:x}"'.format(stat.st_mtime_ns, stat.st_size)
+        not_modified = get_conditional_response(request,
+                                                etag=etag,
+                                                last_modified=int(
+                                                    stat.st_mtime))
+        if not_modified is not None:
+            return not_modified
+
+        accel = getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+        if accel == 'nginx':
+            response = HttpResponse()
+            # nginx decodes the URI before matching the internal location
+            response['X-Accel-Redirect'] = getattr(
+                settings, 'MEDIA_ACCEL_REDIRECT_PREFIX',
+                '/protected-media/') + quote(name)
+        elif accel == 'apache':
+            response = HttpResponse()
+            response['X-Sendfile'] = path
+        else:
+            response = self.stream(request, path, stat.st_size, etag)
+
+        content_type, _ = mimetypes.guess_type(path)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        # content addressed names never change their bytes
+        response['Cache-Control'] = ('private, max-age=31536000, immutable'
+                                     if name.startswith('cas/') else
+                                     'private, no-cache')
+        return response
+
+    def stream(self, request, path: str, size: int, etag: str):
+        """ Send the file from disk, honouring a single byte range """
+        byte_range = None
+        header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if header and (if_range is None or if_range == etag):
+            byte_range = parse_range(header, size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+            return response
+
+        if byte_range is None:
+            # FileResponse hands the file to wsgi.file_wrapper, which lets
+            # the server use sendfile() where the platform supports it
+            response = FileResponse(open(path, 'rb'))
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(read_range(
+                path, start, end - start + 1),
+                                             status=206)
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(
+                start, end, size)
+            response['Content-Length'] = str(end - start + 1)
+
+        response['Accept-Ranges'] = 'bytes'
+        return response